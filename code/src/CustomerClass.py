@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class CustomerClass:
     def __init__(self, name, features, cr_center, sigmoid_z,
                  back_mean, cost_per_click_perc, likelihood):
@@ -30,3 +33,37 @@ class CustomerClass:
 
     def get_name(self):
         return self.name
+
+
+# Parameters of several customer classes as arrays with one entry per class (struct of arrays), with the
+# attribute names of CustomerClass, so that the distributions compute the means of all of them in one
+# vectorized call
+class CustomerClassArrays:
+    def __init__(self, name, features, cr_center, sigmoid_z, back_mean, cost_per_click_perc, likelihood):
+        self.name = name
+        self.features = features
+        self.crCenter = cr_center
+        self.sigmoidZ = sigmoid_z
+        self.backMean = back_mean
+        self.cost_per_click_perc = cost_per_click_perc
+        self.likelihood = likelihood
+
+    @staticmethod
+    def from_classes(classes):
+        return CustomerClassArrays(name=np.array([c.name for c in classes]),
+                                   features=[c.features for c in classes],
+                                   cr_center=np.array([c.crCenter for c in classes]),
+                                   sigmoid_z=np.array([c.sigmoidZ for c in classes]),
+                                   back_mean=np.array([c.backMean for c in classes]),
+                                   cost_per_click_perc=np.array([c.cost_per_click_perc for c in classes]),
+                                   likelihood=np.array([c.likelihood for c in classes]))
+
+    def take(self, index):
+        # the classes at the given (array of) indices
+        return CustomerClassArrays(name=self.name[index],
+                                   features=[self.features[i] for i in index],
+                                   cr_center=self.crCenter[index],
+                                   sigmoid_z=self.sigmoidZ[index],
+                                   back_mean=self.backMean[index],
+                                   cost_per_click_perc=self.cost_per_click_perc[index],
+                                   likelihood=self.likelihood[index])
@@ -1,16 +1,34 @@
 import itertools
 from collections import defaultdict
 
-from numpy.random import default_rng, Generator
+import numpy as np
+from numpy.random import default_rng, Generator, SeedSequence
 
 from src.constants import _Const
+from src.CustomerClass import CustomerClassArrays
 from src.CustomerClassCreator import CustomerClassCreator
+from src.ProfitCache import ProfitCache
+from src.checkpoint import save_state, load_state
+from src.fork import fork
 from src.distributions import NewClicksDistribution, ClickConvertedDistribution, FutureVisitsDistribution, \
     CostPerClickDistribution
 
 
 class Environment:
-    def __init__(self, random_seed=None):
+    def __init__(self, random_seed=None, aggregate_sampling=False,
+                 cost_per_click_distribution=CostPerClickDistribution, profit_cache_size=64,
+                 stream_seed: SeedSequence = None, n_features=2):
+        # aggregate_sampling: simulate_one_day draws the daily totals of cost and future visits
+        # of every combination at once, in O(1) instead of one sample per click or purchase.
+        # The totals have the same distribution, but the random stream differs from the default.
+        # cost_per_click_distribution: called with the generator, it returns the distribution
+        # of the cost per click, e.g. GammaCostPerClickDistribution
+        # profit_cache_size: number of expected profit grids and optima memoized by algorithms (0 disables it)
+        # stream_seed: if given, the parameters still depend on random_seed only, but the simulation
+        # uses independent streams spawned from it: one for self.rng (used by the bandit environments
+        # and the learners) and one per distribution. Replicas of the same environment are obtained
+        # with the children of a single SeedSequence.
+        # n_features: number of binary features, the combinations are the 2 ** n_features assignments
         CONST = _Const()
 
         if random_seed is None:
@@ -20,16 +38,20 @@ class Environment:
         self._seed = random_seed
         self.rng: Generator = default_rng(seed=random_seed)
 
-        self.combinations = list(itertools.product([True, False], repeat=2))
-        self.feature_1_likelihood = self.rng.uniform(CONST.FEATURE_LIKELIHOOD_MIN, CONST.FEATURE_LIKELIHOOD_MAX)
-        self.feature_2_likelihood = self.rng.uniform(CONST.FEATURE_LIKELIHOOD_MIN, CONST.FEATURE_LIKELIHOOD_MAX)
+        self.n_features = n_features
+        self.combinations = list(itertools.product([True, False], repeat=n_features))
+        # likelihood of every feature being True, independent of the others
+        self.feature_likelihoods = [self.rng.uniform(CONST.FEATURE_LIKELIHOOD_MIN, CONST.FEATURE_LIKELIHOOD_MAX)
+                                    for _ in range(n_features)]
+        if n_features >= 2:
+            self.feature_1_likelihood, self.feature_2_likelihood = self.feature_likelihoods[:2]
 
         self.likelihoods = {}
         for c in self.combinations:
-            f1, f2 = c
-            p1 = self.feature_1_likelihood if f1 else (1 - self.feature_1_likelihood)
-            p2 = self.feature_2_likelihood if f2 else (1 - self.feature_2_likelihood)
-            self.likelihoods[c] = p1 * p2
+            likelihood = 1
+            for f, theta in zip(c, self.feature_likelihoods):
+                likelihood *= theta if f else (1 - theta)
+            self.likelihoods[c] = likelihood
 
         self.classes = CustomerClassCreator().get_new_classes(self.rng,
                                                               self.combinations,
@@ -40,27 +62,71 @@ class Environment:
         self.item_base_price = self.rng.integers(CONST.BASE_PRICE_MIN, CONST.BASE_PRICE_MAX)
         self.newClicksC, self.newClicksZ = CustomerClassCreator().get_new_clicks_v_parameters(self.rng)
 
-        self.distNewClicks = NewClicksDistribution(self.rng, self.newClicksC, self.newClicksZ,
+        if stream_seed is not None:
+            rng_stream, *dist_streams = stream_seed.spawn(5)
+            self.rng = default_rng(seed=rng_stream)
+        else:
+            dist_streams = [self.rng] * 4
+
+        self.distNewClicks = NewClicksDistribution(dist_streams[0], self.newClicksC, self.newClicksZ,
                                                    self.average_tot_auctions,
                                                    self.likelihoods)
-        self.distClickConverted = ClickConvertedDistribution(self.rng)
-        self.distFutureVisits = FutureVisitsDistribution(self.rng)
-        self.distCostPerClick = CostPerClickDistribution(self.rng)
+        self.distClickConverted = ClickConvertedDistribution(dist_streams[1])
+        self.distFutureVisits = FutureVisitsDistribution(dist_streams[2])
+        self.distCostPerClick = cost_per_click_distribution(dist_streams[3])
+        self.aggregate_sampling = aggregate_sampling
 
         self.class_of_comb = {}
         for c in self.classes:
             for comb in c.features:
                 self.class_of_comb[comb] = c
 
+        # Struct of arrays view of the same parameters: a combination is identified by its
+        # index in self.combinations and a class by its index in self.classes
+        self.comb_index = {comb: i for i, comb in enumerate(self.combinations)}
+        self.comb_likelihoods = np.array([self.likelihoods[comb] for comb in self.combinations])
+        self.comb_class = np.array([self.classes.index(self.class_of_comb[comb]) for comb in self.combinations])
+        self.class_parameters = CustomerClassArrays.from_classes(self.classes)
+        self.comb_parameters = self.class_parameters.take(self.comb_class)
+        self.comb_parameters.likelihood = self.comb_likelihoods
+
+        # simulate_one_day draws the samples class by class
+        self.sampling_order = np.array([self.comb_index[comb] for c in self.classes for comb in c.features])
+        self.sampling_parameters = self.comb_parameters.take(self.sampling_order)
+
+        # expected profits and optima computed by algorithms, shared by every user of the environment
+        self.profit_cache = ProfitCache(profit_cache_size)
+
     def get_seed(self):
         return self._seed
 
+    def get_generators(self):
+        return [self.rng] + [d.rng for d in [self.distNewClicks, self.distClickConverted,
+                                             self.distFutureVisits, self.distCostPerClick]]
+
+    def save_state(self, file_path):
+        # The parameters only depend on the seed: the state is the one of the generators
+        save_state(file_path, (self._seed, [g.bit_generator.state for g in self.get_generators()]))
+
+    def fork(self):
+        # Same parameters, independent random streams spawned from the current ones
+        return fork(self, self)
+
+    def load_state(self, file_path):
+        # Only for an environment created with the same seed
+        seed, generator_states = load_state(file_path)
+        if seed != self._seed:
+            raise ValueError(f'The state was saved by an environment with seed {seed}, not {self._seed}')
+
+        for generator, state in zip(self.get_generators(), generator_states):
+            generator.bit_generator.state = state
+
     def margin(self, price: float):
         return price-self.item_base_price
 
     def print_summary(self):
-        print(f'Theta 1: {self.feature_1_likelihood:.2f}')
-        print(f'Theta 2: {self.feature_2_likelihood:.2f}')
+        for i, theta in enumerate(self.feature_likelihoods):
+            print(f'Theta {i + 1}: {theta:.2f}')
         print(f'Average daily auctions: {self.average_tot_auctions:.2f}')
         print(f'50% winrate bid: {self.newClicksC:.2f}')
         print(f'Bid concentration: {self.newClicksZ:.2f}')
@@ -92,6 +158,14 @@ class Environment:
     def get_features_comb_likelihood(self, f):
         return self.likelihoods[f]
 
+    def get_profit_cache(self):
+        return self.profit_cache
+
+    def get_comb_indices(self, combinations=None):
+        if combinations is None:
+            return np.arange(len(self.combinations))
+        return np.array([self.comb_index[comb] for comb in combinations], dtype=np.int64)
+
     def simulate_one_day_fixed_bid(self, pricing_strategy, bid):
         bidding_strategy = defaultdict(lambda: bid)
         return self.simulate_one_day(pricing_strategy, bidding_strategy)
@@ -105,23 +179,74 @@ class Environment:
         bidding_strategy = defaultdict(lambda: bid)
         return self.simulate_one_day(pricing_strategy, bidding_strategy)
 
+    def strategy_to_array(self, strategy):
+        # A strategy can be a single value for every combination, a dict {comb: value}
+        # or an array whose last axis runs over self.combinations
+        if isinstance(strategy, dict):
+            return np.array([strategy[comb] for comb in self.combinations])
+        return np.asarray(strategy)
+
+    def array_to_strategy(self, values):
+        return {comb: v for comb, v in zip(self.combinations, values)}
+
     # start simulation one day
 
     def simulate_one_day(self, pricing_strategy, bidding_strategy):
-        purchases, tot_cost, new_future_visits, new_clicks = {}, {}, {}, {}
+        auctions, new_clicks, purchases, tot_cost, new_future_visits, profit = \
+            self.simulate_one_day_arrays(pricing_strategy, bidding_strategy)
 
-        auctions, new_clicks = self.distNewClicks.sample_bidding_strategy(bidding_strategy)
-        profit = 0
+        return self.array_to_strategy(auctions), self.array_to_strategy(new_clicks), \
+            self.array_to_strategy(purchases), self.array_to_strategy(tot_cost), \
+            self.array_to_strategy(new_future_visits), profit
 
-        for c in self.classes:
-            for comb in c.features:
-                price = pricing_strategy[comb]
-                bid = bidding_strategy[comb]
-                purchases[comb] = self.distClickConverted.sample_n(c, price, new_clicks[comb])
-                tot_cost[comb] = sum(self.distCostPerClick.sample_n(c, bid, new_clicks[comb]))
-                new_future_visits[comb] = sum(self.distFutureVisits.sample_n(c, purchases[comb]))
-                profit += self.margin(price) * (purchases[comb] + new_future_visits[comb]) - tot_cost[comb]
+    # end simulation one day
+
+    def simulate_one_day_arrays(self, pricing_strategy, bidding_strategy):
+        # Same as simulate_one_day, with arrays indexed by combination in place of dicts.
+        # The samples are drawn in the same order, so the two are interchangeable.
+        n_combs = len(self.combinations)
+        prices = np.broadcast_to(self.strategy_to_array(pricing_strategy), n_combs)
+        bids = np.broadcast_to(self.strategy_to_array(bidding_strategy), n_combs)
+        order = self.sampling_order
+        classes = self.sampling_parameters
+
+        purchases = np.zeros(n_combs, dtype=np.int64)
+        tot_cost = np.zeros(n_combs)
+        new_future_visits = np.zeros(n_combs, dtype=np.int64)
+
+        auctions, new_clicks = self.distNewClicks.sample_one_day(bids)
+
+        purchases[order] = self.distClickConverted.sample_n(classes, prices[order], new_clicks[order])
+        if self.aggregate_sampling:
+            tot_cost[order] = self.distCostPerClick.sample_sum(classes, bids[order], new_clicks[order])
+            new_future_visits[order] = self.distFutureVisits.sample_sum(classes, purchases[order])
+        else:
+            tot_cost[order] = self.distCostPerClick.sample_n_sums(classes, bids[order], new_clicks[order])
+            new_future_visits[order] = self.distFutureVisits.sample_n_sums(classes, purchases[order])
+        profit = np.sum(self.margin(prices) * (purchases + new_future_visits) - tot_cost)
 
         return auctions, new_clicks, purchases, tot_cost, new_future_visits, profit
 
-    # end simulation one day
+    # start simulation many days
+
+    def simulate_days(self, n_days, pricing, bidding):
+        # pricing and bidding are strategies as accepted by strategy_to_array. Their leading axes
+        # (if any) define a batch of strategies simulated independently, e.g. a price x bid grid
+        # is obtained with pricing=prices[:, None, None] and bidding=bids[None, :, None].
+        # Every returned array has shape (n_days, *batch, n_combinations), except the profit
+        # which is summed over the combinations. The daily totals are always sampled in aggregate.
+        prices = self.strategy_to_array(pricing)
+        bids = self.strategy_to_array(bidding)
+        shape = (n_days,) + np.broadcast_shapes(prices.shape, bids.shape, (len(self.combinations),))
+
+        comb_classes = self.comb_parameters
+
+        auctions, new_clicks = self.distNewClicks.sample_days(shape, bids)
+        purchases = self.distClickConverted.sample_n(comb_classes, prices, new_clicks)
+        tot_cost = self.distCostPerClick.sample_sum(comb_classes, bids, new_clicks)
+        new_future_visits = self.distFutureVisits.sample_sum(comb_classes, purchases)
+        profit = np.sum(self.margin(prices) * (purchases + new_future_visits) - tot_cost, axis=-1)
+
+        return auctions, new_clicks, purchases, tot_cost, new_future_visits, profit
+
+    # end simulation many days
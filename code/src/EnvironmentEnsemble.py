@@ -0,0 +1,247 @@
+import itertools
+
+import numpy as np
+from numpy.random import default_rng, Generator
+
+from src.constants import _Const
+from src.CustomerClassCreator import CustomerClassCreator
+from src.Environment import Environment
+from src.utils import sigmoid
+
+
+# Holds the parameters of many environments as stacked arrays, the first axis of every array
+# being the environment. Quantities of the whole ensemble (expected profits, simulated days)
+# are computed with array operations instead of looping over Environment objects.
+# The number of binary features is the one of the columns of feature_likelihoods, the combinations
+# are the 2 ** n_features assignments, in the order of Environment.
+class EnvironmentEnsemble:
+    def __init__(self, feature_likelihoods, comb_class, cr_centers, sigmoid_zs, back_means,
+                 cost_per_click_percs, average_tot_auctions, item_base_prices,
+                 new_clicks_c, new_clicks_z, seeds=None, rng: Generator = None):
+        # per environment
+        self.seeds = seeds
+        self.feature_likelihoods = np.asarray(feature_likelihoods, dtype=np.float64)
+        self.n_features = self.feature_likelihoods.shape[1]
+        self.combinations = list(itertools.product([True, False], repeat=self.n_features))
+        self.average_tot_auctions = np.asarray(average_tot_auctions, dtype=np.float64)
+        self.item_base_prices = np.asarray(item_base_prices, dtype=np.float64)
+        self.new_clicks_c = np.asarray(new_clicks_c, dtype=np.float64)
+        self.new_clicks_z = np.asarray(new_clicks_z, dtype=np.float64)
+
+        # per environment and class
+        self.cr_centers = np.asarray(cr_centers, dtype=np.float64)
+        self.sigmoid_zs = np.asarray(sigmoid_zs, dtype=np.float64)
+        self.back_means = np.asarray(back_means, dtype=np.float64)
+        self.cost_per_click_percs = np.asarray(cost_per_click_percs, dtype=np.float64)
+
+        # per environment and combination of features
+        self.comb_class = np.asarray(comb_class, dtype=np.int64)
+        self.comb_likelihoods = np.ones((len(self), len(self.combinations)))
+        for i, comb in enumerate(self.combinations):
+            for f, value in enumerate(comb):
+                theta = self.feature_likelihoods[:, f]
+                self.comb_likelihoods[:, i] *= theta if value else (1 - theta)
+
+        self.rng: Generator = rng if rng is not None else default_rng()
+
+    def __len__(self):
+        return len(self.feature_likelihoods)
+
+    # start ensemble generation
+
+    @staticmethod
+    def from_seeds(seeds, rng: Generator = None, n_features: int = 2):
+        # The parameters of the i-th environment are the same of Environment(seeds[i], n_features=n_features):
+        # the random draws are done in the same order by the same generator
+        CONST = _Const()
+        creator = CustomerClassCreator()
+        combinations = list(itertools.product([True, False], repeat=n_features))
+        n_envs, n_classes = len(seeds), CONST.N_CUSTOMER_CLASSES
+
+        feature_likelihoods = np.zeros((n_envs, n_features))
+        comb_class = np.zeros((n_envs, len(combinations)), dtype=np.int64)
+        class_params = np.zeros((4, n_envs, n_classes))
+        env_params = np.zeros((4, n_envs))
+
+        for i, seed in enumerate(seeds):
+            rng_generator = default_rng(seed=seed)
+
+            feature_likelihoods[i] = [rng_generator.uniform(CONST.FEATURE_LIKELIHOOD_MIN,
+                                                            CONST.FEATURE_LIKELIHOOD_MAX)
+                                      for _ in range(n_features)]
+
+            likelihoods = {}
+            for comb in combinations:
+                likelihoods[comb] = np.prod([theta if f else (1 - theta)
+                                             for f, theta in zip(comb, feature_likelihoods[i])])
+
+            classes = creator.get_new_classes(rng_generator, combinations, likelihoods, n_classes)
+            for c_i, c in enumerate(classes):
+                class_params[:, i, c_i] = [c.crCenter, c.sigmoidZ, c.backMean, c.cost_per_click_perc]
+                for comb in c.features:
+                    comb_class[i, combinations.index(comb)] = c_i
+
+            average_tot_auctions = rng_generator.uniform(CONST.AUCTIONS_MIN, CONST.AUCTIONS_MAX)
+            item_base_price = rng_generator.integers(CONST.BASE_PRICE_MIN, CONST.BASE_PRICE_MAX)
+            new_clicks_c, new_clicks_z = creator.get_new_clicks_v_parameters(rng_generator)
+            env_params[:, i] = [average_tot_auctions, item_base_price, new_clicks_c, new_clicks_z]
+
+        return EnvironmentEnsemble(feature_likelihoods, comb_class, *class_params, *env_params,
+                                   seeds=np.asarray(seeds), rng=rng)
+
+    @staticmethod
+    def random(n_envs, rng: Generator = None, n_features: int = 2):
+        # Same distribution of the parameters of Environment(n_features=n_features), but every parameter
+        # of the whole ensemble is drawn at once. The environments are not tied to a seed.
+        CONST = _Const()
+        rng = rng if rng is not None else default_rng()
+        n_combs, n_classes = 2 ** n_features, CONST.N_CUSTOMER_CLASSES
+
+        feature_likelihoods = rng.uniform(CONST.FEATURE_LIKELIHOOD_MIN, CONST.FEATURE_LIKELIHOOD_MAX,
+                                          size=(n_envs, n_features))
+
+        # Same assignment of CustomerClassCreator: the shuffled combinations are given
+        # in turn to the shuffled classes
+        shuffled_combs = rng.permuted(np.tile(np.arange(n_combs), (n_envs, 1)), axis=1)
+        shuffled_classes = rng.permuted(np.tile(np.arange(n_classes), (n_envs, 1)), axis=1)
+        comb_class = np.zeros((n_envs, n_combs), dtype=np.int64)
+        for k in range(n_combs):
+            comb_class[np.arange(n_envs), shuffled_combs[:, k]] = shuffled_classes[:, k % n_classes]
+
+        size = (n_envs, n_classes)
+        sigmoid_zs = rng.choice(CONST.SIGMOID_Z_VALUES_CR, size=size)
+        cr_centers = rng.integers(CONST.CR_CENTER_MIN, CONST.CR_CENTER_MAX, size=size)
+        back_means = rng.integers(CONST.BACK_MEAN_MIN, CONST.BACK_MEAN_MAX, size=size)
+        cost_per_click_percs = rng.uniform(CONST.COST_PER_CLICK_PERC_MIN, CONST.COST_PER_CLICK_PERC_MAX, size=size)
+
+        average_tot_auctions = rng.uniform(CONST.AUCTIONS_MIN, CONST.AUCTIONS_MAX, size=n_envs)
+        item_base_prices = rng.integers(CONST.BASE_PRICE_MIN, CONST.BASE_PRICE_MAX, size=n_envs)
+        possible_bids_centers = np.linspace(CONST.BID_MIN, CONST.BID_MAX, 100)
+        new_clicks_c = np.around(rng.choice(possible_bids_centers, size=n_envs), 2)
+        new_clicks_z = rng.choice(CONST.SIGMOID_Z_VALUES_NC, size=n_envs)
+
+        return EnvironmentEnsemble(feature_likelihoods, comb_class, cr_centers, sigmoid_zs, back_means,
+                                   cost_per_click_percs, average_tot_auctions, item_base_prices,
+                                   new_clicks_c, new_clicks_z, rng=rng)
+
+    # end ensemble generation
+
+    def get_environment(self, i):
+        if self.seeds is None:
+            raise ValueError('The environments of a random ensemble are not tied to a seed')
+        return Environment(int(self.seeds[i]), n_features=self.n_features)
+
+    def get_features_combinations(self):
+        return self.combinations
+
+    def _per_comb(self, class_param, batch_dims):
+        # (n_envs, n_classes) -> (n_envs, 1 x batch_dims, n_combs)
+        per_comb = np.take_along_axis(class_param, self.comb_class, axis=1)
+        return self._expand(per_comb, batch_dims)
+
+    def _per_env(self, env_param, batch_dims):
+        # (n_envs,) -> (n_envs, 1 x batch_dims, 1)
+        return self._expand(env_param[:, None], batch_dims)
+
+    def _expand(self, param, batch_dims):
+        return param.reshape((len(self),) + (1,) * batch_dims + (param.shape[-1],))
+
+    def _batch_dims(self, *strategies):
+        n_dims = max(1, *(np.ndim(s) for s in strategies))
+        np.broadcast_shapes(*(np.shape(s) for s in strategies), (len(self),) + (1,) * (n_dims - 1))
+        return n_dims - 1
+
+    def _comb_mask(self, combinations):
+        if combinations is None:
+            return np.ones(len(self.combinations), dtype=bool)
+        return np.isin(np.arange(len(self.combinations)),
+                       [self.combinations.index(comb) for comb in combinations])
+
+    # start ensemble expected profit
+
+    def expected_profit(self, prices, bids, combinations=None):
+        # prices and bids must be broadcastable to (n_envs, *S) where S is an arbitrary batch
+        # of (price, bid) pairs, e.g. prices[None, :, None] and bids[None, None, :] for a grid.
+        # The result has shape (n_envs, *S).
+        batch_dims = self._batch_dims(prices, bids)
+        p = np.asarray(prices, dtype=np.float64)[..., None]
+        b = np.asarray(bids, dtype=np.float64)[..., None]
+
+        margin = p - self._per_env(self.item_base_prices, batch_dims)
+        win_probability = sigmoid(b, self._per_env(self.new_clicks_c, batch_dims),
+                                  self._per_env(self.new_clicks_z, batch_dims))
+        new_clicks = (self._expand(self.comb_likelihoods, batch_dims)
+                      * self._per_env(self.average_tot_auctions, batch_dims) * win_probability)
+        conversion_rate = sigmoid(-p, -self._per_comb(self.cr_centers, batch_dims),
+                                  self._per_comb(self.sigmoid_zs, batch_dims))
+        future_visits = self._per_comb(self.back_means, batch_dims)
+        cost_per_click = b * self._per_comb(self.cost_per_click_percs, batch_dims)
+
+        profit = new_clicks * (margin * conversion_rate * (1 + future_visits) - cost_per_click)
+
+        return np.sum(profit, axis=-1, where=self._comb_mask(combinations))
+
+    # end ensemble expected profit
+
+    def expected_profit_grid(self, prices, bids, combinations=None):
+        # (n_envs, n_prices, n_bids)
+        return self.expected_profit(np.asarray(prices)[None, :, None], np.asarray(bids)[None, None, :],
+                                    combinations)
+
+    def step1(self, prices, bids, combinations=None):
+        # Same separable search of algorithms.step1, done for every environment at once
+        prices, bids = np.asarray(prices, dtype=np.float64), np.asarray(bids, dtype=np.float64)
+        mask = self._comb_mask(combinations)
+
+        # (n_envs, n_prices)
+        p = prices[None, :, None]
+        conversion_rate = sigmoid(-p, -self._per_comb(self.cr_centers, 1), self._per_comb(self.sigmoid_zs, 1))
+        revenues = np.sum(self._expand(self.comb_likelihoods, 1) * (p - self._per_env(self.item_base_prices, 1))
+                          * conversion_rate * (1 + self._per_comb(self.back_means, 1)), axis=-1, where=mask)
+        opt_p_indices = np.argmax(revenues, axis=1)
+        optimal_prices = prices[opt_p_indices]
+
+        # (n_envs, n_bids)
+        cost_per_bid = np.sum(self.comb_likelihoods * np.take_along_axis(self.cost_per_click_percs,
+                                                                         self.comb_class, axis=1),
+                              axis=-1, where=mask)
+        optimal_revenues = revenues[np.arange(len(self)), opt_p_indices]
+        win_probability = sigmoid(bids[None, :], self.new_clicks_c[:, None], self.new_clicks_z[:, None])
+        bid_profits = win_probability * (optimal_revenues[:, None] - bids[None, :] * cost_per_bid[:, None])
+        optimal_bids = bids[np.argmax(bid_profits, axis=1)]
+
+        profits = self.expected_profit(optimal_prices, optimal_bids, combinations)
+
+        return optimal_prices, optimal_bids, profits
+
+    # start ensemble simulation
+
+    def simulate_days(self, n_days, pricing, bidding):
+        # pricing and bidding must be broadcastable to (n_envs, *S, n_combs) where S is an arbitrary
+        # batch of strategies. Every returned array has shape (n_days, n_envs, *S, n_combs), except
+        # the profit which is summed over the combinations.
+        prices = np.asarray(pricing, dtype=np.float64)
+        bids = np.asarray(bidding, dtype=np.float64)
+        strategy_shape = np.broadcast_shapes(prices.shape, bids.shape, (len(self), len(self.combinations)))
+        batch_dims = len(strategy_shape) - 2
+        shape = (n_days,) + strategy_shape
+
+        tot_auctions = self.rng.poisson(lam=self._per_env(self.average_tot_auctions, batch_dims)[..., 0],
+                                        size=shape[:-1])
+        auctions = self.rng.multinomial(tot_auctions, self._expand(self.comb_likelihoods, batch_dims))
+        win_probability = sigmoid(bids, self._per_env(self.new_clicks_c, batch_dims),
+                                  self._per_env(self.new_clicks_z, batch_dims))
+        new_clicks = self.rng.binomial(auctions, win_probability)
+
+        conversion_rate = sigmoid(-prices, -self._per_comb(self.cr_centers, batch_dims),
+                                  self._per_comb(self.sigmoid_zs, batch_dims))
+        purchases = self.rng.binomial(new_clicks, conversion_rate)
+        tot_cost = new_clicks * bids * self._per_comb(self.cost_per_click_percs, batch_dims)
+        new_future_visits = self.rng.poisson(purchases * self._per_comb(self.back_means, batch_dims))
+
+        margin = prices - self._per_env(self.item_base_prices, batch_dims)
+        profit = np.sum(margin * (purchases + new_future_visits) - tot_cost, axis=-1)
+
+        return auctions, new_clicks, purchases, tot_cost, new_future_visits, profit
+
+    # end ensemble simulation
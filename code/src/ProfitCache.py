@@ -0,0 +1,74 @@
+import functools
+import inspect
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Memoizes the expected profits and optima computed for one environment: the parameters of an
+# environment never change, so a result only depends on the function and its arguments.
+# The least recently used entries are evicted once max_size entries are stored.
+class ProfitCache:
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key_parts, compute):
+        key = tuple(self._hashable(k) for k in key_parts)
+
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        value = compute()
+        if isinstance(value, np.ndarray):
+            # shared between the callers, it must not be modified
+            value.flags.writeable = False
+
+        if self.max_size > 0:
+            self.entries[key] = value
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_hits(self):
+        return self.hits
+
+    def get_misses(self):
+        return self.misses
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _hashable(value):
+        # grids, combinations and scalars are identified by their values
+        if value is None or isinstance(value, str):
+            return value
+        value = np.asarray(value)
+        return value.dtype.str, value.shape, value.tobytes()
+
+
+def memoized(f):
+    # Decorates a function of algorithms whose first argument is the environment:
+    # the results are memoized by the profit cache of the environment
+    signature = inspect.signature(f)
+
+    @functools.wraps(f)
+    def wrapper(env, *args, **kwargs):
+        arguments = signature.bind(env, *args, **kwargs)
+        arguments.apply_defaults()
+        key_parts = (f.__name__,) + tuple(arguments.arguments.values())[1:]
+        return env.profit_cache.get(key_parts, lambda: f(*arguments.args, **arguments.kwargs))
+
+    return wrapper
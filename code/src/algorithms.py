@@ -1,5 +1,7 @@
 import numpy as np
 
+from src.ProfitCache import memoized
+
 
 # start simple class profit
 
@@ -22,33 +24,48 @@ def expected_profit_for_comb(env, p, b, comb):
 
 # start expected profit
 def expected_profit(env, p, b, combinations=None):
+    # p and b can be scalars or arrays broadcast together
+    profit_per_comb = expected_profit_per_comb(env, np.asarray(p)[..., None], np.asarray(b)[..., None])
+
+    return np.sum(profit_per_comb[..., env.get_comb_indices(combinations)], axis=-1)
+
+
+def expected_profit_per_comb(env, p, b):
+    # the last axis of the result runs over the combinations
     m = env.margin
-    n = env.distNewClicks.mean_per_comb(b)
+    n = env.distNewClicks.mean_per_comb_array(b)
     r = env.distClickConverted.mean
     f = env.distFutureVisits.mean
     k = env.distCostPerClick.mean
 
-    combs = combinations if combinations is not None else env.combinations
+    # parameters of the class of each combination
+    classes = env.comb_parameters
 
-    profit = sum(
-        simple_class_profit(margin=m(p),
-                            new_clicks=n[comb],
-                            conversion_rate=r(env.class_of_comb[comb], p),
-                            future_visits=f(env.class_of_comb[comb]),
-                            cost_per_click=k(env.class_of_comb[comb], b))
-        for comb in combs
-    )
-
-    return profit
+    return simple_class_profit(margin=m(p),
+                               new_clicks=n,
+                               conversion_rate=r(classes, p),
+                               future_visits=f(classes),
+                               cost_per_click=k(classes, b))
 
 
 # end expected profit
 
 
+@memoized
+def expected_profit_grid(env, prices, bids, combinations=None):
+    # Expected profit of every price, bid and combination: (n_prices, n_bids, n_combinations),
+    # the last axis follows the order of combinations (all of them by default).
+    # The result is memoized by the environment and read only.
+    profits = expected_profit_per_comb(env, np.asarray(prices)[:, None, None], np.asarray(bids)[None, :, None])
+
+    return profits[..., env.get_comb_indices(combinations)]
+
+
 def optimal_pricing_strategy_for_bid(env, prices, bid):
+    # The optimal price of a class does not depend on the bid (see step1)
     strategy = {}
     for c in env.classes:
-        opt_p = optimal_price_for_bid(env, prices, bid, combinations=c.features)
+        opt_p = prices[np.argmax(won_auction_revenue(env, prices, c.features))]
         for comb in c.features:
             strategy[comb] = opt_p
 
@@ -56,11 +73,17 @@ def optimal_pricing_strategy_for_bid(env, prices, bid):
 
 
 # start step 1
+@memoized
 def step1(env, prices, bids, combinations=None):
-    median_b = bids[len(bids) // 2]
+    # The expected profit factors as A * v(b) * (R(p) - b * K), where R(p) is the expected
+    # revenue of a won auction and K its expected cost per unit of bid. Since A * v(b) > 0
+    # the optimal price maximizes R(p) for any bid, then the optimal bid is found for that price.
+    revenues = won_auction_revenue(env, prices, combinations)
+    opt_p_index = np.argmax(revenues)
 
-    optimal_price = optimal_price_for_bid(env, prices, median_b, combinations)
-    optimal_bid = optimal_bid_for_price(env, bids, optimal_price, combinations)
+    optimal_price = prices[opt_p_index]
+    optimal_bid = optimal_bid_for_revenue(env, bids, revenues[opt_p_index],
+                                          won_auction_cost_per_bid(env, combinations))
 
     profit = expected_profit(env, optimal_price, optimal_bid, combinations)
 
@@ -71,18 +94,139 @@ def step1(env, prices, bids, combinations=None):
 
 # start step 1 support
 def optimal_price_for_bid(env, prices, bid, combinations=None):
-    opt_p_index = np.argmax([
-        expected_profit(env, p, bid, combinations=combinations)
-        for p in prices
-    ])
+    profits = np.sum(expected_profit_grid(env, prices, [bid], combinations), axis=-1)
+    opt_p_index = np.argmax(profits[:, 0])
 
     return prices[opt_p_index]
 
 
 def optimal_bid_for_price(env, bids, price, combinations=None):
-    opt_b_index = np.argmax([
-        expected_profit(env, price, b, combinations=combinations)
-        for b in bids
-    ])
+    profits = np.sum(expected_profit_grid(env, [price], bids, combinations), axis=-1)
+    opt_b_index = np.argmax(profits[0, :])
     return bids[opt_b_index]
+
+
+def won_auction_revenue(env, prices, combinations=None):
+    # R(p): expected revenue of a won auction for every price, cost excluded
+    classes = env.comb_parameters.take(env.get_comb_indices(combinations))
+    p = np.asarray(prices)[:, None]
+
+    revenues = simple_class_profit(margin=env.margin(p),
+                                   new_clicks=classes.likelihood,
+                                   conversion_rate=env.distClickConverted.mean(classes, p),
+                                   future_visits=env.distFutureVisits.mean(classes),
+                                   cost_per_click=0)
+    return np.sum(revenues, axis=-1)
+
+
+def won_auction_cost_per_bid(env, combinations=None):
+    # K: expected cost of a won auction per unit of bid
+    classes = env.comb_parameters.take(env.get_comb_indices(combinations))
+    return np.sum(classes.likelihood * env.distCostPerClick.mean(classes, 1))
+
+
+def optimal_bid_for_revenue(env, bids, revenue, cost_per_bid):
+    b = np.asarray(bids)
+    profits = env.distNewClicks.v(b) * (revenue - b * cost_per_bid)
+    return bids[np.argmax(profits)]
 # end step 1 support
+
+
+# Continuous optimization over the whole [min, max] ranges of prices and bids, the grids are
+# only used for their bounds (and as candidates if snap_to_grid is set)
+
+@memoized
+def step1_continuous(env, prices, bids, combinations=None, snap_to_grid=False):
+    # Same separable search of step1: the price maximizing R(p), then the bid maximizing
+    # v(b) * (R(p) - b * K). With snap_to_grid the best neighbouring grid values are returned.
+    revenue_derivatives = lambda p: won_auction_revenue_derivatives(env, p, combinations)
+    optimal_price = maximize_continuous(revenue_derivatives, np.min(prices), np.max(prices), prices)
+    if snap_to_grid:
+        optimal_price = snap_to_best(revenue_derivatives, prices, optimal_price)
+
+    revenue, _, _ = revenue_derivatives(optimal_price)
+    cost_per_bid = won_auction_cost_per_bid(env, combinations)
+    bid_profit_derivatives = lambda b: won_auction_profit_derivatives(env, b, revenue, cost_per_bid)
+    optimal_bid = maximize_continuous(bid_profit_derivatives, np.min(bids), np.max(bids), bids)
+    if snap_to_grid:
+        optimal_bid = snap_to_best(bid_profit_derivatives, bids, optimal_bid)
+
+    profit = expected_profit(env, optimal_price, optimal_bid, combinations)
+
+    return optimal_price, optimal_bid, profit
+
+
+def won_auction_revenue_derivatives(env, p, combinations=None):
+    # R(p), R'(p) and R''(p), element-wise on an array of prices
+    classes = env.comb_parameters.take(env.get_comb_indices(combinations))
+    p = np.asarray(p, dtype=np.float64)[..., None]
+
+    # d/dp sigmoid(-p, -c, z) = -z * cr * (1 - cr)
+    cr = env.distClickConverted.mean(classes, p)
+    d_cr = -classes.sigmoidZ * cr * (1 - cr)
+    dd_cr = classes.sigmoidZ ** 2 * cr * (1 - cr) * (1 - 2 * cr)
+
+    weight = classes.likelihood * (1 + env.distFutureVisits.mean(classes))
+    margin = env.margin(p)
+
+    return np.sum(weight * margin * cr, axis=-1), \
+        np.sum(weight * (cr + margin * d_cr), axis=-1), \
+        np.sum(weight * (2 * d_cr + margin * dd_cr), axis=-1)
+
+
+def won_auction_profit_derivatives(env, b, revenue, cost_per_bid):
+    # g(b) = v(b) * (R - b * K) with its first and second derivatives, element-wise on an array of bids
+    b = np.asarray(b, dtype=np.float64)
+    z = env.distNewClicks.new_clicks_z
+
+    v = env.distNewClicks.v(b)
+    d_v = z * v * (1 - v)
+    dd_v = z ** 2 * v * (1 - v) * (1 - 2 * v)
+    net = revenue - b * cost_per_bid
+
+    return v * net, d_v * net - cost_per_bid * v, dd_v * net - 2 * cost_per_bid * d_v
+
+
+def maximize_continuous(f, low, high, grid=None, n_coarse=16, max_iter=50):
+    # f(x) returns the value, first and second derivative (element-wise on arrays).
+    # The best point of a coarse grid brackets the maximum, which is then refined with
+    # Newton steps on the first derivative, falling back to bisection when a step leaves the bracket.
+    # The coarse grid is n_coarse equispaced points merged with the points of grid (e.g. the discrete
+    # prices or bids), so it is at least as fine as the discrete grid: the result is never worse than
+    # the best grid point, even when the peak is narrower than n_coarse points can resolve
+    xs = np.linspace(low, high, n_coarse)
+    if grid is not None:
+        xs = np.union1d(xs, np.clip(grid, low, high))
+    values, _, _ = f(xs)
+    i = np.argmax(values)
+    best = xs[i]
+    a, c = xs[max(i - 1, 0)], xs[min(i + 1, len(xs) - 1)]
+
+    x = best
+    for _ in range(max_iter):
+        _, d1, d2 = f(x)
+        if d1 > 0:
+            a = x
+        else:
+            c = x
+
+        x_new = x - d1 / d2 if d2 < 0 else None
+        if x_new is None or not a < x_new < c:
+            x_new = (a + c) / 2
+        if x_new == x or c - a <= np.finfo(np.float64).eps * max(1.0, abs(x)):
+            break
+        x = x_new
+
+    # the maximum can be on a bound of the bracket
+    candidates = np.array([a, x, c, best])
+    values, _, _ = f(candidates)
+    return candidates[np.argmax(values)]
+
+
+def snap_to_best(f, grid, x):
+    # best between the values of the (sorted) grid surrounding x
+    grid = np.asarray(grid)
+    i = np.searchsorted(grid, x)
+    candidates = grid[[max(i - 1, 0), min(i, len(grid) - 1)]]
+    values, _, _ = f(candidates)
+    return candidates[np.argmax(values)]
@@ -0,0 +1,126 @@
+import copy
+
+import numpy as np
+
+
+# Columnar store of the per-round samples of the arms of a learner (new clicks, purchases, future visits...).
+# Every series keeps, for all the arms together, the prefix sums of the samples in a preallocated
+# (*arm_shape, capacity + 1) array, doubled when an arm fills it, along with the number of samples and the
+# running total of every arm. Totals, averages and the sum of the first k samples of every arm are then
+# computed in O(arms), whatever the length of the history; the samples are differences of prefix sums.
+# An arm is an index of arm_shape, e.g. a price, a (price, bid) pair or a (combination, price) pair; the
+# indices of the first dimension can be given labels (e.g. the feature combinations).
+# Sets of indices of the first dimension (e.g. the combinations of a context) are bitmasks: the totals of
+# the rows of a bitmask, per arm of the other dimensions, are kept up to date on every append once requested.
+# A branch of the statistics (see copy_on_write) shares the prefix sums until its first append to them.
+class ArmStatistics:
+    def __init__(self, arm_shape, series, labels=None, capacity: int = 64):
+        self.arm_shape = tuple(np.atleast_1d(arm_shape))
+        self.series = list(series)
+        self.label_index = {label: i for i, label in enumerate(labels or [])}
+
+        self.counts = {s: np.zeros(self.arm_shape, dtype=np.int64) for s in self.series}
+        self.totals = {s: np.zeros(self.arm_shape) for s in self.series}
+        self.prefix_sums = {s: np.zeros((*self.arm_shape, capacity + 1)) for s in self.series}
+        # series whose prefix sums are shared with another copy (see copy_on_write)
+        self.shared_series = set()
+        self.masked_totals = {}
+        # rows of every registered bitmask, as a boolean array over the first dimension
+        self.mask_rows = {}
+
+    def _grow(self, series, size: int):
+        old = self.prefix_sums[series]
+        capacity = old.shape[-1] - 1
+        if size <= capacity and series not in self.shared_series:
+            return
+
+        while capacity < size:
+            capacity *= 2
+        new = np.zeros((*self.arm_shape, capacity + 1))
+        new[..., :old.shape[-1]] = old
+        self.prefix_sums[series] = new
+        self.shared_series.discard(series)
+
+    def copy_on_write(self):
+        # A copy sharing the prefix sums, each of the two copies those of a series before its next append
+        # to it. The counts and totals, of the size of the arms, are copied right away.
+        self.shared_series = set(self.series)
+        res = copy.copy(self)
+        res.shared_series = set(self.series)
+        res.counts = {s: c.copy() for s, c in self.counts.items()}
+        res.totals = {s: t.copy() for s, t in self.totals.items()}
+        res.prefix_sums = dict(self.prefix_sums)
+        res.masked_totals = {k: t.copy() for k, t in self.masked_totals.items()}
+        res.mask_rows = dict(self.mask_rows)
+        return res
+
+    def get_label_indices(self, labels):
+        return [self.label_index[label] for label in labels]
+
+    def get_mask(self, labels):
+        # bitmask of the indices of the given labels
+        return sum(1 << i for i in self.get_label_indices(labels))
+
+    @staticmethod
+    def _index(arms):
+        return arms if isinstance(arms, tuple) else (arms,)
+
+    def append(self, series, arms, values):
+        # One new sample for each of the given arms: arms is an index of arm_shape (a tuple of ints or of
+        # index arrays, or an int for a single dimension), the arms it selects must be distinct
+        arms = self._index(arms)
+        counts = self.counts[series]
+        n = counts[arms]
+        self._grow(series, int(np.max(n)) + 1)
+
+        totals = self.totals[series]
+        totals[arms] += values
+        self.prefix_sums[series][(*arms, n + 1)] = totals[arms]
+        counts[arms] += 1
+
+        for (s, mask), masked_totals in self.masked_totals.items():
+            if s == series:
+                self._update_masked_totals(masked_totals, self.mask_rows[mask], arms, values)
+
+    @staticmethod
+    def _update_masked_totals(masked_totals, mask_rows, arms, values):
+        rows = np.atleast_1d(arms[0])
+        in_mask = mask_rows[rows]
+        if np.any(in_mask):
+            other_dims = tuple(np.broadcast_to(a, rows.shape)[in_mask] for a in arms[1:])
+            np.add.at(masked_totals, other_dims, np.broadcast_to(values, rows.shape)[in_mask])
+
+    def get_counts(self, series):
+        return self.counts[series]
+
+    def get_totals(self, series):
+        return self.totals[series]
+
+    def get_masked_totals(self, series, mask):
+        # totals of the rows of the first dimension in mask, per arm of the other dimensions.
+        # The array is updated in place by the following appends
+        if (series, mask) not in self.masked_totals:
+            # setdefault: the first of concurrent readers registers the rows and the totals
+            rows = self.mask_rows.setdefault(mask, np.array([mask >> i & 1 for i in range(self.arm_shape[0])],
+                                                            dtype=bool))
+            self.masked_totals.setdefault((series, mask), np.sum(self.totals[series][rows], axis=0))
+        return self.masked_totals[(series, mask)]
+
+    def get_averages(self, series):
+        return self.totals[series] / self.counts[series]
+
+    def get_prefix_sums(self, series, n_samples):
+        # sum of the first n_samples[arm] samples of every arm, n_samples: (*arm_shape) array
+        n_samples = np.broadcast_to(n_samples, self.arm_shape)
+        return np.take_along_axis(self.prefix_sums[series], n_samples[..., None], axis=-1)[..., 0]
+
+    def get_nth_samples(self, series, arms, n):
+        # sample number n (from 0) of every given arm
+        arms = self._index(arms)
+        prefix_sums = self.prefix_sums[series]
+        return prefix_sums[(*arms, n + 1)] - prefix_sums[(*arms, n)]
+
+    def get_samples(self, series, arms):
+        # samples of a single arm, in order
+        arms = self._index(arms)
+        return np.diff(self.prefix_sums[series][arms][:self.counts[series][arms] + 1])
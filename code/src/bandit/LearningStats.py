@@ -39,3 +39,24 @@ def plot_results(names, rewards, clairvoyant, n_rounds, smooth=False, dest_file_
         plt.show()
     else:
         plt.savefig(dest_file_path)
+
+
+def plot_replica_results(names, results, confidence=0.95, dest_file_path=None):
+    # mean cumulative regret of every ReplicaResults, with its confidence band
+    fig, ax = plt.subplots(1, 1, constrained_layout=True)
+    ax.set_title(f"Regret (mean over the replicas, {confidence:.0%} confidence band)")
+
+    for name, result in zip(names, results):
+        mean = result.get_mean_cumulative_regrets()
+        lower, upper = result.get_regret_confidence_band(confidence)
+        x = np.arange(len(mean))
+
+        ax.plot(x, mean, label=f'{name} ({result.get_n_replicas()} replicas)')
+        ax.fill_between(x, lower, upper, alpha=0.3)
+
+    ax.legend()
+
+    if dest_file_path is None:
+        plt.show()
+    else:
+        plt.savefig(dest_file_path)
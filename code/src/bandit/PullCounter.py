@@ -0,0 +1,44 @@
+import numpy as np
+
+
+# Number of pulls of every arm (an index of arm_shape, e.g. (price, bid)), updated in O(1) per round.
+# The arm of every round is kept along with a snapshot of the counts every snapshot_interval rounds, so
+# the counts after any round are a snapshot plus at most snapshot_interval pulls.
+class PullCounter:
+    def __init__(self, arm_shape, snapshot_interval: int = 256):
+        self.arm_shape = tuple(np.atleast_1d(arm_shape))
+        self.snapshot_interval = snapshot_interval
+
+        self.n_rounds = 0
+        self.counts = np.zeros(self.arm_shape, dtype=np.int64)
+        # flat index of the arm of every round, preallocated and doubled when full
+        self.pulls = np.empty(snapshot_interval, dtype=np.int64)
+        self.snapshots = [self.counts.copy()]
+
+    def record(self, arm):
+        arm = arm if isinstance(arm, tuple) else (arm,)
+        if self.n_rounds == len(self.pulls):
+            pulls = np.empty(2 * len(self.pulls), dtype=np.int64)
+            pulls[:self.n_rounds] = self.pulls
+            self.pulls = pulls
+
+        self.pulls[self.n_rounds] = np.ravel_multi_index(arm, self.arm_shape)
+        self.counts[arm] += 1
+        self.n_rounds += 1
+        if not self.n_rounds % self.snapshot_interval:
+            self.snapshots.append(self.counts.copy())
+
+    def get_n_rounds(self):
+        return self.n_rounds
+
+    def get_counts(self, n_rounds: int = None):
+        # number of pulls of every arm in the first n_rounds rounds (all of them by default)
+        if n_rounds is None or n_rounds == self.n_rounds:
+            return self.counts.copy()
+        if not 0 <= n_rounds <= self.n_rounds:
+            raise ValueError(f'Round {n_rounds} not in [0, {self.n_rounds}]')
+
+        snapshot = n_rounds // self.snapshot_interval
+        last_pulls = self.pulls[snapshot * self.snapshot_interval:n_rounds]
+        return self.snapshots[snapshot] + \
+            np.bincount(last_pulls, minlength=self.counts.size).reshape(self.arm_shape)
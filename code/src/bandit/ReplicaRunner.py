@@ -0,0 +1,81 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.random import SeedSequence
+from scipy.stats import norm
+
+from src.Environment import Environment
+
+
+# Runs n_replicas independent (Environment, bandit environment, learner) triples, possibly on a
+# process pool. make_replica(env) returns the bandit environment and the learner of a replica; it
+# must be a module level function so that it can be sent to the worker processes.
+# Every replica gets its own child of a single SeedSequence for the simulation streams, so the
+# results only depend on the seeds and not on the number of workers or on the scheduling.
+# If random_seed is given all the replicas share the same environment parameters, otherwise every
+# replica draws its own environment.
+class ReplicaRunner:
+    def __init__(self, make_replica, n_rounds: int, n_replicas: int, random_seed=None, seed=None, n_workers=None):
+        self.make_replica = make_replica
+        self.n_rounds = n_rounds
+        self.n_replicas = n_replicas
+        self.random_seed = random_seed
+        self.seed_sequence = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+        self.replica_seeds = self.seed_sequence.spawn(n_replicas)
+        self.n_workers = n_workers
+
+    def run(self):
+        jobs = [(self.make_replica, self.n_rounds, self.random_seed, replica_seed)
+                for replica_seed in self.replica_seeds]
+
+        if self.n_workers == 1:
+            curves = [run_replica(job) for job in jobs]
+        else:
+            n_workers = self.n_workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                chunk_size = max(1, self.n_replicas // (4 * n_workers))
+                curves = list(executor.map(run_replica, jobs, chunksize=chunk_size))
+
+        profits, regrets, clairvoyant = (np.array(c) for c in zip(*curves))
+        return ReplicaResults(profits, regrets, clairvoyant)
+
+
+def run_replica(job):
+    make_replica, n_rounds, random_seed, replica_seed = job
+
+    if random_seed is None:
+        random_seed = int(replica_seed.generate_state(1)[0])
+    env = Environment(random_seed=random_seed, stream_seed=replica_seed)
+
+    bandit_env, learner = make_replica(env)
+    learner.learn(n_rounds)
+
+    tracker = bandit_env.get_regret_tracker()
+    return tracker.get_cumulative_profits()[:n_rounds].copy(), tracker.get_cumulative_regrets()[:n_rounds].copy(), \
+        tracker.get_clairvoyant_cumulative_profits()[:n_rounds]
+
+
+# Cumulative curves of every replica, (n_replicas, n_rounds), with their mean and confidence bands
+class ReplicaResults:
+    def __init__(self, cumulative_profits, cumulative_regrets, clairvoyant_cumulative_profits):
+        self.cumulative_profits = cumulative_profits
+        self.cumulative_regrets = cumulative_regrets
+        self.clairvoyant_cumulative_profits = clairvoyant_cumulative_profits
+
+    def get_n_replicas(self):
+        return len(self.cumulative_regrets)
+
+    def get_mean_cumulative_profits(self):
+        return np.mean(self.cumulative_profits, axis=0)
+
+    def get_mean_cumulative_regrets(self):
+        return np.mean(self.cumulative_regrets, axis=0)
+
+    def get_regret_confidence_band(self, confidence: float = 0.95):
+        # normal approximation of the confidence interval of the mean cumulative regret of every round
+        mean = self.get_mean_cumulative_regrets()
+        std_err = np.std(self.cumulative_regrets, axis=0, ddof=1) / np.sqrt(self.get_n_replicas()) \
+            if self.get_n_replicas() > 1 else np.zeros_like(mean)
+        half_width = norm.ppf(0.5 + confidence / 2) * std_err
+        return mean - half_width, mean + half_width
@@ -0,0 +1,76 @@
+import numpy as np
+from scipy.stats import norm
+
+
+# Safety constraint of the bid learners: an arm is safe if its expected profit is positive even when its
+# new clicks are at a low quantile (the security level) of their distribution.
+# The new clicks of every arm (of shape arms_shape, e.g. (n_contexts, n_bids)) are summarized online, so
+# that the lower quantiles and the safe-arm mask of all the arms are computed in a single expression:
+#   - risk_measure='normal': Welford running mean and variance, the quantile of the normal distribution
+#     with the same moments (the z-score of the security level is computed once);
+#   - risk_measure='empirical': histogram of the (integer) samples, the empirical quantile.
+# default_std is the standard deviation used for the arms whose samples are all equal (None: these arms
+# are never safe); if non_negative the lower quantiles are clipped at zero.
+class SafetyConstraint:
+    def __init__(self, arms_shape, security: float, risk_measure='normal', default_std=None, non_negative=False):
+        if risk_measure not in ['normal', 'empirical']:
+            raise ValueError(f'Unknown risk measure: {risk_measure}')
+
+        self.arms_shape = tuple(np.atleast_1d(arms_shape))
+        self.security = security
+        self.risk_measure = risk_measure
+        self.default_std = default_std
+        self.non_negative = non_negative
+        self.z_score = norm.ppf(security)
+
+        self.n_samples = np.zeros(self.arms_shape, dtype=np.int64)
+        self.means = np.zeros(self.arms_shape)
+        self.m2 = np.zeros(self.arms_shape)
+        self.histograms = np.zeros((*self.arms_shape, 1), dtype=np.int64)
+
+    def update(self, arms, values):
+        # one new sample for each of the given (distinct) arms, arms is an index of arms_shape
+        values = np.asarray(values, dtype=np.float64)
+        self.n_samples[arms] += 1
+        delta = values - self.means[arms]
+        self.means[arms] += delta / self.n_samples[arms]
+        self.m2[arms] += delta * (values - self.means[arms])
+
+        if self.risk_measure == 'empirical':
+            values = values.astype(np.int64)
+            if np.max(values) >= self.histograms.shape[-1]:
+                histograms = np.zeros((*self.arms_shape, 2 * int(np.max(values)) + 1), dtype=np.int64)
+                histograms[..., :self.histograms.shape[-1]] = self.histograms
+                self.histograms = histograms
+            index = arms if isinstance(arms, tuple) else (arms,)
+            self.histograms[(*index, values)] += 1
+
+    def get_means(self):
+        return np.where(self.n_samples > 0, self.means, np.nan)
+
+    def get_std_devs(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std_devs = np.sqrt(self.m2 / self.n_samples)
+        if self.default_std is not None:
+            std_devs = np.where(std_devs > 0, std_devs, self.default_std)
+        return np.where(std_devs > 0, std_devs, np.nan)
+
+    def get_lower_bounds(self):
+        # new clicks of every arm at the security level
+        if self.risk_measure == 'normal':
+            lower_bounds = self.get_means() + self.z_score * self.get_std_devs()
+        else:
+            # smallest value whose empirical cdf reaches the security level
+            cdf = np.cumsum(self.histograms, axis=-1)
+            reached = cdf >= self.security * self.n_samples[..., None]
+            lower_bounds = np.where(self.n_samples > 0, np.argmax(reached, axis=-1), np.nan)
+
+        if self.non_negative:
+            lower_bounds = np.where(lower_bounds > 0, lower_bounds, 0)
+        return lower_bounds
+
+    def compute_safe_arms(self, expected_profits_function, lower_bounds=None):
+        # expected_profits_function(new_clicks): expected profits of the arms for the given new clicks
+        lower_bounds = self.get_lower_bounds() if lower_bounds is None else lower_bounds
+        with np.errstate(invalid='ignore'):
+            return expected_profits_function(lower_bounds) > 0
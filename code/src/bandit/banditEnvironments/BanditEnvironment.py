@@ -0,0 +1,183 @@
+import numpy as np
+
+from src.Environment import Environment
+from src.checkpoint import save_object_state, load_object_state
+from src.fork import fork
+from src.bandit.banditEnvironments.DelayModels import DelayModel, FixedDelay
+from src.bandit.banditEnvironments.FutureVisitsCalendar import FutureVisitsCalendar
+from src.bandit.banditEnvironments.RegretTracker import RegretTracker
+
+
+# Everything observed by a learner after one pull, as arrays indexed by combination (struct of arrays).
+# arms has one row per dimension of the arm (e.g. price and bid), matured_arms are the arms of the round
+# whose future visits matured now (EMPTY_ARM during the first future_visits_delay rounds) and
+# arrived_visits and arrived_exposure are the future visits arrived in this round and their exposure,
+# indexed by arm (see FutureVisitsCalendar).
+# The matured and arrived arrays are buffers of the environment, overwritten by the next pull.
+# A batch of several days has a leading day axis on every array.
+class DayBatch:
+    def __init__(self, arms, auctions, new_clicks, purchases, tot_cost, matured_arms, matured_visits,
+                 arrived_visits, arrived_exposure):
+        self.arms = arms
+        self.auctions = auctions
+        self.new_clicks = new_clicks
+        self.purchases = purchases
+        self.tot_cost = tot_cost
+        self.matured_arms = matured_arms
+        self.matured_visits = matured_visits
+        self.arrived_visits = arrived_visits
+        self.arrived_exposure = arrived_exposure
+
+    def has_matured(self):
+        return not FutureVisitsCalendar.is_empty(self.matured_arms)
+
+    def get_n_days(self):
+        return len(self.auctions)
+
+    def day(self, i: int):
+        # Only for batches of several days: the batch of the i-th day, as views
+        return DayBatch(self.arms[i], self.auctions[i], self.new_clicks[i], self.purchases[i], self.tot_cost[i],
+                        self.matured_arms[i], self.matured_visits[i], self.arrived_visits[i], self.arrived_exposure[i])
+
+
+# Base bandit environment: a strategy is an integer array of arms with shape (n_arm_dims, n_combinations),
+# or (n_arm_dims,) to pull the same arms for every combination. The subclasses only map arms to prices
+# and bids, and expose the historical dict based pulls as views over pull
+class BanditEnvironment:
+    n_arm_dims = 1
+
+    def __init__(self, environment: Environment, future_visits_delay: int, delay_model: DelayModel = None,
+                 discriminating: bool = False):
+        self.rng = environment.rng
+        self.env = environment
+        self.future_visits_delay = future_visits_delay
+        self.combinations = environment.get_features_combinations()
+        n_combs = len(self.combinations)
+        comb_arm_profits = self.get_comb_arm_profits()
+
+        # The visits of a round are complete after future_visits_delay rounds, the delay model spreads
+        # their arrivals over the rounds in between (by default they all arrive at the end)
+        self.delay_model = delay_model if delay_model is not None else FixedDelay()
+        if self.delay_model.rng is None:
+            self.delay_model.rng = environment.rng.spawn(1)[0]
+        self.future_visits_calendar = FutureVisitsCalendar(self.delay_model, future_visits_delay, n_combs,
+                                                           arm_shape=comb_arm_profits.shape[:-1])
+        # The regret is measured against the best single strategy, or against the optimum of every customer
+        # class on its own for the learners that discriminate the classes
+        self.discriminating = discriminating
+        clairvoyant_profit = self.get_clairvoyant_optimal_expected_profit_discriminating() if discriminating \
+            else self.get_clairvoyant_optimal_expected_profit_not_discriminating()
+        self.regret_tracker = RegretTracker(comb_arm_profits, clairvoyant_profit)
+        self.last_batch = None
+        self.current_round = 0
+        self.reset_state()
+
+    def reset_state(self):
+        self.future_visits_calendar.reset()
+        self.regret_tracker.reset()
+        self.last_batch = None
+        self.current_round = 0
+
+    def arms_to_values(self, arms):
+        # (n_arm_dims, n_combinations) arms -> (prices, bids) arrays
+        raise NotImplementedError
+
+    def get_comb_arm_profits(self):
+        # expected profit of every arm for every combination, (n arms per arm dimension..., n_combinations)
+        raise NotImplementedError
+
+    def get_clairvoyant_optimal_expected_profit_not_discriminating(self):
+        raise NotImplementedError
+
+    def get_clairvoyant_optimal_expected_profit_discriminating(self):
+        raise NotImplementedError
+
+    def strategy_to_arms(self, *arm_strategies):
+        # one arm strategy (dict by combination, array or single arm) per dimension of the arm
+        return np.array([np.broadcast_to(self.env.strategy_to_array(s), len(self.combinations))
+                         for s in arm_strategies], dtype=np.int64)
+
+    def arms_to_strategy(self, arms):
+        return {c: int(a) for c, a in zip(self.combinations, arms)}
+
+    def broadcast_arms(self, arms):
+        return np.broadcast_to(np.asarray(arms, dtype=np.int64).reshape(self.n_arm_dims, -1),
+                               (self.n_arm_dims, len(self.combinations)))
+
+    def pull(self, arms):
+        arms = self.broadcast_arms(arms)
+        prices, bids = self.arms_to_values(arms)
+
+        auctions, new_clicks, purchases, tot_cost, new_future_visits, _ = \
+            self.env.simulate_one_day_arrays(prices, bids)
+
+        self.future_visits_calendar.schedule(arms, purchases, new_future_visits)
+        arrived_visits, arrived_exposure, matured_arms, matured_visits = self.future_visits_calendar.pop()
+        self.regret_tracker.record(arms)
+
+        self.current_round += 1
+        self.last_batch = DayBatch(arms, auctions, new_clicks, purchases, tot_cost,
+                                   matured_arms, matured_visits, arrived_visits, arrived_exposure)
+
+        return self.last_batch
+
+    def pull_arms_for_days(self, arms, n_days: int):
+        # Pulls the same arms for n_days rounds. Only with the aggregate sampling of the environment are
+        # the days simulated in one vectorized call (see Environment.simulate_days); by default they are
+        # simulated day by day, drawing the same random stream as n_days single pulls.
+        # Returns a DayBatch with a leading day axis; the future visits of all the days are scheduled in
+        # one call to the calendar, which matures them as with n_days single pulls.
+        arms = self.broadcast_arms(arms)
+        prices, bids = self.arms_to_values(arms)
+
+        if self.env.aggregate_sampling:
+            auctions, new_clicks, purchases, tot_cost, new_future_visits, _ = \
+                self.env.simulate_days(n_days, prices, bids)
+        else:
+            days = [self.env.simulate_one_day_arrays(prices, bids) for _ in range(n_days)]
+            auctions, new_clicks, purchases, tot_cost, new_future_visits = \
+                (np.array(data) for data in list(zip(*days))[:5])
+
+        arrived_visits, arrived_exposure, matured_arms, matured_visits = \
+            self.future_visits_calendar.schedule_days(arms, purchases, new_future_visits)
+        self.regret_tracker.record(arms, n_days)
+
+        self.current_round += n_days
+        self.last_batch = DayBatch(np.broadcast_to(arms, (n_days,) + arms.shape), auctions, new_clicks, purchases,
+                                   tot_cost, matured_arms, matured_visits, arrived_visits, arrived_exposure)
+
+        return self.last_batch
+
+    def fork(self):
+        # Independent branch of this bandit environment and of its environment (see src.fork)
+        return fork(self, self.env)
+
+    def get_shared_objects(self):
+        return {'env': self.env, 'rng': self.rng, 'delay_model': self.delay_model}
+
+    def save_state(self, file_path):
+        # Pending delayed feedback, regret curves and the state of the generator of the delay model
+        # (the environment and its generator are saved by Environment.save_state)
+        save_object_state(self, file_path, self.get_shared_objects(),
+                          extra=self.delay_model.rng.bit_generator.state)
+
+    def load_state(self, file_path):
+        self.delay_model.rng.bit_generator.state = load_object_state(self, file_path, self.get_shared_objects())
+
+    def get_last_arrivals(self):
+        # Future visits arrived in the last round, possibly a part of those of their round, summed over the
+        # combinations: {arm: (visits, exposure)} for the arms whose visits were expected in the round
+        if self.last_batch is None:
+            return {}
+        visits, exposure = self.last_batch.arrived_visits, self.last_batch.arrived_exposure
+        return {(arm if len(arm) > 1 else arm[0]): (int(visits[arm]), float(exposure[arm]))
+                for arm in zip(*(a.tolist() for a in np.nonzero(exposure)))}
+
+    def get_last_batch(self):
+        return self.last_batch
+
+    def get_regret_tracker(self):
+        return self.regret_tracker
+
+    def get_features_combinations(self):
+        return self.combinations
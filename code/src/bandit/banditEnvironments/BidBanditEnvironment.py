@@ -1,74 +1,46 @@
 import numpy as np
 
 from src.Environment import Environment
-from src.algorithms import optimal_bid_for_price, expected_profit
+from src.bandit.banditEnvironments.BanditEnvironment import BanditEnvironment
+from src.bandit.banditEnvironments.DelayModels import DelayModel
+from src.algorithms import optimal_bid_for_price, expected_profit_grid
 
 
-class BidBanditEnvironment:
-    def __init__(self, environment: Environment, price, bids, future_visits_delay: int):
+class BidBanditEnvironment(BanditEnvironment):
+    def __init__(self, environment: Environment, price, bids, future_visits_delay: int,
+                 delay_model: DelayModel = None, discriminating: bool = False):
         # Init local vars
-        self.rng = environment.rng
-
         self.n_arms = len(bids)
         self.price = price
         self.bids = bids
-        self.env = environment
-        self.future_visits_delay = future_visits_delay
 
-        self.future_visits_queue = None
-        self.reset_state()
+        super().__init__(environment, future_visits_delay, delay_model, discriminating)
 
-        self.current_round = 0
+    def arms_to_values(self, arms):
+        return self.price, np.asarray(self.bids)[arms[0]]
 
-    def reset_state(self):
-        self.future_visits_queue = [(None, {comb: 0 for comb in
-                                            self.env.get_features_combinations()})] * self.future_visits_delay
+    def get_comb_arm_profits(self):
+        return expected_profit_grid(self.env, [self.price], self.bids)[0]
 
     def pull_arm_not_discriminating(self, arm: int):
-        arm_strategy = {comb: arm for comb in self.env.get_features_combinations()}
-
-        auctions, new_clicks, purchases, tot_cost_per_clicks, \
-            (past_arm_strategy, past_future_visits) = self._inner_pull_arm(arm_strategy)
-
-        past_pulled_arm = None if past_arm_strategy is None else past_arm_strategy[(False, False)]
-
-        return sum(auctions.values()), sum(new_clicks.values()), sum(purchases.values()), sum(tot_cost_per_clicks.values()), \
-            (past_pulled_arm, sum(past_future_visits.values()))
-
-    def _inner_pull_arm(self, arm_strategy):
-        bidding_strategy = {c: self.bids[a] for c, a in arm_strategy.items()}
+        batch = self.pull(arm)
 
-        auctions, new_clicks, purchases, tot_cost_per_clicks, \
-            new_future_visits, _ = self.env.simulate_one_day_fixed_price(self.price, bidding_strategy)
+        past_pulled_arm = int(batch.matured_arms[0, 0]) if batch.has_matured() else None
 
-        self.future_visits_queue.append((arm_strategy, new_future_visits))
-        past_future_visits = self.future_visits_queue.pop(0)
-
-        self.current_round += 1
-
-        return auctions, new_clicks, purchases, tot_cost_per_clicks, past_future_visits
+        return np.sum(batch.auctions), np.sum(batch.new_clicks), np.sum(batch.purchases), np.sum(batch.tot_cost), \
+            (past_pulled_arm, np.sum(batch.matured_visits))
 
     def margin(self):
         return self.env.margin(self.price)
 
-    def get_features_combinations(self):
-        return self.env.get_features_combinations()
-
     def get_clairvoyant_best_bid_not_discriminating(self):
         optimal_bid = optimal_bid_for_price(self.env, self.bids, self.price)
         return optimal_bid
 
     def get_clairvoyant_optimal_expected_profit_not_discriminating(self):
-        optimal_bid = self.get_clairvoyant_best_bid_not_discriminating()
-        round_profit = expected_profit(self.env, self.price, optimal_bid)
-        return round_profit
+        arm_profits = np.sum(self.get_comb_arm_profits(), axis=-1)
+        return np.max(arm_profits)
 
     def get_clairvoyant_cumulative_profits_not_discriminating(self, n_rounds):
         round_profit = self.get_clairvoyant_optimal_expected_profit_not_discriminating()
         return np.cumsum([round_profit] * n_rounds)
-
-    def get_learner_cumulative_profit_not_discriminating(self, pulled_arms):
-        pulled_bids = [self.bids[i] for i in pulled_arms[:-self.future_visits_delay]]
-        profits = [expected_profit(self.env, self.price, bid) for bid in pulled_bids]
-
-        return np.cumsum(profits)
@@ -0,0 +1,62 @@
+import numpy as np
+from numpy.random import Generator
+
+
+# Distributions of the lag (in rounds) between a purchase and its future visits. The lags are
+# bounded by the max delay of the bandit environment: pmf(max_delay) has one entry per lag in
+# [0, max_delay]. spread() scatters the visits of every combination over the lags.
+# Without a generator, the bandit environment gives the model a child of the generator of its
+# environment, so seeded runs stay reproducible.
+class DelayModel:
+    def __init__(self, rng: Generator = None):
+        self.rng = rng
+
+    def pmf(self, max_delay: int):
+        raise NotImplementedError
+
+    def spread(self, visits, pmf):
+        # (n_combinations,) -> (n_combinations, max_delay + 1)
+        return self.rng.multinomial(visits, pmf)
+
+
+# Every visit comes back exactly max_delay rounds later, as in the original environments.
+# Deterministic: it doesn't draw from its generator.
+class FixedDelay(DelayModel):
+    def pmf(self, max_delay: int):
+        pmf = np.zeros(max_delay + 1)
+        pmf[max_delay] = 1
+        return pmf
+
+    def spread(self, visits, pmf):
+        return np.outer(visits, pmf).astype(np.int64)
+
+
+# Each visit comes back after a Geometric(p) number of rounds (at least one), truncated at max_delay
+class GeometricDelay(DelayModel):
+    def __init__(self, p: float, rng: Generator = None):
+        super().__init__(rng=rng)
+        self.p = p
+
+    def pmf(self, max_delay: int):
+        if max_delay == 0:
+            return np.ones(1)
+
+        lags = np.arange(1, max_delay + 1)
+        pmf = np.zeros(max_delay + 1)
+        pmf[1:] = self.p * (1 - self.p) ** (lags - 1)
+        return pmf / np.sum(pmf)
+
+
+# Lag distribution proportional to the given weights, the i-th weight being the lag of i rounds
+class EmpiricalDelay(DelayModel):
+    def __init__(self, weights, rng: Generator = None):
+        super().__init__(rng=rng)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+    def pmf(self, max_delay: int):
+        if len(self.weights) > max_delay + 1:
+            raise ValueError(f'The empirical lags exceed the max delay of {max_delay} rounds')
+
+        pmf = np.zeros(max_delay + 1)
+        pmf[:len(self.weights)] = self.weights
+        return pmf / np.sum(pmf)
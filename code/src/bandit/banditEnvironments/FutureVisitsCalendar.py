@@ -0,0 +1,107 @@
+import numpy as np
+
+from src.bandit.banditEnvironments.DelayModels import DelayModel
+
+
+# Event time indexed accumulator of the future visits spread over the next max_delay rounds.
+# visits[arrival slot, arm] holds the visits generated by the arm which arrive in the arrival round, summed
+# over the combinations and the origin rounds, rounds being mapped to slots of a ring modulo max_delay + 1
+# (exposure likewise for the purchases whose visits are expected in the arrival round). Scattering the
+# visits of a round is a single bincount, and collecting the arrivals of a round reads one row.
+# The ring also keeps the arms and the total visits of every origin round: a round is complete, or
+# matured, max_delay rounds later, when its slot is about to be reused.
+class FutureVisitsCalendar:
+    EMPTY_ARM = -1
+
+    def __init__(self, delay_model: DelayModel, max_delay: int, n_combinations: int, arm_shape):
+        self.delay_model = delay_model
+        self.pmf = delay_model.pmf(max_delay)
+        self.lags = np.flatnonzero(self.pmf)
+        self.n_slots = max_delay + 1
+        self.arm_shape = tuple(arm_shape)
+        n_arms = int(np.prod(self.arm_shape))
+
+        # arrivals per arrival slot and (flat) arm
+        self.visits = np.zeros((self.n_slots, n_arms), dtype=np.int64)
+        self.exposure = np.zeros((self.n_slots, n_arms))
+        # arms and total visits of the origin rounds
+        self.arms = np.empty((self.n_slots, len(self.arm_shape), n_combinations), dtype=np.int64)
+        self.total_visits = np.zeros((self.n_slots, n_combinations), dtype=np.int64)
+
+        # the arrivals and the matured round are copied here, so that their slots can be reused
+        self.arrived_visits = np.empty(self.arm_shape, dtype=np.int64)
+        self.arrived_exposure = np.empty(self.arm_shape)
+        self.matured_arms = np.empty((len(self.arm_shape), n_combinations), dtype=np.int64)
+        self.matured_visits = np.empty(n_combinations, dtype=np.int64)
+
+        self.current_round = 0
+        self.reset()
+
+    def reset(self):
+        # before the first max_delay rounds the matured rounds have no arm and no visits
+        self.visits.fill(0)
+        self.exposure.fill(0)
+        self.arms.fill(self.EMPTY_ARM)
+        self.total_visits.fill(0)
+        self.current_round = 0
+
+    def schedule(self, arms, purchases, visits, lag_visits=None):
+        # the visits generated in the current round, by the given arms and purchases; lag_visits is their
+        # spread over the lags, if already drawn (see schedule_days)
+        origin = self.current_round % self.n_slots
+        self.arms[origin] = arms
+        self.total_visits[origin] = visits
+
+        if lag_visits is None:
+            lag_visits = self.delay_model.spread(visits, self.pmf)
+        # the visits and the expected purchases of every (arm, lag), the lags of an arm being contiguous
+        index = np.ravel_multi_index(self.arms[origin], self.arm_shape)[:, None] * len(self.lags) + \
+            np.arange(len(self.lags))
+        size = self.visits.shape[1] * len(self.lags)
+        arrival = (self.current_round + self.lags) % self.n_slots
+        self.visits[arrival] += np.bincount(index.ravel(), weights=lag_visits[:, self.lags].ravel(),
+                                            minlength=size).reshape(-1, len(self.lags)).T.astype(np.int64)
+        self.exposure[arrival] += np.bincount(index.ravel(),
+                                              weights=np.outer(purchases, self.pmf[self.lags]).ravel(),
+                                              minlength=size).reshape(-1, len(self.lags)).T
+
+    def schedule_days(self, arms, purchases, visits):
+        # n_days rounds pulled with the same arms, purchases and visits of shape (n_days, n_combinations):
+        # the lags of all the days are drawn in one call (the same draws as day by day), then every day is
+        # scheduled and popped. Returns the arrivals and the matured rounds of every day, with a leading day axis.
+        n_days, n_combinations = np.shape(visits)
+        lag_visits = self.delay_model.spread(np.ravel(visits), self.pmf).reshape(n_days, n_combinations, -1)
+
+        arrived_visits = np.empty((n_days,) + self.arm_shape, dtype=np.int64)
+        arrived_exposure = np.empty((n_days,) + self.arm_shape)
+        matured_arms = np.empty((n_days,) + self.matured_arms.shape, dtype=np.int64)
+        matured_visits = np.empty((n_days, n_combinations), dtype=np.int64)
+        for day in range(n_days):
+            self.schedule(arms, purchases[day], visits[day], lag_visits[day])
+            arrived_visits[day], arrived_exposure[day], matured_arms[day], matured_visits[day] = self.pop()
+
+        return arrived_visits, arrived_exposure, matured_arms, matured_visits
+
+    def pop(self):
+        # Ends the current round. Returns the visits arrived now per arm, and their exposure: the expected
+        # number of purchases whose visits arrive now (the purchases of every origin round times the
+        # probability of its lag). Then the arms and visits of the round matured now. The arrays are
+        # overwritten by the next pop.
+        arrival = self.current_round % self.n_slots
+        self.arrived_visits[...] = self.visits[arrival].reshape(self.arm_shape)
+        self.arrived_exposure[...] = self.exposure[arrival].reshape(self.arm_shape)
+
+        # the round max_delay rounds ago, in the slot after the current one
+        matured = (self.current_round + 1) % self.n_slots
+        self.matured_arms[...] = self.arms[matured]
+        self.matured_visits[...] = self.total_visits[matured]
+
+        self.visits[arrival] = 0
+        self.exposure[arrival] = 0
+        self.current_round += 1
+
+        return self.arrived_visits, self.arrived_exposure, self.matured_arms, self.matured_visits
+
+    @staticmethod
+    def is_empty(arms):
+        return arms[0, 0] == FutureVisitsCalendar.EMPTY_ARM
@@ -1,75 +1,58 @@
 import numpy as np
 
 from src.Environment import Environment
-from src.algorithms import step1, expected_profit, optimal_price_for_bid, optimal_bid_for_price, \
-    expected_profit_for_comb
+from src.bandit.banditEnvironments.BanditEnvironment import BanditEnvironment
+from src.bandit.banditEnvironments.DelayModels import DelayModel
+from src.algorithms import step1, expected_profit_grid
+from src.partitions import subset_sums, mask_elements, optimal_partition
 
 
-class JointBanditEnvironment:
-    def __init__(self, environment: Environment, prices, bids, future_visits_delay: int):
-        self.rng = environment.rng
+class JointBanditEnvironment(BanditEnvironment):
+    # arms are (price arm, bid arm) pairs
+    n_arm_dims = 2
 
+    def __init__(self, environment: Environment, prices, bids, future_visits_delay: int,
+                 delay_model: DelayModel = None, discriminating: bool = False):
         self.n_arms_price = len(prices)
         self.n_arms_bid = len(bids)
         self.prices = prices
         self.bids = bids
-        self.env = environment
-        self.future_visits_delay = future_visits_delay
 
-        self.future_visits_queue = None
-        self.reset_state()
+        super().__init__(environment, future_visits_delay, delay_model, discriminating)
 
-        self.current_round = 0
+    def arms_to_values(self, arms):
+        return np.asarray(self.prices)[arms[0]], np.asarray(self.bids)[arms[1]]
 
-    def reset_state(self):
-        self.future_visits_queue = [((None, None), {comb: 0 for comb in
-                                                    self.env.get_features_combinations()})] * self.future_visits_delay
-        self.current_round = 0
+    def get_comb_arm_profits(self):
+        return expected_profit_grid(self.env, self.prices, self.bids)
 
     def pull_arm_not_discriminating(self, price_arm: int, bid_arm: int):
-        price_arm_strategy = {comb: price_arm for comb in self.env.get_features_combinations()}
-        bid_arm_strategy = {comb: bid_arm for comb in self.env.get_features_combinations()}
+        batch = self.pull((price_arm, bid_arm))
 
-        auctions, new_clicks, purchases, tot_cost_per_clicks, \
-        ((past_price_arm_strategy, past_bid_arm_strategy), past_future_visits) = self._inner_pull_arm(
-            price_arm_strategy, bid_arm_strategy)
+        if batch.has_matured():
+            past_pulled_arms = (int(batch.matured_arms[0, 0]), int(batch.matured_arms[1, 0]))
+        else:
+            past_pulled_arms = (None, None)
 
-        past_price_pulled_arm = None if past_price_arm_strategy is None else past_price_arm_strategy[(False, False)]
-        past_bid_pulled_arm = None if past_bid_arm_strategy is None else past_bid_arm_strategy[(False, False)]
-
-        return sum(auctions.values()), sum(new_clicks.values()), sum(purchases.values()), sum(
-            tot_cost_per_clicks.values()), \
-               ((past_price_pulled_arm, past_bid_pulled_arm), sum(past_future_visits.values()))
+        return np.sum(batch.auctions), np.sum(batch.new_clicks), np.sum(batch.purchases), np.sum(batch.tot_cost), \
+            (past_pulled_arms, np.sum(batch.matured_visits))
 
     def pull_arm_discriminating(self, price_arm_strategy, bid_arm_strategy):
-        auctions, new_clicks, purchases, tot_cost_per_clicks, ((past_price_arm_strategy, past_bid_arm_strategy),
-                                                               past_future_visits) = self._inner_pull_arm(
-            price_arm_strategy,
-            bid_arm_strategy)
-
-        return auctions, new_clicks, purchases, tot_cost_per_clicks, ((past_price_arm_strategy, past_bid_arm_strategy),
-                                                                      past_future_visits)
-
-    def _inner_pull_arm(self, price_arm_strategy, bid_arm_strategy):
-        bidding_strategy = {c: self.bids[a] for c, a in bid_arm_strategy.items()}
-        pricing_strategy = {c: self.prices[a] for c, a in price_arm_strategy.items()}
-
-        auctions, new_clicks, purchases, tot_cost_per_clicks, \
-        new_future_visits, _ = self.env.simulate_one_day(pricing_strategy, bidding_strategy)
-
-        self.future_visits_queue.append(((price_arm_strategy, bid_arm_strategy), new_future_visits))
-        past_future_visits = self.future_visits_queue.pop(0)
+        batch = self.pull(self.strategy_to_arms(price_arm_strategy, bid_arm_strategy))
 
-        self.current_round += 1
+        if batch.has_matured():
+            past_arm_strategies = (self.arms_to_strategy(batch.matured_arms[0]),
+                                   self.arms_to_strategy(batch.matured_arms[1]))
+        else:
+            past_arm_strategies = (None, None)
 
-        return auctions, new_clicks, purchases, tot_cost_per_clicks, past_future_visits
+        return self.env.array_to_strategy(batch.auctions), self.env.array_to_strategy(batch.new_clicks), \
+            self.env.array_to_strategy(batch.purchases), self.env.array_to_strategy(batch.tot_cost), \
+            (past_arm_strategies, self.arms_to_strategy(batch.matured_visits))
 
     def margin(self, arm_price):
         return self.env.margin(self.prices[arm_price])
 
-    def get_features_combinations(self):
-        return self.env.get_features_combinations()
-
     def get_clairvoyant_optimal_expected_profit_not_discriminating(self):
         _, _, profit = step1(self.env, self.prices, self.bids)
         return profit
@@ -78,16 +61,13 @@ class JointBanditEnvironment:
         round_profit = self.get_clairvoyant_optimal_expected_profit_not_discriminating()
         return np.cumsum([round_profit] * n_rounds)
 
-    def get_learner_cumulative_profit_not_discriminating(self, pulled_arms):
-        pulled_values = [(self.prices[p], self.bids[b]) for p, b in pulled_arms[:-self.future_visits_delay]]
-        profits = [expected_profit(self.env, price, bid) for price, bid in pulled_values]
-
-        return np.cumsum(profits)
-
     def get_clairvoyant_cumulative_profit_discriminating(self, context_structure, n_rounds):
         prof_one_round = self.get_clairvoyant_optimal_profit_discriminating(context_structure)
         return np.cumsum([[prof_one_round] * n_rounds])
 
+    def get_clairvoyant_optimal_expected_profit_discriminating(self):
+        return self.get_clairvoyant_optimal_profit_discriminating(self.env.classes)
+
     def get_clairvoyant_optimal_profit_discriminating(self, context_structure):
         profit = 0
         for context in context_structure:
@@ -95,14 +75,13 @@ class JointBanditEnvironment:
             profit += context_profit
         return profit
 
-    def get_learner_cumulative_profit_discriminating(self, strategies):
-        profit = []
-        for price_strat, bid_strat in strategies:
-            partial_profit = 0
-            for comb in self.env.get_features_combinations():
-                arm_p = price_strat[comb]
-                arm_b = bid_strat[comb]
-                partial_profit += expected_profit_for_comb(self.env, self.prices[arm_p], self.bids[arm_b], comb)
-            profit.append(partial_profit)
-
-        return np.cumsum(profit)
+    def get_clairvoyant_optimal_context_structure(self):
+        # Best context structure over every partition of the combinations (see src.partitions), each context
+        # with its optimal price and bid: (list of the combinations of every context, expected profit per round).
+        # ValueError above src.partitions.MAX_ELEMENTS combinations
+        combinations = self.env.get_features_combinations()
+        # (2 ** n_combinations, n_prices, n_bids)
+        profits_per_subset = subset_sums(np.moveaxis(self.get_comb_arm_profits(), -1, 0))
+        profit, partition = optimal_partition(np.max(profits_per_subset, axis=(1, 2)))
+
+        return [[combinations[i] for i in mask_elements(mask)] for mask in partition], profit
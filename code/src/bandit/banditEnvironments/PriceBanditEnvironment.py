@@ -1,75 +1,56 @@
 import numpy as np
 
 from src.Environment import Environment
-from src.algorithms import optimal_price_for_bid, expected_profit
+from src.bandit.banditEnvironments.BanditEnvironment import BanditEnvironment
+from src.bandit.banditEnvironments.DelayModels import DelayModel
+from src.algorithms import optimal_price_for_bid, expected_profit_grid
 
 
 # This class is the basic environment for a Bandit learning. Provides many black-box functionalities to the learners
 # Allows to set prices, bids, run rounds, get the clairvoyant and compute regret
-class PriceBanditEnvironment:
-    def __init__(self, environment: Environment, prices, bid, future_visits_delay: int):
+class PriceBanditEnvironment(BanditEnvironment):
+    def __init__(self, environment: Environment, prices, bid, future_visits_delay: int,
+                 delay_model: DelayModel = None, discriminating: bool = False):
         # Init local vars
-        self.rng = environment.rng
-
         self.n_arms = len(prices)
         self.prices = prices
         self.bid = bid
-        self.env = environment
-        self.future_visits_delay = future_visits_delay
 
-        self.future_visits_queue = None
-        self.reset_state()
+        super().__init__(environment, future_visits_delay, delay_model, discriminating)
 
-        self.current_round = 0
+    def arms_to_values(self, arms):
+        return np.asarray(self.prices)[arms[0]], self.bid
 
-    def pull_arm_not_discriminating(self, arm: int):
-        arm_strategy = {comb: arm for comb in self.env.get_features_combinations()}
+    def get_comb_arm_profits(self):
+        return expected_profit_grid(self.env, self.prices, [self.bid])[:, 0, :]
 
-        new_clicks, purchases, tot_cost, \
-            (past_arm_strategy, past_future_visits) = self._inner_pull_arm(arm_strategy)
+    def pull_arm_not_discriminating(self, arm: int):
+        batch = self.pull(arm)
 
-        past_pulled_arm = None if past_arm_strategy is None else past_arm_strategy[(False, False)]
+        past_pulled_arm = int(batch.matured_arms[0, 0]) if batch.has_matured() else None
 
-        return sum(new_clicks.values()), sum(purchases.values()), sum(tot_cost.values()), \
-            (past_pulled_arm, sum(past_future_visits.values()))
+        return np.sum(batch.new_clicks), np.sum(batch.purchases), np.sum(batch.tot_cost), \
+            (past_pulled_arm, np.sum(batch.matured_visits))
 
     def pull_arm_discriminating(self, arm_strategy):
-        new_clicks, purchases, tot_cost, past_future_visits = self._inner_pull_arm(arm_strategy)
-
-        return new_clicks, purchases, tot_cost, past_future_visits
-
-    def _inner_pull_arm(self, arm_strategy):
-        pricing_strategy = {c: self.prices[a] for c, a in arm_strategy.items()}
+        batch = self.pull(self.strategy_to_arms(arm_strategy))
 
-        auctions, new_clicks, purchases, tot_cost, \
-            new_future_visits, profit = self.env.simulate_one_day_fixed_bid(pricing_strategy, self.bid)
+        past_arm_strategy = self.arms_to_strategy(batch.matured_arms[0]) if batch.has_matured() else None
 
-        self.future_visits_queue.append((arm_strategy, new_future_visits))
-        past_future_visits = self.future_visits_queue.pop(0)
-
-        self.current_round += 1
-
-        return new_clicks, purchases, tot_cost, past_future_visits
-
-    def reset_state(self):
-        self.future_visits_queue = [(None, {comb: 0 for comb in
-                                            self.env.get_features_combinations()})] * self.future_visits_delay
-        self.current_round = 0
+        return self.env.array_to_strategy(batch.new_clicks), self.env.array_to_strategy(batch.purchases), \
+            self.env.array_to_strategy(batch.tot_cost), \
+            (past_arm_strategy, self.arms_to_strategy(batch.matured_visits))
 
     def margin(self, arm: int):
         return self.env.margin(self.prices[arm])
 
-    def get_features_combinations(self):
-        return self.env.get_features_combinations()
-
     def get_clairvoyant_best_price_not_discriminating(self):
         optimal_price = optimal_price_for_bid(self.env, self.prices, self.bid)
         return optimal_price
 
     def get_clairvoyant_optimal_expected_profit_not_discriminating(self):
-        optimal_price = self.get_clairvoyant_best_price_not_discriminating()
-        round_profit = expected_profit(self.env, optimal_price, self.bid)
-        return round_profit
+        arm_profits = np.sum(self.get_comb_arm_profits(), axis=-1)
+        return np.max(arm_profits)
 
     def get_clairvoyant_cumulative_profits_not_discriminating(self, n_rounds):
         round_profit = self.get_clairvoyant_optimal_expected_profit_not_discriminating()
@@ -81,10 +62,11 @@ class PriceBanditEnvironment:
         return optimal_prices
 
     def get_clairvoyant_optimal_expected_profit_discriminating(self):
-        optimal_prices = self.get_clairvoyant_best_prices_discriminating()
+        # (n_prices, n_combinations)
+        comb_profits = self.get_comb_arm_profits()
         round_profit = np.sum([
-            expected_profit(self.env, optimal_prices[ndx], self.bid, c.features)
-            for ndx, c in enumerate(self.env.classes)
+            np.max(np.sum(comb_profits[:, self.env.get_comb_indices(c.features)], axis=-1))
+            for c in self.env.classes
         ])
         return round_profit
 
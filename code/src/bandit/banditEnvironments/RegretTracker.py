@@ -0,0 +1,94 @@
+import copy
+
+import numpy as np
+
+
+# Online expected profit and regret of the pulled arms. The expected profit of every arm for every
+# combination is computed once; each pull adds one entry to the instantaneous and cumulative curves,
+# stored in preallocated buffers (doubled when full). The curves are returned as views in O(1).
+# The buffers are replaced, not overwritten, on growth and reset, so returned curves stay valid.
+class RegretTracker:
+    def __init__(self, comb_arm_profits, clairvoyant_profit: float, capacity: int = 1024):
+        # comb_arm_profits: (n_arms per arm dimension..., n_combinations) expected profits
+        self.comb_arm_profits = comb_arm_profits
+        self.combinations_index = np.arange(comb_arm_profits.shape[-1])
+        self.clairvoyant_profit = clairvoyant_profit
+        self.initial_capacity = capacity
+
+        self.n_rounds = 0
+        # the buffers are shared with another tracker (see copy_on_write)
+        self.shared_buffers = False
+        self.profits = None
+        self.cumulative_profits = None
+        self.cumulative_regrets = None
+        self.reset()
+
+    def reset(self):
+        self.n_rounds = 0
+        self.shared_buffers = False
+        self.profits = np.empty(self.initial_capacity)
+        self.cumulative_profits = np.empty(self.initial_capacity)
+        self.cumulative_regrets = np.empty(self.initial_capacity)
+
+    def copy_on_write(self):
+        # A copy sharing the buffers, each of the two copies them before its next write
+        self.shared_buffers = True
+        return copy.copy(self)
+
+    def _grow(self, size: int):
+        capacity = len(self.profits)
+        if size <= capacity and not self.shared_buffers:
+            return
+
+        while capacity < size:
+            capacity *= 2
+        for name in ['profits', 'cumulative_profits', 'cumulative_regrets']:
+            old = getattr(self, name)
+            new = np.empty(capacity)
+            new[:self.n_rounds] = old[:self.n_rounds]
+            setattr(self, name, new)
+        self.shared_buffers = False
+
+    def record(self, arms, n_rounds: int = 1):
+        # arms: (n_arm_dims, n_combinations), the arms pulled in each of n_rounds rounds
+        profit = np.sum(self.comb_arm_profits[(*arms, self.combinations_index)])
+        self.record_profits(np.full(n_rounds, profit))
+
+    def record_profits(self, profits):
+        # expected profits of consecutive rounds
+        n, k = self.n_rounds, len(profits)
+        self._grow(n + k)
+
+        last_profit = self.cumulative_profits[n - 1] if n else 0
+        last_regret = self.cumulative_regrets[n - 1] if n else 0
+        self.profits[n:n + k] = profits
+        self.cumulative_profits[n:n + k] = last_profit + np.cumsum(profits)
+        self.cumulative_regrets[n:n + k] = last_regret + np.cumsum(self.clairvoyant_profit - profits)
+        self.n_rounds += k
+
+    def set_clairvoyant_profit(self, clairvoyant_profit: float):
+        # e.g. the optimum of a context structure in place of the one without discrimination
+        self.clairvoyant_profit = clairvoyant_profit
+        self._grow(self.n_rounds)
+        self.cumulative_regrets[:self.n_rounds] = np.cumsum(clairvoyant_profit - self.get_profits())
+
+    def get_clairvoyant_profit(self):
+        return self.clairvoyant_profit
+
+    def get_n_rounds(self):
+        return self.n_rounds
+
+    def get_profits(self):
+        return self.profits[:self.n_rounds]
+
+    def get_cumulative_profits(self):
+        return self.cumulative_profits[:self.n_rounds]
+
+    def get_regrets(self):
+        return self.clairvoyant_profit - self.get_profits()
+
+    def get_cumulative_regrets(self):
+        return self.cumulative_regrets[:self.n_rounds]
+
+    def get_clairvoyant_cumulative_profits(self):
+        return self.clairvoyant_profit * np.arange(1, self.n_rounds + 1)
@@ -1,7 +1,7 @@
 import numpy as np
 
 from src.algorithms import simple_class_profit
-from src.utils import sum_ragged_matrix, average_ragged_matrix
+from src.bandit.context.ContextTree import ContextTree, get_assignment
 
 
 class Context:
@@ -10,54 +10,44 @@ class Context:
         self.margin = arm_margin_function
         self.n_arms = n_arms
         self.rng = rng
+        # values of the features shared by the combinations of the context (see ContextTree)
+        self.assignment = None
 
     # start context next arm
-    def choose_next_arm(self, new_clicks_per_comb_per_arm,
-                        purchases_per_comb_per_arm, tot_cost_per_comb,
-                        future_visits_per_comb_per_arm, current_round):
-        return int(np.argmax(self.compute_projected_profit(
-            new_clicks_per_comb_per_arm,
-            purchases_per_comb_per_arm,
-            tot_cost_per_comb,
-            future_visits_per_comb_per_arm,
-            current_round)
-        ))
+    def choose_next_arm(self, tree: ContextTree, current_round):
+        return int(np.argmax(self.compute_projected_profit(tree, current_round)))
 
     # end context next arm
 
-    def merge_cost(self, cost_per_click_per_comb):
-        cost_per_click = sum(cost_per_click_per_comb[comb] for comb in self.features)
-        return cost_per_click
+    def merge_cost(self, tree: ContextTree):
+        return tree.get_tot_cost(self.get_node(tree))
 
-    def merge(self, data_per_comb_per_arm):
-        data_per_arm = []
-        for arm in range(self.n_arms):
-            lengths = [len(data_per_comb_per_arm[comb][arm]) for comb in self.features]
-            row_length = lengths[0]
-
-            assert (len(np.unique(lengths)) == 1)
+    # the context is a node of the tree, or a child of one of the possible splits of its leaves
+    def get_node(self, tree: ContextTree):
+        if self.assignment is None:
+            self.assignment = get_assignment(self.features)
+        node = tree.get_node(self.assignment)
+        if len(node.index) != len(self.features):
+            raise ValueError('The combinations of the context are not the ones of a node of the tree')
+        return node
 
-            new_row = [
-                sum(data_per_comb_per_arm[comb][arm][r] for comb in self.features)
-                for r in range(row_length)
-            ]
-            data_per_arm.append(new_row)
+    def merge(self, tree: ContextTree, series):
+        # totals per arm of the combinations of the context, kept up to date by the tree
+        return tree.get_totals(self.get_node(tree), series)
 
-        return data_per_arm
+    def merge_counts(self, tree: ContextTree, series):
+        return tree.get_counts(self.get_node(tree), series)
 
-    def compute_projected_profit(self, new_clicks_per_comb_per_arm, purchases_per_comb_per_arm,
-                                 tot_cost_per_comb, future_visits_per_comb_per_arm, current_round):
-        new_clicks_per_arm = self.merge(new_clicks_per_comb_per_arm)
-        purchases_per_arm = self.merge(purchases_per_comb_per_arm)
-        tot_cost = self.merge_cost(tot_cost_per_comb)
-        future_visits_per_arm = self.merge(future_visits_per_comb_per_arm)
+    def compute_projected_profit(self, tree: ContextTree, current_round):
+        new_clicks_per_arm = self.merge(tree, 'new_clicks')
+        purchases_per_arm = self.merge(tree, 'purchases')
+        tot_cost = self.merge_cost(tree)
 
-        average_new_clicks = self.compute_average_new_clicks(new_clicks_per_arm)
+        average_new_clicks = self.compute_average_new_clicks(tree)
         margin = np.array([self.margin(a) for a in range(self.n_arms)])
         crs = self.compute_projection_conversion_rate(new_clicks_per_arm, purchases_per_arm, current_round)
-        future_visits_per_purchase_per_arm = self.compute_future_visits_per_purchase_per_arm(future_visits_per_arm,
-                                                                                             purchases_per_arm)
-        cost_per_click = tot_cost / sum_ragged_matrix(new_clicks_per_arm)
+        future_visits_per_purchase_per_arm = self.compute_future_visits_per_purchase_per_arm(tree)
+        cost_per_click = tot_cost / np.sum(new_clicks_per_arm)
 
         profits = simple_class_profit(
             margin=margin, new_clicks=average_new_clicks, conversion_rate=crs,
@@ -66,51 +56,92 @@ class Context:
 
         return profits
 
-    def compute_expected_profit_lower_bound(self, new_clicks_per_comb_per_arm, purchases_per_comb_per_arm,
-                                            tot_cost_per_comb, future_visits_per_comb_per_arm, current_round):
-        new_clicks_per_arm = self.merge(new_clicks_per_comb_per_arm)
-        purchases_per_arm = self.merge(purchases_per_comb_per_arm)
-        tot_cost = self.merge_cost(tot_cost_per_comb)
-        future_visits_per_arm = self.merge(future_visits_per_comb_per_arm)
-        average_new_clicks = self.compute_average_new_clicks(new_clicks_per_arm)
+    def compute_expected_profit_lower_bound(self, tree: ContextTree, current_round):
+        return self.compute_lower_bound_from_terms(self.compute_lower_bound_terms(tree), current_round)
+
+    def compute_lower_bound_terms(self, tree: ContextTree):
+        # the terms of the lower bound that only depend on the samples of the context, not on the round
+        new_clicks_per_arm = self.merge(tree, 'new_clicks')
+        optimal_arm = np.argmax(self.compute_expected_profits(tree))
+
+        return {
+            'new_clicks_per_arm': new_clicks_per_arm,
+            'purchases_per_arm': self.merge(tree, 'purchases'),
+            'optimal_arm': optimal_arm,
+            'margin': self.margin(optimal_arm),
+            'average_new_clicks': self.compute_average_new_clicks(tree),
+            'future_visits': self.compute_future_visits_per_purchase_per_arm(tree)[optimal_arm],
+            'cost_per_click': self.merge_cost(tree) / np.sum(new_clicks_per_arm)
+        }
+
+    def compute_lower_bound_from_terms(self, terms, current_round):
+        # only the conversion rate lower bound (e.g. the radius of UCB) depends on the round
+        cr = self.compute_conversion_rate_lower_bounds(terms['new_clicks_per_arm'], terms['purchases_per_arm'],
+                                                       current_round)[terms['optimal_arm']]
 
-        optimal_arm = np.argmax(self.compute_expected_profits(new_clicks_per_comb_per_arm, purchases_per_comb_per_arm,
-                                                              tot_cost_per_comb, future_visits_per_comb_per_arm))
+        profit = simple_class_profit(
+            margin=terms['margin'], new_clicks=terms['average_new_clicks'], conversion_rate=cr,
+            future_visits=terms['future_visits'], cost_per_click=terms['cost_per_click']
+        )
 
-        margin = self.margin(optimal_arm)
+        return profit
 
-        cr = self.compute_conversion_rate_lower_bounds(new_clicks_per_arm, purchases_per_arm, current_round)[
-            optimal_arm]
+    def compute_lower_bounds_from_terms(self, terms, current_round):
+        # compute_lower_bound_from_terms of a list of contexts of the type of this one, in one vectorized call
+        sets = np.arange(len(terms))
+        optimal_arm = np.array([t['optimal_arm'] for t in terms])
+        crs = self.compute_conversion_rate_lower_bounds(np.array([t['new_clicks_per_arm'] for t in terms]),
+                                                        np.array([t['purchases_per_arm'] for t in terms]),
+                                                        current_round)
+
+        return simple_class_profit(
+            margin=np.array([t['margin'] for t in terms]),
+            new_clicks=np.array([t['average_new_clicks'] for t in terms]),
+            conversion_rate=crs[sets, optimal_arm],
+            future_visits=np.array([t['future_visits'] for t in terms]),
+            cost_per_click=np.array([t['cost_per_click'] for t in terms])
+        )
 
-        future_visits_per_purchase_per_arm = self.compute_future_visits_per_purchase_per_arm(future_visits_per_arm,
-                                                                                             purchases_per_arm)[
-            optimal_arm]
-        cost_per_click = tot_cost / sum_ragged_matrix(new_clicks_per_arm)
+    def compute_expected_profit_lower_bounds(self, totals, counts, tot_cost, current_round):
+        # compute_expected_profit_lower_bound of n sets of combinations at once, whatever their features:
+        # totals maps every series to the totals per arm of the sets (n, n_arms), counts are the samples
+        # per arm of one combination of every set (n, n_arms) and tot_cost the cost of every set (n,)
+        new_clicks_per_arm, purchases_per_arm = totals['new_clicks'], totals['purchases']
+        average_new_clicks = np.sum(new_clicks_per_arm, axis=-1) / np.sum(counts, axis=-1)
+        cost_per_click = tot_cost / np.sum(new_clicks_per_arm, axis=-1)
+        margin = np.array([self.margin(a) for a in range(self.n_arms)])
+        future_visits_per_purchase_per_arm = np.divide(totals['future_visits'], totals['matured_purchases'],
+                                                       out=np.zeros(new_clicks_per_arm.shape),
+                                                       where=totals['matured_purchases'] > 0)
 
-        profit = simple_class_profit(
-            margin=margin, new_clicks=average_new_clicks, conversion_rate=cr,
-            future_visits=future_visits_per_purchase_per_arm, cost_per_click=cost_per_click
+        profits = simple_class_profit(
+            margin=margin, new_clicks=average_new_clicks[:, None],
+            conversion_rate=self.compute_average_conversion_rates(new_clicks_per_arm, purchases_per_arm),
+            future_visits=future_visits_per_purchase_per_arm, cost_per_click=cost_per_click[:, None]
         )
+        sets = np.arange(len(profits))
+        optimal_arm = np.argmax(profits, axis=-1)
 
-        return profit
+        crs = self.compute_conversion_rate_lower_bounds(new_clicks_per_arm, purchases_per_arm, current_round)
 
-    def compute_expected_profits(self, new_clicks_per_comb_per_arm, purchases_per_comb_per_arm, tot_cost_per_comb,
-                                 future_visits_per_comb_per_arm):
-        new_clicks_per_arm = self.merge(new_clicks_per_comb_per_arm)
-        purchases_per_arm = self.merge(purchases_per_comb_per_arm)
-        tot_cost = self.merge_cost(tot_cost_per_comb)
+        return simple_class_profit(
+            margin=margin[optimal_arm], new_clicks=average_new_clicks, conversion_rate=crs[sets, optimal_arm],
+            future_visits=future_visits_per_purchase_per_arm[sets, optimal_arm], cost_per_click=cost_per_click
+        )
 
-        future_visits_per_arm = self.merge(future_visits_per_comb_per_arm)
+    def compute_expected_profits(self, tree: ContextTree):
+        new_clicks_per_arm = self.merge(tree, 'new_clicks')
+        purchases_per_arm = self.merge(tree, 'purchases')
+        tot_cost = self.merge_cost(tree)
 
-        average_new_clicks = self.compute_average_new_clicks(new_clicks_per_arm)
+        average_new_clicks = self.compute_average_new_clicks(tree)
 
         margin = np.array([self.margin(a) for a in range(self.n_arms)])
 
         crs = self.compute_average_conversion_rates(new_clicks_per_arm, purchases_per_arm)
 
-        future_visits_per_purchase_per_arm = self.compute_future_visits_per_purchase_per_arm(future_visits_per_arm,
-                                                                                             purchases_per_arm)
-        cost_per_click = tot_cost / sum_ragged_matrix(new_clicks_per_arm)
+        future_visits_per_purchase_per_arm = self.compute_future_visits_per_purchase_per_arm(tree)
+        cost_per_click = tot_cost / np.sum(new_clicks_per_arm)
 
         profits = simple_class_profit(
             margin=margin, new_clicks=average_new_clicks, conversion_rate=crs,
@@ -119,13 +150,14 @@ class Context:
 
         return profits
 
-    def compute_purchases(self, pur):
-        return sum(sum_ragged_matrix(pur[comb] for comb in self.features))
+    def compute_purchases(self, tree: ContextTree):
+        return np.sum(self.merge(tree, 'purchases'))
 
-    def compute_average_new_clicks(self, new_clicks):
-        average_new_clicks = average_ragged_matrix(new_clicks)
+    def compute_average_new_clicks(self, tree: ContextTree):
+        average_new_clicks = np.sum(self.merge(tree, 'new_clicks')) / np.sum(self.merge_counts(tree, 'new_clicks'))
         return average_new_clicks
 
+    # the arguments are the totals per arm of the context
     def compute_conversion_rate_lower_bounds(self, new_clicks_per_arm, purchases_per_arm, current_round):
         raise NotImplementedError
 
@@ -135,26 +167,21 @@ class Context:
     def compute_average_conversion_rates(self, new_clicks_per_arm, purchases_per_arm):
         raise NotImplementedError
 
-    def compute_future_visits_per_purchase_per_arm(self, future_visits_per_arm, purchases_per_arm):
-        res = []
-        for arm in range(self.n_arms):
-            complete_samples = len(future_visits_per_arm[arm])
-            future_visits = np.sum(future_visits_per_arm[arm])
-            purchases = np.sum(purchases_per_arm[arm][:complete_samples])
-            future_visits_per_purchase = future_visits / purchases if purchases else 0
-            res.append(future_visits_per_purchase)
+    def compute_future_visits_per_purchase_per_arm(self, tree: ContextTree):
+        # the future visits of the complete rounds, over the purchases of the same rounds
+        future_visits = self.merge(tree, 'future_visits')
+        purchases = self.merge(tree, 'matured_purchases')
 
-        return np.array(res)
+        return np.divide(future_visits, purchases, out=np.zeros(self.n_arms), where=purchases > 0)
 
-    def get_average_conversion_rates(self, new_clicks_per_comb_per_arm, purchases_per_comb_per_arm):
-        new_clicks_per_arm = self.merge(new_clicks_per_comb_per_arm)
-        purchases_per_arm = self.merge(purchases_per_comb_per_arm)
+    def get_average_conversion_rates(self, tree: ContextTree):
+        new_clicks_per_arm = self.merge(tree, 'new_clicks')
+        purchases_per_arm = self.merge(tree, 'purchases')
 
         return self._get_average_conversion_rates(new_clicks_per_arm, purchases_per_arm)
 
-    def get_number_of_pulls(self, new_clicks_per_comb_per_arm):
-        new_clicks_per_arm = self.merge(new_clicks_per_comb_per_arm)
-        return [len(r) for r in new_clicks_per_arm]
+    def get_number_of_pulls(self, tree: ContextTree):
+        return list(self.merge_counts(tree, 'new_clicks'))
 
     def _get_average_conversion_rates(self, new_clicks_per_arm, purchases_per_arm):
         raise NotImplementedError
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+def get_assignment(features):
+    # value of every feature shared by all the combinations, None for the other ones
+    features = np.asarray(features, dtype=bool)
+    shared = np.all(features == features[0], axis=0)
+    return tuple(bool(v) if s else None for v, s in zip(features[0], shared))
+
+
+# Node of a ContextTree: the combinations whose features have the values of the assignment (the features
+# that are None are free), with the totals per arm of their samples while it is a leaf or a candidate
+class ContextTreeNode:
+    def __init__(self, assignment, index, n_arms, series):
+        self.assignment = assignment
+        # indices of the combinations of the node, in the order of the combinations of the tree
+        self.index = index
+        self.totals = {s: np.zeros(n_arms) for s in series}
+        # number of updates of the totals
+        self.version = 0
+
+        # (feature, child where it is True, child where it is False) once the node is split
+        self.split = None
+        # children of the possible splits of a leaf, by feature
+        self.candidates = {}
+
+    def is_leaf(self):
+        return self.split is None
+
+    def get_free_features(self):
+        return [i for i, v in enumerate(self.assignment) if v is None]
+
+    def add(self, series, arms, values):
+        # arms and values of the combinations of the node
+        self.totals[series] += np.bincount(arms, weights=values, minlength=len(self.totals[series]))
+        self.version += 1
+
+
+# Binary tree of contexts over the combinations of the binary features: the root holds every
+# combination and a split on a feature gives the children where it is True and where it is False.
+# The leaves, and the children of the possible splits of the leaves (the candidates), keep the totals
+# per arm of their combinations up to date, one bincount each per update; the totals of an inner node
+# are the sum of the ones of its children. A context, or a candidate split, is then evaluated without
+# merging the samples of its combinations.
+class ContextTree:
+    def __init__(self, combinations, n_arms: int, series):
+        self.features = np.array(combinations, dtype=bool)
+        self.n_arms = n_arms
+        self.series = list(series)
+
+        n_combs = len(self.features)
+        self.comb_totals = {s: np.zeros((n_combs, n_arms)) for s in self.series}
+        self.comb_counts = {s: np.zeros((n_combs, n_arms), dtype=np.int64) for s in self.series}
+        self.comb_cost = np.zeros(n_combs)
+
+        # the nodes of the tree and the candidate children of its leaves, by assignment
+        self.nodes = {}
+        self.root = self.create_node((None,) * self.features.shape[1])
+        self.add_candidates(self.root)
+
+    def create_node(self, assignment):
+        fixed = [i for i, v in enumerate(assignment) if v is not None]
+        index = np.flatnonzero(np.all(self.features[:, fixed] == [assignment[i] for i in fixed], axis=1))
+        node = ContextTreeNode(assignment, index, self.n_arms, self.series)
+        if len(index):
+            for s in self.series:
+                node.totals[s] += np.sum(self.comb_totals[s][index], axis=0)
+
+        self.nodes[assignment] = node
+        return node
+
+    def add_candidates(self, leaf: ContextTreeNode):
+        for i in leaf.get_free_features():
+            values = self.features[leaf.index, i]
+            # a valid split generates two non-empty contexts
+            if np.any(values) and not np.all(values):
+                leaf.candidates[i] = tuple(self.create_node(leaf.assignment[:i] + (v,) + leaf.assignment[i + 1:])
+                                           for v in [True, False])
+
+    def get_node(self, assignment):
+        if assignment not in self.nodes:
+            raise ValueError(f'No node of the tree, or candidate split, has assignment {assignment}')
+        return self.nodes[assignment]
+
+    def get_leaves(self, node: ContextTreeNode = None):
+        node = self.root if node is None else node
+        if node.is_leaf():
+            return [node]
+        return self.get_leaves(node.split[1]) + self.get_leaves(node.split[2])
+
+    def split(self, leaf: ContextTreeNode, feature: int):
+        # the candidates of feature become the children, the ones of the other features are dropped
+        node_true, node_false = leaf.candidates.pop(feature)
+        for candidates in leaf.candidates.values():
+            for node in candidates:
+                del self.nodes[node.assignment]
+        leaf.candidates = {}
+        leaf.split = (feature, node_true, node_false)
+
+        self.add_candidates(node_true)
+        self.add_candidates(node_false)
+        return node_true, node_false
+
+    def update(self, series, arms, values):
+        # one sample per combination, of the given arms
+        arms, values = np.asarray(arms), np.asarray(values)
+        combs = np.arange(len(self.features))
+        self.comb_totals[series][combs, arms] += values
+        self.comb_counts[series][combs, arms] += 1
+        for leaf in self.get_leaves():
+            for node in [leaf, *(c for candidates in leaf.candidates.values() for c in candidates)]:
+                node.add(series, arms[node.index], values[node.index])
+
+    def get_totals(self, node: ContextTreeNode, series):
+        if node.is_leaf():
+            return node.totals[series]
+        _, node_true, node_false = node.split
+        return self.get_totals(node_true, series) + self.get_totals(node_false, series)
+
+    def get_counts(self, node: ContextTreeNode, series):
+        # the samples per arm of the first combination: the combinations of a context are always pulled
+        # together, so they have the same number of samples
+        return self.comb_counts[series][node.index[0]]
+
+    def update_cost(self, costs):
+        self.comb_cost += costs
+
+    def get_tot_cost(self, node: ContextTreeNode):
+        return np.sum(self.comb_cost[node.index])
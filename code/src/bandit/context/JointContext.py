@@ -1,8 +1,8 @@
 import numpy as np
-from scipy.stats import norm
 
 from src.algorithms import simple_class_profit
-from src.utils import sum_ragged_matrix, average_ragged_matrix
+from src.bandit.ArmStatistics import ArmStatistics
+from src.bandit.PullCounter import PullCounter
 
 
 class JointContext:
@@ -13,58 +13,52 @@ class JointContext:
         self.n_arms_bid = n_arms_bid
         self.rng = rng
 
-        # Arms merged data
-        self.future_visits = None
-        self.purchases = None
-        self.new_clicks = None
-        self.tot_cost_per_bid = None
-        self.tot_auctions_per_bid = None
-        self.pulled_arms = []
+        # View of the data of the learner restricted to the combinations of the context (see attach_data)
+        self.stats = None
+        self.mask = None
+        self.rows = None
+        self.tot_cost_per_comb_per_bid = None
+        self.tot_auctions_per_comb_per_bid = None
+        self.pull_counter = PullCounter((n_arms_price, n_arms_bid))
 
     # start merge
 
-    def merge_all_data(self, future_visits_per_comb, purchases_per_comb,
-                       new_clicks_per_comb, tot_cost_per_comb, tot_auctions_per_comb):
+    def attach_data(self, stats: ArmStatistics, tot_cost_per_comb_per_bid, tot_auctions_per_comb_per_bid):
+        # The data of the learner, updated by the learner and never copied: stats holds the samples per
+        # (combination, price, bid), the other two are (n_combinations, n_arms_bid) running totals.
+        # The merged totals of the context are kept up to date by stats, through the bitmask of the context
+        self.stats = stats
+        self.mask = stats.get_mask(self.features)
+        self.rows = stats.get_label_indices(self.features)
+        self.tot_cost_per_comb_per_bid = tot_cost_per_comb_per_bid
+        self.tot_auctions_per_comb_per_bid = tot_auctions_per_comb_per_bid
 
-        self.future_visits = self.merge_double_indexed(future_visits_per_comb)
-        self.purchases = self.merge_double_indexed(purchases_per_comb)
-        self.new_clicks = self.merge_double_indexed(new_clicks_per_comb)
-        self.tot_cost_per_bid = self.merge_single_indexed_bid(tot_cost_per_comb)
-        self.tot_auctions_per_bid = self.merge_single_indexed_bid(tot_auctions_per_comb)
+    def merge_double_indexed(self, series):
+        # totals per (price, bid) of the combinations of the context
+        return self.stats.get_masked_totals(series, self.mask)
 
-    def merge_double_indexed(self, data_per_comb):
-        data = []
-        # merged_data[price_arm][price_bid][realization_n]
-        merged_data = [[[]
-                        for b in range(self.n_arms_bid)]
-                       for p in range(self.n_arms_price)]
+    def merge_double_indexed_counts(self, series):
+        # the combinations of a context are always pulled together, so they have the same number of samples
+        return self.stats.get_counts(series)[self.rows[0]]
 
-        for comb in self.features:
-            row = data_per_comb[comb]
-            data.append(row)
+    def merge_single_indexed_bid(self, data_per_comb_per_bid):
+        return np.sum(data_per_comb_per_bid[self.rows], axis=0)
 
-        # cycle through all prices and bids
-        for p in range(self.n_arms_price):
-            for b in range(self.n_arms_bid):
-                for i in range(len(data[0][p][b])):
-                    # j-th combination, i-th realization
-                    merged_data[p][b].append(np.sum([data[j][p][b][i]
-                                                     for j in range(len(data))]))
+    def get_tot_cost_per_bid(self):
+        return self.merge_single_indexed_bid(self.tot_cost_per_comb_per_bid)
 
-        return merged_data
-
-    def merge_single_indexed_bid(self, data_per_comb):
-        merged_data = np.sum([data_per_comb[comb] for comb in self.features], axis=0)
-        return merged_data
+    def get_tot_auctions_per_bid(self):
+        return self.merge_single_indexed_bid(self.tot_auctions_per_comb_per_bid)
 
     # end merge
     # start arm choice
 
-    def choose_next_arm(self, security, current_round):
+    def choose_next_arm(self, lower_new_clicks, current_round):
+        # lower_new_clicks: new clicks of every bid at the security level (see SafetyConstraint)
         median_bid = self.n_arms_bid // 2
         arm_price = np.argmax(self.compute_projected_profits_fixed_bid(median_bid,
                                                                        current_round))
-        mask = self.compute_safe_arms(arm_price, security)
+        mask = self.compute_safe_arms(arm_price, lower_new_clicks)
         arms_bid_safe = np.where(mask,
                                  self.compute_projected_profits_fixed_price(arm_price,
                                                                             current_round),
@@ -72,22 +66,8 @@ class JointContext:
         arm_bid = np.argmax(arms_bid_safe)
         return arm_price, arm_bid
 
-    def compute_safe_arms(self, arm_price, security):
-        new_c = [[] for i in range(self.n_arms_bid)]
-        for b in range(self.n_arms_bid):
-            for p in range(self.n_arms_price):
-                new_c[b].extend(self.new_clicks[p][b])
-
-        means = np.array([np.mean(new_c[b]) for b in range(self.n_arms_bid)])
-        std_devs = np.array([np.std(new_c[b]) for b in range(self.n_arms_bid)])
-        std_devs = np.where(std_devs > 0, std_devs, 1)
-
-        lower_security_value = np.array([norm.ppf(security, m, std)
-                                         for m, std in zip(means, std_devs)])
-        lower_security_value = np.where(lower_security_value > 0, lower_security_value, 0)
-
-        expected_profits = self.compute_expected_profits_fixed_price(arm_price,
-                                                                     lower_security_value)
+    def compute_safe_arms(self, arm_price, lower_new_clicks):
+        expected_profits = self.compute_expected_profits_fixed_price(arm_price, lower_new_clicks)
         arm_mask = expected_profits > 0
 
         return arm_mask
@@ -137,23 +117,20 @@ class JointContext:
         return expected_profit
 
     def compute_conversion_rates(self, arm_price):
-        return sum_ragged_matrix(self.purchases[arm_price]) / sum_ragged_matrix(self.new_clicks[arm_price])
+        return np.sum(self.merge_double_indexed('purchases')[arm_price]) / \
+               np.sum(self.merge_double_indexed('new_clicks')[arm_price])
 
     def compute_new_clicks(self, arm_bid):
-        return average_ragged_matrix([self.new_clicks[p][arm_bid] for p in range(self.n_arms_price)])
+        return np.sum(self.merge_double_indexed('new_clicks')[:, arm_bid]) / \
+               np.sum(self.merge_double_indexed_counts('new_clicks')[:, arm_bid])
 
     def compute_future_visits_per_arm(self):
         return np.array([self.compute_future_visits(arm_p) for arm_p in range(self.n_arms_price)])
 
     def compute_future_visits(self, arm_price):
-        arm_p_future_visits = 0
-        arm_p_purchases = 0
-        for arm_b in range(self.n_arms_bid):
-            complete_samples = len(self.future_visits[arm_price][arm_b])
-            future_visits = np.sum(self.future_visits[arm_price][arm_b])
-            purchases = np.sum(self.purchases[arm_price][arm_b][:complete_samples])
-            arm_p_future_visits += future_visits
-            arm_p_purchases += purchases
+        # the future visits of the complete rounds, over the purchases of the same rounds
+        arm_p_future_visits = np.sum(self.merge_double_indexed('future_visits')[arm_price])
+        arm_p_purchases = np.sum(self.merge_double_indexed('matured_purchases')[arm_price])
 
         return arm_p_future_visits / arm_p_purchases if arm_p_purchases else 0
 
@@ -162,7 +139,7 @@ class JointContext:
 
     def compute_projection_new_clicks(self, current_round):
         auction_win_probability = self.compute_projection_auction_winning_probability(current_round)
-        average_auctions = np.sum(self.tot_auctions_per_bid) / current_round
+        average_auctions = np.sum(self.get_tot_auctions_per_bid()) / current_round
 
         return auction_win_probability * average_auctions
 
@@ -170,11 +147,12 @@ class JointContext:
         raise NotImplementedError
 
     def compute_cost_per_click_per_arm(self):
-        return np.array([self.compute_cost_per_click(arm_b) for arm_b in range(self.n_arms_bid)])
+        tot_clicks = np.sum(self.merge_double_indexed('new_clicks'), axis=0)
+        return self.get_tot_cost_per_bid() / np.where(tot_clicks == 0, 1, tot_clicks)
 
     def compute_cost_per_click(self, arm_bid):
-        tot_clicks = np.sum([np.sum(self.new_clicks[arm_p][arm_bid]) for arm_p in range(self.n_arms_price)])
-        tot_cost = self.tot_cost_per_bid[arm_bid]
+        tot_clicks = np.sum(self.merge_double_indexed('new_clicks')[:, arm_bid])
+        tot_cost = self.get_tot_cost_per_bid()[arm_bid]
 
         if tot_clicks == 0:
             tot_clicks += 1
@@ -186,22 +164,11 @@ class JointContext:
     def update_pulled_arms(self, strategy_price, strategy_bid):
         price = strategy_price[self.features[0]]
         bid = strategy_bid[self.features[0]]
-        self.pulled_arms.append((price, bid))
+        self.pull_counter.record((price, bid))
 
     def pulled_arm_count(self, arm_p, arm_b):
-        i = 0
-        for arm_price, arm_bid in self.pulled_arms:
-            if arm_price == arm_p and arm_bid == arm_b:
-                i += 1
-
-        return i
-
-    def get_pulled_arms_recap(self):
-        recap = []
-        for arm_p in range(self.n_arms_price):
-            bid_recap = []
-            for arm_b in range(self.n_arms_bid):
-                bid_recap.append(self.pulled_arm_count(arm_p, arm_b))
-            recap.append(bid_recap)
-
-        return recap
+        return self.pull_counter.counts[arm_p, arm_b]
+
+    def get_pulled_arms_recap(self, n_rounds=None):
+        # pulls of every (price, bid) in the first n_rounds rounds (all of them by default)
+        return self.pull_counter.get_counts(n_rounds)
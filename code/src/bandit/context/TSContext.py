@@ -11,10 +11,8 @@ class TSContext(Context):
     # start projection
     def compute_projection_conversion_rate(self, new_clicks_per_arm,
                                            purchases_per_arm, current_round):
-        tot_new_clicks_per_arm = [sum(r) for r in new_clicks_per_arm]
-        successes_per_arm = [sum(r) for r in purchases_per_arm]
-        failures_per_arm = [tot_new_clicks_per_arm[a] - successes_per_arm[a]
-                            for a in range(self.n_arms)]
+        successes_per_arm = purchases_per_arm
+        failures_per_arm = new_clicks_per_arm - purchases_per_arm
 
         betas = [Beta(1 + successes_per_arm[a], 1 + failures_per_arm[a], self.rng)
                  for a in range(self.n_arms)]
@@ -32,14 +30,10 @@ class TSContext(Context):
         return self._compute_cr_averages(new_clicks_per_arm, purchases_per_arm)
 
     def _compute_cr_averages(self, new_clicks_per_arm, purchases_per_arm):
-        return np.array([sum(purchases_per_arm[arm]) / sum(new_clicks_per_arm[arm])
-                         for arm in range(self.n_arms)]).flatten()
+        return purchases_per_arm / new_clicks_per_arm
 
     def compute_conversion_rates_radia(self, new_clicks_per_arm, current_round):
-        tot_clicks_per_arm = np.array([np.sum(new_clicks_per_arm[arm])
-                                       for arm in range(self.n_arms)])
-
-        return np.sqrt(2 * np.log(current_round) / tot_clicks_per_arm)
+        return np.sqrt(2 * np.log(current_round) / new_clicks_per_arm)
 
     def _compute_cr_lower_bounds(self, new_clicks_per_arm, purchases_per_arm, current_round):
         averages = self._compute_cr_averages(new_clicks_per_arm, purchases_per_arm)
@@ -28,14 +28,10 @@ class UCBContext(Context):
         return upper_bounds
 
     def _compute_cr_averages(self, new_clicks_per_arm, purchases_per_arm):
-        return np.array([sum(purchases_per_arm[arm]) / sum(new_clicks_per_arm[arm])
-                         for arm in range(self.n_arms)]).flatten()
+        return purchases_per_arm / new_clicks_per_arm
 
     def compute_conversion_rates_radii(self, new_clicks_per_arm, current_round):
-        tot_clicks_per_arm = np.array([np.sum(new_clicks_per_arm[arm])
-                                       for arm in range(self.n_arms)])
-
-        return np.sqrt(2 * np.log(current_round) / tot_clicks_per_arm)
+        return np.sqrt(2 * np.log(current_round) / new_clicks_per_arm)
     # end projection
 
     def _compute_cr_lower_bounds(self, new_clicks_per_arm, purchases_per_arm, current_round):
@@ -1,7 +1,6 @@
 import numpy as np
 
 from src.bandit.context.JointContext import JointContext
-from src.utils import sum_ragged_matrix
 
 
 class UCBJointContext(JointContext):
@@ -23,28 +22,25 @@ class UCBJointContext(JointContext):
     # end computation random variables
 
     def compute_conversion_rates_averages(self):
-        cr_averages = np.array([(np.sum(sum_ragged_matrix(self.purchases[p])) / np.sum(
-            sum_ragged_matrix(self.new_clicks[p]))) if np.sum(sum_ragged_matrix(self.new_clicks[p])) else 0
-                                for p in range(self.n_arms_price)])
+        tot_clicks_per_arm = np.sum(self.merge_double_indexed('new_clicks'), axis=1)
+        tot_purchases_per_arm = np.sum(self.merge_double_indexed('purchases'), axis=1)
+        cr_averages = np.divide(tot_purchases_per_arm, tot_clicks_per_arm,
+                                out=np.zeros(self.n_arms_price), where=tot_clicks_per_arm > 0)
         return cr_averages
 
     def compute_auction_winning_probability_averages(self):
-        new_c = [[] for b in range(self.n_arms_bid)]
-        for b in range(self.n_arms_bid):
-            for p in range(self.n_arms_price):
-                new_c[b].extend(self.new_clicks[p][b])
-        return np.array([sum(new_c[b]) / self.tot_auctions_per_bid[b] for b in range(self.n_arms_bid)]).flatten()
+        tot_clicks_per_bid = np.sum(self.merge_double_indexed('new_clicks'), axis=0)
+        return tot_clicks_per_bid / self.get_tot_auctions_per_bid()
 
     # start radii computation
 
     def compute_conversion_rates_radii(self, current_round):
-        tot_clicks_per_arm = np.array([np.sum(sum_ragged_matrix(self.new_clicks[p]))
-                                       for p in range(self.n_arms_price)])
+        tot_clicks_per_arm = np.sum(self.merge_double_indexed('new_clicks'), axis=1)
         tot_clicks_per_arm = np.where(tot_clicks_per_arm > 0, tot_clicks_per_arm, 1)
 
         return np.sqrt(2 * np.log(current_round) / tot_clicks_per_arm)
 
     def compute_auction_winning_probability_radii(self, current_round):
-        return (np.sqrt(2 * np.log(current_round) / self.tot_auctions_per_bid)).flatten()
+        return np.sqrt(2 * np.log(current_round) / self.get_tot_auctions_per_bid())
 
     # end radii computation
@@ -2,22 +2,25 @@ import numpy as np
 
 from src.algorithms import simple_class_profit
 from src.bandit.banditEnvironments import BidBanditEnvironment
-from src.utils import average_ragged_matrix, sum_ragged_matrix
-from scipy.stats import norm
+from src.bandit.ArmStatistics import ArmStatistics
+from src.bandit.SafetyConstraint import SafetyConstraint
+from src.checkpoint import save_object_state, load_object_state, learner_shared_objects
+from src.fork import fork
 
 
 class OptimalBidLearner:
     def __init__(self, env: BidBanditEnvironment):
         self.env = env
         self.n_arms = self.env.n_arms
-        self.future_visits_per_arm = [[] for i in range(self.n_arms)]
-        self.purchases_per_arm = [[] for i in range(self.n_arms)]
-        self.auctions_per_arm = [[] for i in range(self.n_arms)]
-        self.new_clicks_per_arm = [[] for i in range(self.n_arms)]
+        # samples of every round: auctions, new clicks, purchases and the future visits of the complete rounds
+        self.stats = ArmStatistics(self.n_arms, ['auctions', 'new_clicks', 'purchases', 'future_visits'])
+        # future visits arrived so far and purchases they correspond to, complete rounds or not
+        self.arrived_future_visits = 0
+        self.future_visits_exposure = 0
         self.tot_cost_per_arm = [0 for i in range(self.n_arms)]
         self.current_round = 0
-        self.pulled_arms = []
         self.security = 0.2
+        self.safety = SafetyConstraint(self.n_arms, self.security)
 
     # start learning loop
     def learn(self, n_rounds: int):
@@ -40,15 +43,7 @@ class OptimalBidLearner:
 
     # start safe arms
     def compute_safe_arms(self):
-        means = [np.mean(new_clicks) for new_clicks in self.new_clicks_per_arm]
-        std_dev = [np.std(new_clicks) for new_clicks in self.new_clicks_per_arm]
-
-        lower_security_value = [norm.ppf(self.security, m, std)
-                                for m, std in zip(means, std_dev)]
-        expected_profits = self.compute_expected_profits(nc=lower_security_value)
-        arm_mask = expected_profits > 0
-
-        return arm_mask
+        return self.safety.compute_safe_arms(lambda nc: self.compute_expected_profits(nc=nc))
 
     # end safe arms
 
@@ -61,10 +56,7 @@ class OptimalBidLearner:
         margin = self.env.margin()
         crs = self.compute_conversion_rates()
         future_visits = self.compute_future_visits()
-        cost_per_click = np.array(
-            [self.tot_cost_per_arm[arm] / np.sum(self.new_clicks_per_arm[arm])
-             for arm in range(self.n_arms)]
-        )
+        cost_per_click = self.compute_cost_per_click_per_arm()
 
         projected_profit = simple_class_profit(
             margin=margin, conversion_rate=crs, new_clicks=new_clicks,
@@ -85,74 +77,76 @@ class OptimalBidLearner:
         margin = self.env.margin()
         crs = self.compute_conversion_rates()
         future_visits = self.compute_future_visits()
-        cost_per_click = np.array(
-            [self.tot_cost_per_arm[arm] / np.sum(self.new_clicks_per_arm[arm])
-             for arm in range(self.n_arms)])
+        cost_per_click = self.compute_cost_per_click_per_arm()
 
         expected_profit = new_clicks * (margin * crs * (1 + future_visits) - cost_per_click)
 
         return expected_profit
 
-    def compute_average_new_clicks_per_arm(self):
-        average_clicks_per_arm = np.array(
-            [np.sum(np.array(self.new_clicks_per_arm[arm]) / len(self.new_clicks_per_arm[arm]))
-             for arm in range(self.n_arms)])
+    def compute_cost_per_click_per_arm(self):
+        return np.array(self.tot_cost_per_arm) / self.stats.get_totals('new_clicks')
 
-        return average_clicks_per_arm
+    def compute_average_new_clicks_per_arm(self):
+        return self.stats.get_averages('new_clicks')
 
     def compute_average_auction_winning_probability_per_arm(self):
-        avgs = [sum(self.new_clicks_per_arm[arm]) / sum(self.auctions_per_arm[arm])
-                for arm in range(self.n_arms)]
-
-        return np.array(avgs)
+        return self.stats.get_totals('new_clicks') / self.stats.get_totals('auctions')
 
     def compute_projection_auction_winning_probability_per_arm(self):
         raise NotImplementedError
 
     # start estimated quantities
     def compute_average_auctions(self):
-        return average_ragged_matrix(self.auctions_per_arm)
+        return np.sum(self.stats.get_totals('auctions')) / np.sum(self.stats.get_counts('auctions'))
 
     def compute_conversion_rates(self):
-        return sum_ragged_matrix(self.purchases_per_arm) / \
-               sum_ragged_matrix(self.new_clicks_per_arm)
+        return np.sum(self.stats.get_totals('purchases')) / np.sum(self.stats.get_totals('new_clicks'))
 
     def compute_future_visits(self):
-        successes_sum = 0
-
-        for arm in range(self.n_arms):
-            complete_samples = len(self.future_visits_per_arm[arm])
-            successes_sum += np.sum(self.purchases_per_arm[arm][:complete_samples])
-
-        if not successes_sum:
+        if not self.future_visits_exposure:
             return 0
         else:
-            return sum_ragged_matrix(self.future_visits_per_arm) / successes_sum
+            return self.arrived_future_visits / self.future_visits_exposure
 
     # end estimated quantities
 
     def get_number_of_pulls(self):
-        return np.array([len(a) for a in self.new_clicks_per_arm])
+        return self.stats.get_counts('new_clicks').copy()
 
     def round_robin(self):
-        while not all(self.future_visits_per_arm):
+        while not np.all(self.stats.get_counts('future_visits')):
             arm = self.current_round % self.n_arms
             self.pull_from_env(arm)
 
     def pull_from_env(self, arm: int):
-        auctions, new_clicks, purchases, tot_cost, \
-            (old_a, visits) = self.env.pull_arm_not_discriminating(arm)
+        batch = self.env.pull(arm)
 
-        self.new_clicks_per_arm[arm].append(new_clicks)
-        self.auctions_per_arm[arm].append(auctions)
-        self.purchases_per_arm[arm].append(purchases)
-        self.tot_cost_per_arm[arm] += tot_cost
+        self.stats.append('new_clicks', arm, np.sum(batch.new_clicks))
+        self.safety.update(arm, np.sum(batch.new_clicks))
+        self.stats.append('auctions', arm, np.sum(batch.auctions))
+        self.stats.append('purchases', arm, np.sum(batch.purchases))
+        self.tot_cost_per_arm[arm] += np.sum(batch.tot_cost)
 
-        if old_a is not None:
-            self.future_visits_per_arm[old_a].append(visits)
+        if batch.has_matured():
+            self.stats.append('future_visits', batch.matured_arms[0, 0], np.sum(batch.matured_visits))
+        self.collect_future_visits_arrivals(batch)
 
         self.current_round += 1
-        self.pulled_arms.append(arm)
 
-    def compute_cumulative_exp_profits(self, expected_profits):
-        return np.cumsum([expected_profits[a] for a in self.pulled_arms])
+    def collect_future_visits_arrivals(self, batch):
+        # The visits of a round can arrive in several parts: each part counts for the share of
+        # purchases of its round whose visits were expected to arrive in that round
+        self.arrived_future_visits += np.sum(batch.arrived_visits)
+        self.future_visits_exposure += np.sum(batch.arrived_exposure)
+
+    def save_state(self, file_path):
+        # Histories and context structure; the bandit environment and the environment are saved on their own
+        save_object_state(self, file_path, learner_shared_objects(self))
+
+    def load_state(self, file_path):
+        # Only for a learner created with the same arguments, on the same environments
+        load_object_state(self, file_path, learner_shared_objects(self))
+
+    def fork(self):
+        # Independent branch of the learner, of its bandit environment and of their environment (see src.fork)
+        return fork(self, self.env.env)
@@ -1,4 +1,10 @@
+import numpy as np
+
+from src.bandit.ArmStatistics import ArmStatistics
+from src.bandit.SafetyConstraint import SafetyConstraint
 from src.bandit.banditEnvironments.JointBanditEnvironment import JointBanditEnvironment
+from src.checkpoint import save_object_state, load_object_state, learner_shared_objects
+from src.fork import fork
 
 
 class OptimalJointDiscriminatingLearner:
@@ -9,24 +15,29 @@ class OptimalJointDiscriminatingLearner:
         self.n_arms_bid = self.env.n_arms_bid
         self.current_round = 0
         self.security = 0.2
-        self.pulled_arms = []
 
         # Context
         self.context_structure = context_structure
         combs = self.env.get_features_combinations()
 
-        # Arms data per context
-        self.future_visits = {c: [[[] for i in range(self.n_arms_bid)]
-                                  for j in range(self.n_arms_price)] for c in combs}
-        self.purchases = {c: [[[] for i in range(self.n_arms_bid)]
-                              for j in range(self.n_arms_price)] for c in combs}
-        self.new_clicks = {c: [[[] for i in range(self.n_arms_bid)]
-                               for j in range(self.n_arms_price)] for c in combs}
-        self.tot_cost_per_bid = {c: [0 for i in range(self.n_arms_bid)] for c in combs}
-        self.tot_auctions_per_bid = {c: [[0] for i in range(self.n_arms_bid)] for c in combs}
+        # Arms data per combination, samples per (combination, price, bid)
+        self.combinations_index = np.arange(len(combs))
+        self.stats = ArmStatistics((len(combs), self.n_arms_price, self.n_arms_bid),
+                                   ['new_clicks', 'purchases', 'future_visits', 'matured_purchases'], labels=combs)
+        self.tot_cost_per_bid = np.zeros((len(combs), self.n_arms_bid))
+        self.tot_auctions_per_bid = np.zeros((len(combs), self.n_arms_bid))
+        for context in self.context_structure:
+            context.attach_data(self.stats, self.tot_cost_per_bid, self.tot_auctions_per_bid)
+        # new clicks of every bid of every context, whatever the price
+        self.contexts_index = np.arange(len(self.context_structure))
+        self.safety = SafetyConstraint((len(self.context_structure), self.n_arms_bid), self.security,
+                                       default_std=1, non_negative=True)
 
         # Recap data
         self.strategies = []
+        if not self.env.discriminating:
+            # its regret is measured against the optimum of every customer class on its own
+            raise ValueError('A discriminating learner needs a bandit environment built with discriminating=True')
 
     def get_strategies(self):
         return self.strategies
@@ -44,33 +55,30 @@ class OptimalJointDiscriminatingLearner:
 
     def pull_from_env(self, strategy_price, strategy_bid):
         # Actual pull
-        auctions, new_clicks, purchases, tot_cost, \
-            (past_strategies, visits) = self.env.pull_arm_discriminating(strategy_price,
-                                                                         strategy_bid)
+        batch = self.env.pull(self.env.strategy_to_arms(strategy_price, strategy_bid))
 
         # Current round data update
-        for comb in self.env.get_features_combinations():
-            self.tot_auctions_per_bid[comb][strategy_bid[comb]] += auctions[comb]
-
-            self.new_clicks[comb][strategy_price[comb]][strategy_bid[comb]]\
-                .append(new_clicks[comb])
-            self.purchases[comb][strategy_price[comb]][strategy_bid[comb]]\
-                .append(purchases[comb])
-            self.tot_cost_per_bid[comb][strategy_bid[comb]] += tot_cost[comb]
-
-        # Past round data update
-        if past_strategies[0]:
-            price_strat, bid_strat = past_strategies
-
-            for comb in self.env.get_features_combinations():
-                old_arm_p = price_strat[comb]
-                old_arm_b = bid_strat[comb]
-                self.future_visits[comb][old_arm_p][old_arm_b].append(visits[comb])
+        combs = self.env.get_features_combinations()
+        arms = (self.combinations_index, np.array([strategy_price[comb] for comb in combs]),
+                np.array([strategy_bid[comb] for comb in combs]))
+        self.stats.append('new_clicks', arms, batch.new_clicks)
+        self.stats.append('purchases', arms, batch.purchases)
+        self.tot_auctions_per_bid[self.combinations_index, arms[2]] += batch.auctions
+        self.tot_cost_per_bid[self.combinations_index, arms[2]] += batch.tot_cost
+
+        # Past round data update, with the purchases of the round that matured
+        if batch.has_matured():
+            matured_arms = (self.combinations_index, *batch.matured_arms)
+            matured_round = self.stats.get_counts('future_visits')[matured_arms]
+            self.stats.append('matured_purchases', matured_arms,
+                              self.stats.get_nth_samples('purchases', matured_arms, matured_round))
+            self.stats.append('future_visits', matured_arms, batch.matured_visits)
 
         # Update context data
+        contexts_bid = np.array([strategy_bid[context.features[0]] for context in self.context_structure])
+        contexts_new_clicks = np.array([np.sum(batch.new_clicks[context.rows]) for context in self.context_structure])
+        self.safety.update((self.contexts_index, contexts_bid), contexts_new_clicks)
         for context in self.context_structure:
-            context.merge_all_data(self.future_visits, self.purchases, self.new_clicks,
-                                   self.tot_cost_per_bid,self.tot_auctions_per_bid)
             context.update_pulled_arms(strategy_price, strategy_bid)
 
         # Update history
@@ -84,8 +92,9 @@ class OptimalJointDiscriminatingLearner:
         strategy_price = {}
         strategy_bid = {}
 
-        for context in self.context_structure:
-            arm_p, arm_b = context.choose_next_arm(self.security, self.current_round)
+        lower_new_clicks = self.safety.get_lower_bounds()
+        for i, context in enumerate(self.context_structure):
+            arm_p, arm_b = context.choose_next_arm(lower_new_clicks[i], self.current_round)
 
             for comb in context.features:
                 strategy_price[comb] = arm_p
@@ -97,9 +106,8 @@ class OptimalJointDiscriminatingLearner:
 
     def round_robin(self):
         combs = self.env.get_features_combinations()
-        finished = False
 
-        while not finished:
+        while not self.round_robin_finished():
             arm_price = self.current_round % self.n_arms_price
             strategy_price = {comb: arm_price for comb in combs}
             arm_bid = self.current_round % self.n_arms_bid
@@ -107,10 +115,25 @@ class OptimalJointDiscriminatingLearner:
 
             self.pull_from_env(strategy_price, strategy_bid)
 
-            # Check end cycle (trust Jacopo)
-            all_price_with_future_visits = all(any(x) for x in self.future_visits[(False, False)])
-            bid_without_sample = any(all(not self.new_clicks[(False, False)][p][b] for p in range(self.n_arms_price)) for b in range(self.n_arms_bid))
-            finished = all_price_with_future_visits and not bid_without_sample
+    def round_robin_finished(self):
+        # Check end cycle (trust Jacopo): the combinations are pulled together during the round robin, so
+        # the last one, (False, False) with two features, stands for all of them
+        row = self.stats.get_label_indices([self.env.get_features_combinations()[-1]])[0]
+        all_price_with_future_visits = np.all(np.any(self.stats.get_counts('future_visits')[row], axis=1))
+        bid_without_sample = not np.all(np.any(self.stats.get_counts('new_clicks')[row], axis=0))
+        return all_price_with_future_visits and not bid_without_sample
 
     def get_context_structure(self):
         return self.context_structure
+
+    def save_state(self, file_path):
+        # Histories and context structure; the bandit environment and the environment are saved on their own
+        save_object_state(self, file_path, learner_shared_objects(self))
+
+    def load_state(self, file_path):
+        # Only for a learner created with the same arguments, on the same environments
+        load_object_state(self, file_path, learner_shared_objects(self))
+
+    def fork(self):
+        # Independent branch of the learner, of its bandit environment and of their environment (see src.fork)
+        return fork(self, self.env.env)
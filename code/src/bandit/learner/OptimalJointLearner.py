@@ -1,9 +1,12 @@
 import numpy as np
-from scipy.stats import norm
 
 from src.algorithms import simple_class_profit
 from src.bandit.banditEnvironments.JointBanditEnvironment import JointBanditEnvironment
-from src.utils import sum_ragged_matrix, average_ragged_matrix
+from src.bandit.ArmStatistics import ArmStatistics
+from src.bandit.PullCounter import PullCounter
+from src.bandit.SafetyConstraint import SafetyConstraint
+from src.checkpoint import save_object_state, load_object_state, learner_shared_objects
+from src.fork import fork
 
 
 class OptimalJointLearner:
@@ -12,18 +15,19 @@ class OptimalJointLearner:
         self.n_arms_price = self.env.n_arms_price
         self.n_arms_bid = self.env.n_arms_bid
 
-        self.future_visits = [[[] for i in range(self.n_arms_bid)]
-                              for j in range(self.n_arms_price)]
-        self.purchases = [[[] for i in range(self.n_arms_bid)]
-                          for j in range(self.n_arms_price)]
-        self.new_clicks = [[[] for i in range(self.n_arms_bid)]
-                           for j in range(self.n_arms_price)]
+        # samples of every round per (price, bid): new clicks, purchases and the future visits of the complete rounds
+        self.stats = ArmStatistics((self.n_arms_price, self.n_arms_bid), ['new_clicks', 'purchases', 'future_visits'])
+        # future visits arrived so far and purchases they correspond to, complete rounds or not
+        self.arrived_future_visits_per_price = np.zeros(self.n_arms_price)
+        self.future_visits_exposure_per_price = np.zeros(self.n_arms_price)
         self.tot_cost_per_bid = [0 for i in range(self.n_arms_bid)]
         self.tot_auctions_per_bid = [[0] for i in range(self.n_arms_bid)]
         self.current_round = 0
         self.security = 0.2
+        # new clicks of every bid, whatever the price
+        self.safety = SafetyConstraint(self.n_arms_bid, self.security)
 
-        self.pulled_arms = []
+        self.pull_counter = PullCounter((self.n_arms_price, self.n_arms_bid))
 
     def learn(self, n_rounds: int):
         self.round_robin()
@@ -49,21 +53,7 @@ class OptimalJointLearner:
     # end next arm choice
 
     def compute_safe_arms(self, arm_price):
-
-        new_c = [[] for b in range(self.n_arms_bid)]
-        for b in range(self.n_arms_bid):
-            for p in range(self.n_arms_price):
-                new_c[b].extend(self.new_clicks[p][b])
-
-        means = [np.mean(new_c[b]) for b in range(self.n_arms_bid)]
-        std_devs = [np.std(new_c[b]) for b in range(self.n_arms_bid)]
-
-        lower_security_value = [norm.ppf(self.security, m, std) for m, std in zip(means, std_devs)]
-
-        expected_profits = self.compute_expected_profits_fixed_price(arm_price, nc=lower_security_value)
-        arm_mask = expected_profits > 0
-
-        return arm_mask
+        return self.safety.compute_safe_arms(lambda nc: self.compute_expected_profits_fixed_price(arm_price, nc=nc))
 
     # start projected profits fixed bid
 
@@ -117,16 +107,15 @@ class OptimalJointLearner:
     # start axis projected quantities
 
     def compute_conversion_rates(self, arm_price):
-        return sum_ragged_matrix(self.purchases[arm_price]) / \
-               sum_ragged_matrix(self.new_clicks[arm_price])
+        return np.sum(self.stats.get_totals('purchases')[arm_price]) / \
+               np.sum(self.stats.get_totals('new_clicks')[arm_price])
 
     def compute_new_clicks(self, arm_bid):
-        return average_ragged_matrix([self.new_clicks[p][arm_bid]
-                                      for p in range(self.n_arms_price)])
+        return np.sum(self.stats.get_totals('new_clicks')[:, arm_bid]) / \
+               np.sum(self.stats.get_counts('new_clicks')[:, arm_bid])
 
     def compute_cost_per_click(self, arm_bid):
-        tot_clicks = np.sum([np.sum(self.new_clicks[arm_p][arm_bid])
-                             for arm_p in range(self.n_arms_price)])
+        tot_clicks = np.sum(self.stats.get_totals('new_clicks')[:, arm_bid])
         tot_cost = self.tot_cost_per_bid[arm_bid]
         cost_per_click = tot_cost / tot_clicks
 
@@ -137,14 +126,8 @@ class OptimalJointLearner:
                          for arm_p in range(self.n_arms_price)])
 
     def compute_future_visits(self, arm_price):
-        arm_p_future_visits = 0
-        arm_p_purchases = 0
-        for arm_b in range(self.n_arms_bid):
-            complete_samples = len(self.future_visits[arm_price][arm_b])
-            future_visits = np.sum(self.future_visits[arm_price][arm_b])
-            purchases = np.sum(self.purchases[arm_price][arm_b][:complete_samples])
-            arm_p_future_visits += future_visits
-            arm_p_purchases += purchases
+        arm_p_future_visits = self.arrived_future_visits_per_price[arm_price]
+        arm_p_purchases = self.future_visits_exposure_per_price[arm_price]
 
         return arm_p_future_visits / arm_p_purchases if arm_p_purchases else 0
 
@@ -170,47 +153,51 @@ class OptimalJointLearner:
 
     def round_robin(self):
         # Just trust Jacopo for this one-liner, I do, you will.
-        while not all(any(x) for x in self.future_visits) or any(
-                all(not self.new_clicks[p][b] for p in range(self.n_arms_price)) for b in range(self.n_arms_bid)):
+        while not np.all(np.any(self.stats.get_counts('future_visits'), axis=1)) or \
+                not np.all(np.any(self.stats.get_counts('new_clicks'), axis=0)):
             arm_p = self.current_round % self.n_arms_price
             arm_b = self.current_round % self.n_arms_bid
             self.pull_from_env(arm_p, arm_b)
 
     def pull_from_env(self, arm_price: int, arm_bid: int):
-        auctions, new_clicks, purchases, tot_cost, \
-        (old_a, visits) = self.env.pull_arm_not_discriminating(arm_price, arm_bid)
+        batch = self.env.pull((arm_price, arm_bid))
 
-        self.tot_auctions_per_bid[arm_bid] += auctions
+        self.tot_auctions_per_bid[arm_bid] += np.sum(batch.auctions)
 
-        self.new_clicks[arm_price][arm_bid].append(new_clicks)
-        self.purchases[arm_price][arm_bid].append(purchases)
-        self.tot_cost_per_bid[arm_bid] += tot_cost
+        self.stats.append('new_clicks', (arm_price, arm_bid), np.sum(batch.new_clicks))
+        self.safety.update(arm_bid, np.sum(batch.new_clicks))
+        self.stats.append('purchases', (arm_price, arm_bid), np.sum(batch.purchases))
+        self.tot_cost_per_bid[arm_bid] += np.sum(batch.tot_cost)
 
-        if old_a[0] is not None:
-            arm_p, arm_b = old_a
-            self.future_visits[arm_p][arm_b].append(visits)
+        if batch.has_matured():
+            arm_p, arm_b = batch.matured_arms[:, 0]
+            self.stats.append('future_visits', (arm_p, arm_b), np.sum(batch.matured_visits))
+        self.collect_future_visits_arrivals(batch)
 
         self.current_round += 1
-        self.pulled_arms.append((arm_price, arm_bid))
+        self.pull_counter.record((arm_price, arm_bid))
+
+    def collect_future_visits_arrivals(self, batch):
+        # The visits of a round can arrive in several parts: each part counts for the share of
+        # purchases of its round whose visits were expected to arrive in that round
+        self.arrived_future_visits_per_price += np.sum(batch.arrived_visits, axis=1)
+        self.future_visits_exposure_per_price += np.sum(batch.arrived_exposure, axis=1)
 
     def pulled_arm_count(self, arm_p, arm_b):
-        i = 0
-        for arm_price, arm_bid in self.pulled_arms:
-            if arm_price == arm_p and arm_bid == arm_b:
-                i += 1
-
-        return i
-
-    def get_pulled_arms_recap(self):
-        recap = []
-        for arm_p in range(self.n_arms_price):
-            bid_recap = []
-            for arm_b in range(self.n_arms_bid):
-                bid_recap.append(self.pulled_arm_count(arm_p, arm_b))
-            recap.append(bid_recap)
-
-        return recap
-
-    def compute_cumulative_exp_profits(self, expected_profits):
-        return np.cumsum([expected_profits[p][b]
-                          for p, b in self.pulled_arms])
+        return self.pull_counter.counts[arm_p, arm_b]
+
+    def get_pulled_arms_recap(self, n_rounds=None):
+        # pulls of every (price, bid) in the first n_rounds rounds (all of them by default)
+        return self.pull_counter.get_counts(n_rounds)
+
+    def save_state(self, file_path):
+        # Histories and context structure; the bandit environment and the environment are saved on their own
+        save_object_state(self, file_path, learner_shared_objects(self))
+
+    def load_state(self, file_path):
+        # Only for a learner created with the same arguments, on the same environments
+        load_object_state(self, file_path, learner_shared_objects(self))
+
+    def fork(self):
+        # Independent branch of the learner, of its bandit environment and of their environment (see src.fork)
+        return fork(self, self.env.env)
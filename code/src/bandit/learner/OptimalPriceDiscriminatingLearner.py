@@ -4,22 +4,37 @@ import numpy as np
 
 from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
 from src.bandit.context import Context
+from src.bandit.context.ContextTree import ContextTree
+from src.bandit.learner.split_schedules import every_round
+from src.partitions import subset_sums, lowest_elements, mask_elements, optimal_partition
+from src.checkpoint import save_object_state, load_object_state, learner_shared_objects
+from src.fork import fork
 
 
 class OptimalPriceDiscriminatingLearner:
-    def __init__(self, env: PriceBanditEnvironment, context_creator, round_robins_per_cycle=1):
+    def __init__(self, env: PriceBanditEnvironment, context_creator, round_robins_per_cycle=1, commitment_rounds=1,
+                 split_schedule=every_round):
         self.env = env
         self.n_arms = self.env.n_arms
         self.context_creator = context_creator
         self.round_robins_per_cycle = round_robins_per_cycle
-
-        combs = self.env.get_features_combinations()
-        self.future_visits_per_comb_per_arm = {c: [[] for i in range(self.n_arms)] for c in combs}
-        self.purchases_per_comb_per_arm = {c: [[] for i in range(self.n_arms)] for c in combs}
-        self.new_clicks_per_comb_per_arm = {c: [[] for i in range(self.n_arms)] for c in combs}
-        self.tot_cost_per_comb = {c: 0 for c in combs}
-
-        self.strategies = []
+        # Commitment mode: in the normal rounds, the chosen strategy is played for up to commitment_rounds
+        # rounds (never past the normal phase) in a single pull, the contexts are updated after them
+        self.commitment_rounds = commitment_rounds
+        # The contexts are evaluated for splits after the pulls for which split_schedule(self) is True (see
+        # split_schedules)
+        self.split_schedule = split_schedule
+
+        # totals per arm of the contexts and of the candidate splits, shared with the contexts; the future
+        # visits of the complete rounds, and the purchases of the same rounds
+        self.tree = ContextTree(self.env.get_features_combinations(), self.n_arms,
+                                ['new_clicks', 'purchases', 'future_visits', 'matured_purchases'])
+        # purchases per combination of the rounds whose future visits are not complete yet, oldest first
+        self.pending_purchases = []
+
+        if not self.env.discriminating:
+            # its regret is measured against the optimum of every customer class on its own
+            raise ValueError('A discriminating learner needs a bandit environment built with discriminating=True')
 
         self.context_structure: List[Context] = [
             self.context_creator(
@@ -39,46 +54,97 @@ class OptimalPriceDiscriminatingLearner:
         self.performed_round_robins = 0
 
         self.performed_splits = []
+        # convenient splits found at every evaluation: (round, feature, incentive)
+        self.found_splits = []
+        self.exploration_ended = False
+        self.last_split_evaluation_round = 0
+        # candidate contexts and the memoized terms of their lower bounds, by assignment of their node of the tree
+        self.candidate_contexts = {}
+        self.lower_bound_terms_memo = {}
 
     # start learning loop
     def learn(self, n_rounds: int):
         self.initial_round_robin()
 
         while self.current_round < n_rounds:
-            self.learn_one_round()
+            self.learn_one_round(n_rounds - self.current_round)
 
-    def learn_one_round(self):
+    def learn_one_round(self, max_rounds=1):
         strategy = self.choose_next_strategy()
-        self.pull_from_env(strategy=strategy)
+        n_days = self.compute_committed_rounds(max_rounds)
+        if n_days > 1:
+            self.pull_from_env_for_days(strategy, n_days)
+        else:
+            self.pull_from_env(strategy=strategy)
 
         self.update_contexts()
 
+    def compute_committed_rounds(self, max_rounds):
+        # the strategy stays fixed for up to commitment_rounds rounds, never past the normal rounds; the
+        # contexts are evaluated after the committed rounds, even if split_schedule is due in between
+        if self.state_is_explorative_rounds:
+            return 1
+        return max(1, min(self.commitment_rounds, self.remaining_normal_rounds, max_rounds))
+
     # end learning loop
 
     # start update context
     def update_contexts(self):
+        if not self.split_schedule(self):
+            return
+        self.exploration_ended = False
+        self.last_split_evaluation_round = self.current_round
+
+        # the splits of a leaf leave the other leaves and their candidates as they are
+        lower_bounds = self.compute_split_lower_bounds()
         for context in self.context_structure:
-            convenient_splits = self.compute_convenient_splits(context)
+            convenient_splits = self.compute_convenient_splits(context, lower_bounds)
             if convenient_splits:
                 incentive, new_structure, feature = max(convenient_splits,
                                                         key=lambda x: x[0])
                 self.context_structure = new_structure
+                self.tree.split(context.get_node(self.tree), feature)
                 self.performed_splits.append((self.current_round, feature, incentive))
-                print(f'Split context at round {self.current_round} '
-                      f'on feature {feature}')
 
     # end update context
 
+    def get_lower_bound_terms(self, context):
+        # the terms are memoized until the totals of the node of the context change (see ContextTreeNode.version)
+        node = context.get_node(self.tree)
+        memo = self.lower_bound_terms_memo.get(node.assignment)
+        if memo is None or memo[0] is not node or memo[1] != node.version:
+            memo = (node, node.version, context.compute_lower_bound_terms(self.tree))
+            self.lower_bound_terms_memo[node.assignment] = memo
+        return memo[2]
+
+    def compute_split_lower_bounds(self):
+        # The lower bounds of the contexts and of the contexts of all their possible splits, by assignment of
+        # their node of the tree: the memoized terms of all of them are stacked and their round-dependent
+        # part is evaluated in a single vectorized call
+        contexts = {}
+        for context in self.context_structure:
+            contexts[context.get_node(self.tree).assignment] = context
+            for _, context_true, context_false in self.compute_possible_splits(context):
+                contexts[context_true.get_node(self.tree).assignment] = context_true
+                contexts[context_false.get_node(self.tree).assignment] = context_false
+
+        terms = [self.get_lower_bound_terms(context) for context in contexts.values()]
+        lower_bounds = self.context_structure[0].compute_lower_bounds_from_terms(terms, self.current_round)
+        return dict(zip(contexts, lower_bounds))
+
     # start convenient splits
-    def compute_convenient_splits(self, context):
-        current_lower = self.compute_context_expected_profit_lower_bound(context)
+    def compute_convenient_splits(self, context, lower_bounds=None):
+        # lower_bounds: as returned by compute_split_lower_bounds, computed if not given
+        if lower_bounds is None:
+            lower_bounds = self.compute_split_lower_bounds()
+        current_lower = lower_bounds[context.get_node(self.tree).assignment]
         new_structures = []
 
         possible_splits = self.compute_possible_splits(context)
 
         for feature_n, context_true, context_false in possible_splits:
-            true_lower = self.compute_context_expected_profit_lower_bound(context_true)
-            false_lower = self.compute_context_expected_profit_lower_bound(context_false)
+            true_lower = lower_bounds[context_true.get_node(self.tree).assignment]
+            false_lower = lower_bounds[context_false.get_node(self.tree).assignment]
 
             incentive = true_lower + false_lower - current_lower
             if incentive > 0:
@@ -86,40 +152,34 @@ class OptimalPriceDiscriminatingLearner:
                 new_structure.remove(context)
                 new_structure.append(context_true)
                 new_structure.append(context_false)
-
-                print(
-                    f'Found convenient split at round {self.current_round} '
-                    f'on feature {feature_n}, incentive = {incentive:.2f}')
                 new_structures.append((incentive, new_structure, feature_n))
+                self.found_splits.append((self.current_round, feature_n, incentive))
         return new_structures
 
     # end convenient splits
 
     # start possible splits
     def compute_possible_splits(self, context):
-        n_features = len(self.context_structure[0].features[0])
+        # the valid splits (two non-empty contexts) are the candidates of the leaf of the context
         res = []
-        for i in range(n_features):
-            combinations_where_i_is_true = [f for f in context.features if f[i]]
-            combinations_where_i_is_false = [f for f in context.features if not f[i]]
-
-            # a valid split generates two non-empty context
-            if combinations_where_i_is_false and combinations_where_i_is_true:
-                context_true = self.context_creator(features=combinations_where_i_is_true,
-                                                    arm_margin_function=self.env.margin,
-                                                    n_arms=self.n_arms,
-                                                    rng=self.env.rng)
-
-                context_false = self.context_creator(features=combinations_where_i_is_false,
-                                                     arm_margin_function=self.env.margin,
-                                                     n_arms=self.n_arms,
-                                                     rng=self.env.rng)
-                res.append((i, context_true, context_false))
+        for i, (node_true, node_false) in sorted(context.get_node(self.tree).candidates.items()):
+            res.append((i, self.get_candidate_context(node_true), self.get_candidate_context(node_false)))
 
         return res
 
     # end possible splits
 
+    def get_candidate_context(self, node):
+        # the candidate contexts are created once for every node
+        key = node.assignment
+        if key not in self.candidate_contexts:
+            combs = self.env.get_features_combinations()
+            self.candidate_contexts[key] = self.context_creator(features=[combs[i] for i in node.index],
+                                                                arm_margin_function=self.env.margin,
+                                                                n_arms=self.n_arms,
+                                                                rng=self.env.rng)
+        return self.candidate_contexts[key]
+
     # start choose next explorative
     def choose_next_strategy_explorative(self):
         strategy = {}
@@ -129,11 +189,7 @@ class OptimalPriceDiscriminatingLearner:
             if could_be_split:
                 arm = self.next_round_robin_arm
             else:
-                arm = context.choose_next_arm(self.new_clicks_per_comb_per_arm,
-                                              self.purchases_per_comb_per_arm,
-                                              self.tot_cost_per_comb,
-                                              self.future_visits_per_comb_per_arm,
-                                              self.current_round)
+                arm = context.choose_next_arm(self.tree, self.current_round)
             for comb in context.features:
                 strategy[comb] = arm
 
@@ -152,11 +208,7 @@ class OptimalPriceDiscriminatingLearner:
     def choose_next_strategy_normal(self):
         strategy = {}
         for context in self.context_structure:
-            arm = context.choose_next_arm(self.new_clicks_per_comb_per_arm,
-                                          self.purchases_per_comb_per_arm,
-                                          self.tot_cost_per_comb,
-                                          self.future_visits_per_comb_per_arm,
-                                          self.current_round)
+            arm = context.choose_next_arm(self.tree, self.current_round)
             for comb in context.features:
                 strategy[comb] = arm
 
@@ -165,29 +217,42 @@ class OptimalPriceDiscriminatingLearner:
     # end choose next strategy
 
     def initial_round_robin(self):
-        while not all(self.future_visits_per_comb_per_arm[(False, False)]):
+        # every combination is pulled with the same arm, so the samples of the root are the ones of each of them
+        if np.all(self.tree.get_counts(self.tree.root, 'future_visits')):
+            # already performed, e.g. when the learning is resumed or extended
+            return
+
+        while not np.all(self.tree.get_counts(self.tree.root, 'future_visits')):
             arm = self.current_round % self.n_arms
             strategy = {comb: arm for comb in self.env.get_features_combinations()}
             self.pull_from_env(strategy)
 
         self.performed_round_robins = 4
+        self.exploration_ended = True
         self.state_is_explorative_rounds = False
         self.remaining_normal_rounds = 2 ** self.performed_round_robins
 
     def pull_from_env(self, strategy):
-        new_clicks, purchases, tot_cost, \
-            (past_arm_strategy, past_future_visits) = self.env.pull_arm_discriminating(strategy)
-
-        for comb in self.env.get_features_combinations():
-            self.new_clicks_per_comb_per_arm[comb][strategy[comb]].append(new_clicks[comb])
-            self.purchases_per_comb_per_arm[comb][strategy[comb]].append(purchases[comb])
-            self.tot_cost_per_comb[comb] += tot_cost[comb]
+        batch = self.env.pull(self.env.strategy_to_arms(strategy))
+        self.update_from_batch(strategy, batch)
+
+    def pull_from_env_for_days(self, strategy, n_days):
+        batch = self.env.pull_arms_for_days(self.env.strategy_to_arms(strategy), n_days)
+        for day in range(n_days):
+            self.update_from_batch(strategy, batch.day(day))
+
+    def update_from_batch(self, strategy, batch):
+        arms = np.array([strategy[comb] for comb in self.env.get_features_combinations()])
+        self.tree.update('new_clicks', arms, batch.new_clicks)
+        self.tree.update('purchases', arms, batch.purchases)
+        self.tree.update_cost(batch.tot_cost)
+
+        # the rounds mature in the order they are pulled
+        self.pending_purchases.append(np.array(batch.purchases))
+        if batch.has_matured():
+            self.tree.update('matured_purchases', batch.matured_arms[0], self.pending_purchases.pop(0))
+            self.tree.update('future_visits', batch.matured_arms[0], batch.matured_visits)
 
-        if past_arm_strategy is not None:
-            for comb, chosen_arm in past_arm_strategy.items():
-                self.future_visits_per_comb_per_arm[comb][chosen_arm].append(past_future_visits[comb])
-
-        self.strategies.append(strategy)
         self.update_round_count()
 
     def update_round_count(self):
@@ -202,6 +267,7 @@ class OptimalPriceDiscriminatingLearner:
             if not self.remaining_round_robins:
                 self.performed_round_robins += 1
                 self.state_is_explorative_rounds = False
+                self.exploration_ended = True
                 self.remaining_normal_rounds = 2 ** self.performed_round_robins
         else:
             self.remaining_normal_rounds -= 1
@@ -217,33 +283,48 @@ class OptimalPriceDiscriminatingLearner:
         return self.context_structure
 
     def compute_context_projected_profit(self, context: Context):
-        return context.compute_projected_profit(self.new_clicks_per_comb_per_arm,
-                                                self.purchases_per_comb_per_arm,
-                                                self.tot_cost_per_comb,
-                                                self.future_visits_per_comb_per_arm,
-                                                self.current_round)
+        return context.compute_projected_profit(self.tree, self.current_round)
 
     def compute_context_expected_profit(self, context: Context):
-        return context.compute_expected_profits(self.new_clicks_per_comb_per_arm,
-                                                self.purchases_per_comb_per_arm,
-                                                self.tot_cost_per_comb,
-                                                self.future_visits_per_comb_per_arm)
+        return context.compute_expected_profits(self.tree)
 
     def compute_context_expected_profit_lower_bound(self, context: Context):
-        return context.compute_expected_profit_lower_bound(self.new_clicks_per_comb_per_arm,
-                                                           self.purchases_per_comb_per_arm,
-                                                           self.tot_cost_per_comb,
-                                                           self.future_visits_per_comb_per_arm,
-                                                           self.current_round)
-
-    def compute_cumulative_exp_profits(self, expected_profits):
-        return np.cumsum([
-            sum(expected_profits[comb][arm] for comb, arm in s.items())
-            for s in self.strategies]
-        )
+        # only the round-dependent term is computed again while the samples of the context do not change
+        return context.compute_lower_bound_from_terms(self.get_lower_bound_terms(context), self.current_round)
+
+    def compute_optimal_partition(self):
+        # Best partition of the combinations into contexts by the sum of the lower bounds of their expected
+        # profits, over every partition and not only the splits of the tree (see src.partitions), for
+        # comparison with the context structure: (lower bound, list of the combinations of every context)
+        combs = self.env.get_features_combinations()
+        totals = {s: subset_sums(self.tree.comb_totals[s]) for s in self.tree.series}
+        counts = self.tree.comb_counts['new_clicks'][lowest_elements(len(combs))]
+        tot_cost = subset_sums(self.tree.comb_cost)
+
+        # the bounds only depend on the type of the contexts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lower_bounds = self.context_structure[0].compute_expected_profit_lower_bounds(totals, counts, tot_cost,
+                                                                                        self.current_round)
+        # the sets without samples are never chosen
+        lower_bounds[np.isnan(lower_bounds)] = -np.inf
+
+        lower_bound, partition = optimal_partition(lower_bounds)
+        return lower_bound, [[combs[i] for i in mask_elements(mask)] for mask in partition]
 
     def get_average_conversion_rates(self, context: Context):
-        return context.get_average_conversion_rates(self.new_clicks_per_comb_per_arm, self.purchases_per_comb_per_arm)
+        return context.get_average_conversion_rates(self.tree)
 
     def get_context_number_of_pulls(self, context: Context):
-        return context.get_number_of_pulls(self.new_clicks_per_comb_per_arm)
+        return context.get_number_of_pulls(self.tree)
+
+    def save_state(self, file_path):
+        # Histories and context structure; the bandit environment and the environment are saved on their own
+        save_object_state(self, file_path, learner_shared_objects(self))
+
+    def load_state(self, file_path):
+        # Only for a learner created with the same arguments, on the same environments
+        load_object_state(self, file_path, learner_shared_objects(self))
+
+    def fork(self):
+        # Independent branch of the learner, of its bandit environment and of their environment (see src.fork)
+        return fork(self, self.env.env)
@@ -2,21 +2,23 @@ import numpy as np
 
 from src.algorithms import simple_class_profit
 from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
-from src.utils import sum_ragged_matrix, average_ragged_matrix
+from src.bandit.ArmStatistics import ArmStatistics
+from src.checkpoint import save_object_state, load_object_state, learner_shared_objects
+from src.fork import fork
 
 
 class OptimalPriceLearner:
     def __init__(self, env: PriceBanditEnvironment):
         self.env = env
         self.n_arms = self.env.n_arms
-        self.future_visits_per_arm = [[] for i in range(self.n_arms)]
-        self.purchases_per_arm = [[] for i in range(self.n_arms)]
-        self.new_clicks_per_arm = [[] for i in range(self.n_arms)]
+        # samples of every round: new clicks, purchases and the future visits of the complete rounds
+        self.stats = ArmStatistics(self.n_arms, ['new_clicks', 'purchases', 'future_visits'])
+        # future visits arrived so far and purchases they correspond to, complete rounds or not
+        self.arrived_future_visits_per_arm = np.zeros(self.n_arms)
+        self.future_visits_exposure_per_arm = np.zeros(self.n_arms)
         self.tot_cost = 0
         self.current_round = 0
 
-        self.pulled_arms = []
-
     # start learning loop
     def learn(self, n_rounds: int):
         self.round_robin()
@@ -38,7 +40,7 @@ class OptimalPriceLearner:
         margin = np.array([self.env.margin(a) for a in range(self.n_arms)])
         crs = self.compute_projection_conversion_rates()
         future_visits = self.compute_future_visits_per_arm()
-        tot_clicks = sum_ragged_matrix(self.new_clicks_per_arm)
+        tot_clicks = np.sum(self.stats.get_totals('new_clicks'))
         cost_per_click = self.tot_cost / tot_clicks
 
         projected_profit = simple_class_profit(
@@ -55,7 +57,7 @@ class OptimalPriceLearner:
         margin = np.array([self.env.margin(a) for a in range(self.n_arms)])
         crs = self.get_average_conversion_rates()
         future_visits = self.compute_future_visits_per_arm()
-        tot_clicks = sum_ragged_matrix(self.new_clicks_per_arm)
+        tot_clicks = np.sum(self.stats.get_totals('new_clicks'))
 
         cost_per_click = self.tot_cost / tot_clicks
 
@@ -70,16 +72,15 @@ class OptimalPriceLearner:
     def compute_future_visits_per_arm(self):
         res = []
         for arm in range(self.n_arms):
-            complete_samples = len(self.future_visits_per_arm[arm])
-            future_visits = np.sum(self.future_visits_per_arm[arm])
-            purchases = np.sum(self.purchases_per_arm[arm][:complete_samples])
+            future_visits = self.arrived_future_visits_per_arm[arm]
+            purchases = self.future_visits_exposure_per_arm[arm]
             future_visits_per_purchase = future_visits / purchases if purchases else 0
             res.append(future_visits_per_purchase)
 
         return np.array(res)
 
     def compute_average_new_clicks(self):
-        return average_ragged_matrix(self.new_clicks_per_arm)
+        return np.sum(self.stats.get_totals('new_clicks')) / np.sum(self.stats.get_counts('new_clicks'))
 
     # end compute estimates
     # start conversion rates
@@ -92,32 +93,46 @@ class OptimalPriceLearner:
     # end conversion rates
 
     def get_number_of_pulls(self):
-        return [len(a) for a in self.new_clicks_per_arm]
+        return list(self.stats.get_counts('new_clicks'))
 
     def round_robin(self):
-        while not all(self.future_visits_per_arm):
+        while not np.all(self.stats.get_counts('future_visits')):
             arm = self.current_round % self.n_arms
             self.pull_from_env(arm)
 
     def pull_from_env(self, arm: int):
-        new_clicks, purchases, tot_cost, \
-            (old_a, visits) = self.env.pull_arm_not_discriminating(arm)
+        batch = self.env.pull(arm)
+        new_clicks, purchases, tot_cost = np.sum(batch.new_clicks), np.sum(batch.purchases), np.sum(batch.tot_cost)
 
-        self.new_clicks_per_arm[arm].append(new_clicks)
-        self.purchases_per_arm[arm].append(purchases)
+        self.stats.append('new_clicks', arm, new_clicks)
+        self.stats.append('purchases', arm, purchases)
         self.tot_cost += tot_cost
 
-        if old_a is not None:
-            self.future_visits_per_arm[old_a].append(visits)
+        old_a, visits = None, np.sum(batch.matured_visits)
+        if batch.has_matured():
+            old_a = batch.matured_arms[0, 0]
+            self.stats.append('future_visits', old_a, visits)
+        self.collect_future_visits_arrivals(batch)
 
         self.current_round += 1
-        self.pulled_arms.append(arm)
-        
+
         # return value used in TSOptimalPriceLearner
         return new_clicks, purchases, tot_cost, (old_a, visits)
 
-    def compute_cumulative_exp_profits(self, expected_profits):
-        return np.cumsum([expected_profits[a] for a in self.pulled_arms])
+    def collect_future_visits_arrivals(self, batch):
+        # The visits of a round can arrive in several parts: each part counts for the share of
+        # purchases of its round whose visits were expected to arrive in that round
+        self.arrived_future_visits_per_arm += batch.arrived_visits
+        self.future_visits_exposure_per_arm += batch.arrived_exposure
+
+    def save_state(self, file_path):
+        # Histories and context structure; the bandit environment and the environment are saved on their own
+        save_object_state(self, file_path, learner_shared_objects(self))
+
+    def load_state(self, file_path):
+        # Only for a learner created with the same arguments, on the same environments
+        load_object_state(self, file_path, learner_shared_objects(self))
 
-    def compute_cumulative_regr_from_gaps(self, gaps):
-        return np.cumsum([gaps[a] for a in self.pulled_arms])
+    def fork(self):
+        # Independent branch of the learner, of its bandit environment and of their environment (see src.fork)
+        return fork(self, self.env.env)
@@ -0,0 +1,18 @@
+# Schedules of the split evaluations of OptimalPriceDiscriminatingLearner: split_schedule(learner) is
+# called after every pull, the contexts are evaluated for splits when it returns True.
+
+def every_round(learner):
+    return True
+
+
+def every_k_rounds(k: int):
+    # at least k rounds after the previous evaluation (pulls of several days count for all of them)
+    def schedule(learner):
+        return learner.current_round - learner.last_split_evaluation_round >= k
+
+    return schedule
+
+
+def end_of_exploration(learner):
+    # once after every exploration phase (round robins), including the initial one
+    return learner.exploration_ended
@@ -25,8 +25,7 @@ class UCBOptimalBidLearner(OptimalBidLearner):
         return upper_bounds
 
     def compute_auction_winning_probability_radii(self):
-        auctions_per_arm = np.array([sum(self.auctions_per_arm[a])
-                                     for a in range(self.n_arms)])
+        auctions_per_arm = self.stats.get_totals('auctions')
         return np.sqrt(2 * np.log(self.current_round) / auctions_per_arm)
 
     # end ucb bid win prob
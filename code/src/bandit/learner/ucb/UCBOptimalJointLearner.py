@@ -2,7 +2,6 @@ import numpy as np
 
 from src.bandit.banditEnvironments.JointBanditEnvironment import JointBanditEnvironment
 from src.bandit.learner.OptimalJointLearner import OptimalJointLearner
-from src.utils import sum_ragged_matrix
 
 
 class UCBOptimalJointLearner(OptimalJointLearner):
@@ -19,17 +18,16 @@ class UCBOptimalJointLearner(OptimalJointLearner):
         return averages + radia
 
     def compute_conversion_rates_averages(self):
-        cr_averages = np.array([(np.sum(sum_ragged_matrix(self.purchases[p])) /
-                                 np.sum(sum_ragged_matrix(self.new_clicks[p])))
-                                if np.sum(sum_ragged_matrix(self.new_clicks[p])) else 0
-                                for p in range(self.n_arms_price)])
+        tot_clicks_per_arm = np.sum(self.stats.get_totals('new_clicks'), axis=1)
+        tot_purchases_per_arm = np.sum(self.stats.get_totals('purchases'), axis=1)
+        cr_averages = np.divide(tot_purchases_per_arm, tot_clicks_per_arm,
+                                out=np.zeros(self.n_arms_price), where=tot_clicks_per_arm > 0)
         return cr_averages
 
     # start computation radii
 
     def compute_conversion_rates_radii(self):
-        tot_clicks_per_arm = np.array([np.sum(sum_ragged_matrix(self.new_clicks[p]))
-                                       for p in range(self.n_arms_price)])
+        tot_clicks_per_arm = np.sum(self.stats.get_totals('new_clicks'), axis=1)
         return np.sqrt(2 * np.log(self.current_round) / tot_clicks_per_arm)
 
     def compute_auction_winning_probability_radii(self):
@@ -46,12 +44,7 @@ class UCBOptimalJointLearner(OptimalJointLearner):
     # start computation winning probability
 
     def compute_auction_winning_probability_averages(self):
-        new_c = [[] for b in range(self.n_arms_bid)]
-        for b in range(self.n_arms_bid):
-            for p in range(self.n_arms_price):
-                new_c[b].extend(self.new_clicks[p][b])
-
-        return np.array([sum(new_c[b]) / self.tot_auctions_per_bid[b]
-                         for b in range(self.n_arms_bid)]).flatten()
+        tot_clicks_per_bid = np.sum(self.stats.get_totals('new_clicks'), axis=0)
+        return (tot_clicks_per_bid[:, None] / self.tot_auctions_per_bid).flatten()
 
     # end computation winning probability
@@ -1,14 +1,17 @@
 from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
 from src.bandit.learner.OptimalPriceDiscriminatingLearner import OptimalPriceDiscriminatingLearner
+from src.bandit.learner.split_schedules import every_round
 from src.bandit.context.UCBContext import UCBContext
 
 
 # start ucbdisc
 class UCBOptimalPriceDiscriminatingLearner(OptimalPriceDiscriminatingLearner):
-    def __init__(self, env: PriceBanditEnvironment):
+    def __init__(self, env: PriceBanditEnvironment, commitment_rounds=1, split_schedule=every_round):
         super().__init__(env,
                          context_creator=lambda *args,
                                                 **kwargs:
-                         UCBContext(*args, **kwargs))
+                         UCBContext(*args, **kwargs),
+                         commitment_rounds=commitment_rounds,
+                         split_schedule=split_schedule)
 
 # end ucbdisc
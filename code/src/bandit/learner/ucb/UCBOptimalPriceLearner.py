@@ -28,14 +28,10 @@ class UCBOptimalPriceLearner(OptimalPriceLearner):
         return upper_bounds
 
     def compute_conversion_rates_averages(self):
-        return np.array([
-            sum(self.purchases_per_arm[arm]) / sum(self.new_clicks_per_arm[arm])
-            for arm in range(self.n_arms)
-        ]).flatten()
+        return self.stats.get_totals('purchases') / self.stats.get_totals('new_clicks')
 
     def compute_conversion_rates_radii(self):
-        tot_clicks_per_arm = np.array([np.sum(self.new_clicks_per_arm[arm])
-                                       for arm in range(self.n_arms)])
+        tot_clicks_per_arm = self.stats.get_totals('new_clicks')
 
         return np.sqrt(2 * np.log(self.current_round) / tot_clicks_per_arm)
 
@@ -0,0 +1,59 @@
+import pickle
+import types
+
+
+# Checkpoints of the simulation objects, in the binary pickle format.
+# A checkpoint holds the state of a single object: the objects it shares with the rest of the
+# simulation (the environments, the generators, the functions given to the constructors) are not
+# copied, they are saved by name and replaced by the live objects with the same name on loading.
+# Generators are restored in place by their owner, so that every object sharing one keeps sharing it.
+
+class _SharedPickler(pickle.Pickler):
+    def __init__(self, file, shared):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shared_names = {id(obj): name for name, obj in shared.items()}
+
+    def persistent_id(self, obj):
+        return self.shared_names.get(id(obj))
+
+
+class _SharedUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared):
+        super().__init__(file)
+        self.shared = shared
+
+    def persistent_load(self, name):
+        if name not in self.shared:
+            raise pickle.UnpicklingError(f'The checkpoint refers to a missing shared object: {name}')
+        return self.shared[name]
+
+
+def save_state(file_path, state, shared=None):
+    with open(file_path, 'wb') as f:
+        _SharedPickler(f, shared or {}).dump(state)
+
+
+def load_state(file_path, shared=None):
+    with open(file_path, 'rb') as f:
+        return _SharedUnpickler(f, shared or {}).load()
+
+
+def save_object_state(obj, file_path, shared, extra=None):
+    # every attribute of obj except the shared ones, and the extra data given (returned by load_object_state)
+    state = {k: v for k, v in vars(obj).items() if k not in shared}
+    save_state(file_path, (type(obj).__name__, state, extra), shared)
+
+
+def load_object_state(obj, file_path, shared):
+    class_name, state, extra = load_state(file_path, shared)
+    if class_name != type(obj).__name__:
+        raise ValueError(f'Cannot load the state of a {class_name} in a {type(obj).__name__}')
+    vars(obj).update(state)
+    return extra
+
+
+def learner_shared_objects(learner):
+    # the environments and their generator, and the functions given to the constructor (e.g. lambdas)
+    shared = {k: v for k, v in vars(learner).items() if isinstance(v, types.FunctionType)}
+    shared.update({'env': learner.env, 'environment': learner.env.env, 'rng': learner.env.rng})
+    return shared
@@ -1,20 +1,25 @@
 from collections import defaultdict
 
 import numpy as np
-from numpy.random import Generator, default_rng
+from numpy.random import Generator, SeedSequence, default_rng
 
 from src.CustomerClass import CustomerClass
 from src.utils import sigmoid
 
 
 class Distribution:
-    def __init__(self, rng: Generator):
+    def __init__(self, rng):
         # each class will have its own generator such that
         # if the same seed is used when the environment is created
         # the distribution will yield the same values and each distribution
         # will yield the same sequence of values even if other random events happen
-        # in different orders
-        self.rng = default_rng(seed=rng.integers(0, 2 ** 32))
+        # in different orders.
+        # rng is either a Generator, from which the seed is drawn, or a SeedSequence
+        # spawned for this distribution only (independent streams, see Environment stream_seed)
+        if isinstance(rng, SeedSequence):
+            self.rng = default_rng(seed=rng)
+        else:
+            self.rng = default_rng(seed=rng.integers(0, 2 ** 32))
 
 
 class NewClicksDistribution(Distribution):
@@ -24,36 +29,45 @@ class NewClicksDistribution(Distribution):
         self.new_clicks_c = new_clicks_c
         self.new_clicks_z = new_clicks_z
         self.average_tot_auctions = average_tot_auctions
-        self.combs = []
-        self.likelihoods = []
-
-        for comb, likelihood in likelihoods_per_comb.items():
-            self.combs.append(comb)
-            self.likelihoods.append(likelihood)
+        self.combs = list(likelihoods_per_comb.keys())
+        self.likelihoods = np.array(list(likelihoods_per_comb.values()))
 
     def sample(self, bid: float):
         strategy = defaultdict(lambda: bid)
         return self.sample_bidding_strategy(strategy)
 
     def sample_bidding_strategy(self, strategy):
-        tot_auctions = int(self.rng.poisson(lam=self.average_tot_auctions, size=1)[0])
-        auctions = self.rng.multinomial(tot_auctions, self.likelihoods)
+        bids = np.array([strategy[comb] for comb in self.combs])
+        auctions, new_clicks = self.sample_one_day(bids)
 
         res_auctions = {c: a for c, a in zip(self.combs, auctions)}
-
-        res_new_clicks = {comb: self.rng.binomial(n_auctions, self.v(strategy[comb]))
-                          for comb, n_auctions in res_auctions.items()}
+        res_new_clicks = {c: n for c, n in zip(self.combs, new_clicks)}
 
         return res_auctions, res_new_clicks
 
+    def sample_one_day(self, bids):
+        # bids is an array with the bid of each combination
+        tot_auctions = int(self.rng.poisson(lam=self.average_tot_auctions, size=1)[0])
+        auctions = self.rng.multinomial(tot_auctions, self.likelihoods)
+        new_clicks = self.rng.binomial(auctions, self.v(bids))
+
+        return auctions, new_clicks
+
+    def sample_days(self, shape, bids):
+        # shape is (n_days, ..., n_combinations), bids must be broadcastable to shape[1:]
+        tot_auctions = self.rng.poisson(lam=self.average_tot_auctions, size=shape[:-1])
+        auctions = self.rng.multinomial(tot_auctions, self.likelihoods)
+        new_clicks = self.rng.binomial(auctions, self.v(bids))
+        return auctions, new_clicks
+
     def mean(self, customer_class: CustomerClass, bid: float):
         return customer_class.get_likelihood() * self.average_tot_auctions * self.v(bid)
 
     def mean_per_comb(self, bid: float):
-        prob = self.v(bid)
-        res = {comb: l * self.average_tot_auctions * prob
-               for comb, l in zip(self.combs, self.likelihoods)}
-        return res
+        return {comb: m for comb, m in zip(self.combs, self.mean_per_comb_array(bid))}
+
+    def mean_per_comb_array(self, bid: float):
+        return self.likelihoods * self.average_tot_auctions * self.v(bid)
 
     def v(self, bid: float):
         return sigmoid(bid, self.new_clicks_c, self.new_clicks_z)
@@ -71,11 +85,48 @@ class CostPerClickDistribution(Distribution):
     def sample_n(customer_class: CustomerClass, bid: float, n: int):
         return [CostPerClickDistribution.mean(customer_class, bid)] * n
 
+    @staticmethod
+    def sample_n_sums(customer_class: CustomerClass, bid, n):
+        # Stacked classes: the i-th entry is the sum of sample_n(i-th class, bid[i], n[i])
+        costs = np.repeat(np.broadcast_to(CostPerClickDistribution.mean(customer_class, bid), np.shape(n)), n)
+        return np.bincount(np.repeat(np.arange(len(n)), n), weights=costs, minlength=len(n))
+
+    @staticmethod
+    def sample_sum(customer_class: CustomerClass, bid, n):
+        # the cost per click is deterministic, the total of n clicks is exact
+        return n * CostPerClickDistribution.mean(customer_class, bid)
+
     @staticmethod
     def mean(customer_class: CustomerClass, bid: float):
         return bid * customer_class.cost_per_click_perc
 
 
+class GammaCostPerClickDistribution(CostPerClickDistribution):
+    # Stochastic cost per click: Gamma(shape, mean / shape), with the same mean of
+    # CostPerClickDistribution, so expected profits are unchanged. The higher the shape
+    # the lower the variance. The sum of n clicks is a Gamma(n * shape, mean / shape).
+    def __init__(self, rng: Generator, shape: float = 4.0):
+        super().__init__(rng=rng)
+        self.shape = shape
+
+    def sample(self, customer_class: CustomerClass, bid: float):
+        return float(self.sample_n(customer_class, bid, 1)[0])
+
+    def sample_n(self, customer_class: CustomerClass, bid: float, n: int):
+        scale = self.mean(customer_class, bid) / self.shape
+        return self.rng.gamma(self.shape, scale, size=n)
+
+    def sample_n_sums(self, customer_class: CustomerClass, bid, n):
+        # Stacked classes: the i-th entry is the sum of sample_n(i-th class, bid[i], n[i])
+        scale = np.broadcast_to(self.mean(customer_class, bid) / self.shape, np.shape(n))
+        costs = self.rng.gamma(self.shape, np.repeat(scale, n))
+        return np.bincount(np.repeat(np.arange(len(n)), n), weights=costs, minlength=len(n))
+
+    def sample_sum(self, customer_class: CustomerClass, bid, n):
+        scale = self.mean(customer_class, bid) / self.shape
+        return self.rng.gamma(np.multiply(n, self.shape), scale)
+
+
 class FutureVisitsDistribution(Distribution):
     def __init__(self, rng: Generator):
         super().__init__(rng=rng)
@@ -88,6 +139,19 @@ class FutureVisitsDistribution(Distribution):
         mean = self.mean(customer_class=customer_class)
         return self.rng.poisson(lam=mean, size=n)
 
+    def sample_n_sums(self, customer_class: CustomerClass, n):
+        # Stacked classes: the i-th entry is the sum of sample_n(i-th class, n[i]),
+        # the samples are drawn in the same order
+        mean = np.broadcast_to(self.mean(customer_class=customer_class), np.shape(n))
+        samples = self.rng.poisson(lam=np.repeat(mean, n))
+        return np.bincount(np.repeat(np.arange(len(n)), n), weights=samples,
+                           minlength=len(n)).astype(np.int64)
+
+    def sample_sum(self, customer_class: CustomerClass, n):
+        # the sum of n independent Poisson(mean) samples is a Poisson(n * mean)
+        mean = self.mean(customer_class=customer_class)
+        return self.rng.poisson(lam=n * mean)
+
     @staticmethod
     def mean(customer_class: CustomerClass):
         return customer_class.backMean
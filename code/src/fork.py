@@ -0,0 +1,69 @@
+import copy
+import types
+
+import numpy as np
+from numpy.random import Generator
+
+
+# Forking of a running simulation (environment, bandit environment, learner) into an independent branch.
+# The branch shares with the original everything that is never modified: the parameters of the
+# environment, read-only arrays (e.g. the memoized expected profits) and the values of the histories,
+# only the containers are copied. Objects with a copy_on_write method (e.g. RegretTracker) provide
+# their own branch, sharing their buffers until the first write.
+# Every generator is replaced by a child spawned from it, so the branch has its own random streams
+# and the original goes on exactly as if it had not been forked.
+
+_IMMUTABLE = (type(None), bool, int, float, complex, str, bytes, np.generic, type, types.FunctionType,
+              types.BuiltinFunctionType)
+
+
+class _Brancher:
+    def __init__(self, memo):
+        self.memo = memo
+
+    def copy(self, obj):
+        if id(obj) in self.memo:
+            return self.memo[id(obj)]
+        if isinstance(obj, _IMMUTABLE):
+            return obj
+
+        if isinstance(obj, Generator):
+            res = obj.spawn(1)[0]
+        elif isinstance(obj, np.ndarray):
+            res = obj.copy() if obj.flags.writeable else obj
+        elif isinstance(obj, tuple):
+            res = tuple(self.copy(x) for x in obj)
+        elif isinstance(obj, frozenset):
+            res = frozenset(self.copy(x) for x in obj)
+        elif isinstance(obj, types.MethodType):
+            res = types.MethodType(obj.__func__, self.copy(obj.__self__))
+        elif isinstance(obj, list):
+            res = []
+            self.memo[id(obj)] = res
+            res.extend(self.copy(x) for x in obj)
+        elif isinstance(obj, dict):
+            res = copy.copy(obj)
+            res.clear()
+            self.memo[id(obj)] = res
+            for k, v in obj.items():
+                res[self.copy(k)] = self.copy(v)
+        elif hasattr(obj, 'copy_on_write'):
+            res = obj.copy_on_write()
+        elif hasattr(obj, '__dict__'):
+            res = object.__new__(type(obj))
+            self.memo[id(obj)] = res
+            vars(res).update({k: self.copy(v) for k, v in vars(obj).items()})
+        else:
+            raise TypeError(f'Cannot fork an object of type {type(obj).__name__}')
+
+        self.memo[id(obj)] = res
+        return res
+
+
+def fork(root, environment):
+    # Returns the branch of root, which refers (directly or not) to the given environment.
+    # The parameters of the environment are shared, its generators and distributions are branched.
+    branched = {'rng'} | {k for k, v in vars(environment).items() if hasattr(v, 'rng')}
+    memo = {id(v): v for k, v in vars(environment).items() if k not in branched}
+
+    return _Brancher(memo).copy(root)
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+# Exhaustive search of the best partition of a small set of elements (e.g. the feature combinations)
+# by dynamic programming over its subsets. A subset is the bitmask of its elements, bit i for the
+# element i (as in ArmStatistics.get_mask), so the per-subset values and statistics are arrays of
+# 2 ** n_elements entries indexed by mask. Every subset is valued once and the search is O(3 ** n_elements)
+# in time and O(2 ** n_elements) in memory, instead of enumerating the (Bell number of) partitions.
+
+# above MAX_ELEMENTS (3 ** 16 ~ 4.3e7 candidate parts) the search is refused rather than left to run out of
+# time or memory, e.g. for the 256 combinations of 8 binary features
+MAX_ELEMENTS = 16
+
+
+def check_n_elements(n_elements: int):
+    if n_elements > MAX_ELEMENTS:
+        raise ValueError(f'The exhaustive search over the subsets of {n_elements} elements is too large, '
+                         f'at most {MAX_ELEMENTS} elements are supported')
+
+
+def subset_sums(per_element):
+    # per_element: (n_elements, ...) -> (2 ** n_elements, ...), the sums over the elements of every subset
+    per_element = np.asarray(per_element)
+    check_n_elements(len(per_element))
+    sums = np.zeros((2 ** len(per_element),) + per_element.shape[1:], dtype=np.result_type(per_element, float))
+    for i, x in enumerate(per_element):
+        sums[2 ** i:2 ** (i + 1)] = sums[:2 ** i] + x
+    return sums
+
+
+def lowest_elements(n_elements: int):
+    # index of the lowest element of every subset (0 for the empty one)
+    check_n_elements(n_elements)
+    masks = np.arange(2 ** n_elements)
+    return np.log2(np.maximum(masks & -masks, 1)).astype(np.int64)
+
+
+def mask_elements(mask: int):
+    return [i for i in range(int(mask).bit_length()) if mask >> i & 1]
+
+
+def submasks(masks, n_bits: int):
+    # every subset of each of the masks, all with n_bits elements: (n_masks, 2 ** n_bits), the empty one
+    # first and the mask last. Subset j has the elements of the mask given by the bits of j (bit deposit).
+    masks = np.asarray(masks, dtype=np.int64)
+    elements = np.nonzero(masks[:, None] >> np.arange(MAX_ELEMENTS) & 1)[1].reshape(len(masks), n_bits)
+    j = np.arange(2 ** n_bits)
+    res = np.zeros((len(masks), len(j)), dtype=np.int64)
+    for b in range(n_bits):
+        res |= (j >> b & 1) << elements[:, b, None]
+    return res
+
+
+def optimal_partition(values, tolerance=1e-9):
+    # values[mask]: value of the subset mask (finite or -inf, values[0] is ignored). Returns the best total
+    # value of a partition of all the elements and its parts (masks, by lowest element). Partitions within
+    # tolerance (relative) of the best are tied, the one with fewest parts is preferred.
+    values = np.asarray(values, dtype=float)
+    n_masks = len(values)
+    n_elements = n_masks.bit_length() - 1
+    check_n_elements(n_elements)
+    best = np.zeros(n_masks)
+    n_parts = np.zeros(n_masks, dtype=np.int64)
+    # the part of the lowest element in the best partition of every subset
+    first_part = np.zeros(n_masks, dtype=np.int64)
+
+    # the subsets by size: the best partitions of the rests of a subset are the ones of smaller subsets
+    all_masks = np.arange(n_masks)
+    sizes = np.sum(all_masks[:, None] >> np.arange(max(n_elements, 1)) & 1, axis=1)
+    for size in range(1, n_elements + 1):
+        masks = all_masks[sizes == size]
+        lowest = masks & -masks
+        rest = submasks(masks ^ lowest, size - 1)
+        parts = rest[:, ::-1] | lowest[:, None]  # the whole subset first
+        candidates = values[parts] + best[rest]
+        candidate_parts = 1 + n_parts[rest]
+
+        top = np.max(candidates, axis=1, keepdims=True)
+        tied = candidates >= top - tolerance * np.maximum(1, np.abs(top))
+        k = np.argmin(np.where(tied, candidate_parts, n_masks), axis=1)
+        rows = np.arange(len(masks))
+        best[masks], n_parts[masks], first_part[masks] = (candidates[rows, k], candidate_parts[rows, k],
+                                                          parts[rows, k])
+
+    partition = []
+    mask = n_masks - 1
+    while mask:
+        partition.append(int(first_part[mask]))
+        mask ^= int(first_part[mask])
+    return best[-1], partition
@@ -10,10 +10,10 @@ def plot_new_clicks(environment: Environment, path=None):
     plt.title(f"NEW CLICKS\nseed: {environment.get_seed()}")
     plt.xlabel("Bid")
 
-    for c in environment.get_classes():
-        new_clicks = [environment.get_dist_new_clicks().mean(c, bid)
-                      for bid in bids]
-        plt.plot(bids, new_clicks, label=c.get_name())
+    # (n_bids, n_classes)
+    new_clicks = environment.get_dist_new_clicks().mean(environment.class_parameters, bids[:, None])
+    for c_i, c in enumerate(environment.get_classes()):
+        plt.plot(bids, new_clicks[:, c_i], label=c.get_name())
 
     plt.legend()
 
@@ -46,10 +46,10 @@ def plot_clicks_converted(environment: Environment, path=None):
     plt.title(f"CLICKS CONVERTED\nseed: {environment.get_seed()}")
     plt.xlabel("Price")
 
-    for c in environment.get_classes():
-        clicks_converted = [environment.get_dist_click_converted().mean(c, price)
-                            for price in prices]
-        plt.plot(prices, clicks_converted, label=c.get_name())
+    # (n_prices, n_classes)
+    clicks_converted = environment.get_dist_click_converted().mean(environment.class_parameters, prices[:, None])
+    for c_i, c in enumerate(environment.get_classes()):
+        plt.plot(prices, clicks_converted[:, c_i], label=c.get_name())
 
     plt.legend()
 
@@ -74,19 +74,18 @@ def plot_everything(environment: Environment, path=None):
     colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
     fontsize = 12
 
-    for color, c in zip(colors, environment.get_classes()):
-        new_clicks = [environment.get_dist_new_clicks().mean(c, bid)
-                      for bid in bids]
-        future_visits = [environment.get_dist_future_visits().mean(c)] * len(x_future_visits)  # mean è uno scalare
+    classes = environment.class_parameters
+    new_clicks = environment.get_dist_new_clicks().mean(classes, bids[:, None])
+    clicks_converted = environment.get_dist_click_converted().mean(classes, prices[:, None])
 
-        clicks_converted = [environment.get_dist_click_converted().mean(c, price)
-                            for price in prices]
+    for c_i, (color, c) in enumerate(zip(colors, environment.get_classes())):
+        future_visits = [environment.get_dist_future_visits().mean(c)] * len(x_future_visits)  # mean è uno scalare
 
-        axs[0][0].plot(bids, new_clicks, label=c.get_name(), color=color)
+        axs[0][0].plot(bids, new_clicks[:, c_i], label=c.get_name(), color=color)
         axs[0][0].legend()
         axs[0][1].plot(x_future_visits, future_visits, label=c.get_name(), color=color)
         axs[0][1].legend()
-        axs[1][0].plot(prices, clicks_converted, label=c.get_name(), color=color)
+        axs[1][0].plot(prices, clicks_converted[:, c_i], label=c.get_name(), color=color)
         axs[1][0].legend()
 
         for comb in c.features:
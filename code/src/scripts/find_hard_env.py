@@ -1,28 +1,32 @@
 import numpy as np
 
-from src.Environment import Environment
-from src.algorithms import step1, expected_profit
+from src.EnvironmentEnsemble import EnvironmentEnsemble
 
 
 def main():
     max_iter = 10000
+    batch_size = 1000
     prices = np.arange(10, 101, 10)
     bids = np.arange(1, 100)
+    rng = np.random.default_rng()
 
-    for it in range(1,max_iter+1):
-        env = Environment()
-        opt_price, opt_bid, profit = step1(env, prices, bids)
+    for it in range(0, max_iter, batch_size):
+        seeds = rng.integers(0, 2 ** 32, size=min(batch_size, max_iter - it))
+        ensemble = EnvironmentEnsemble.from_seeds(seeds)
+        opt_prices, opt_bids, profits = ensemble.step1(prices, bids)
 
-        expected_profits = np.array([expected_profit(env, p, opt_bid) for p in prices])
+        expected_profits = ensemble.expected_profit(prices[None, :], opt_bids[:, None])
 
-        optimality_gaps = np.max(expected_profits) - expected_profits
-        rescaled_gaps = optimality_gaps / np.max(expected_profits)
+        best_profits = np.max(expected_profits, axis=1, keepdims=True)
+        optimality_gaps = best_profits - expected_profits
+        rescaled_gaps = optimality_gaps / best_profits
 
-        if np.sort(rescaled_gaps)[2] < 0.05:
-            print(f'Found environment with seed {env.get_seed()} and small gaps')
+        hard_envs = np.flatnonzero(np.sort(rescaled_gaps, axis=1)[:, 2] < 0.05)
+        if hard_envs.size:
+            print(f'Found environment with seed {seeds[hard_envs[0]]} and small gaps')
             break
 
-        print(f'Completed iteration {it}/{max_iter}')
+        print(f'Completed iteration {it + len(seeds)}/{max_iter}')
 
 
 if __name__ == '__main__':
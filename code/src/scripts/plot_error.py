@@ -1,7 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from src.Environment import Environment
-from src.algorithms import step1
+from src.EnvironmentEnsemble import EnvironmentEnsemble
 
 
 def main():
@@ -12,30 +11,18 @@ def main():
     bids = np.arange(1, 100)
 
     max_error = 1000
-    errors_count = [0]*(2*max_error+1)
-    cum_error = 0
-    for test_n in range(1, samples+1):
-        print(f'Running test n°{test_n:2d}/{samples}')
-        env = Environment()
-        opt_price, opt_bid, exp_profit = step1(env, prices, bids)
 
-        pricing_strategy = {c:opt_price for c in env.get_features_combinations()}
+    ensemble = EnvironmentEnsemble.random(samples)
+    opt_prices, opt_bids, exp_profits = ensemble.step1(prices, bids)
 
-        cum_profit = 0
-        for __ in range(iterations):
-            _, _, _, _, _, profit = env.simulate_one_day_fixed_bid(pricing_strategy, opt_bid)
-            cum_profit += profit
+    _, _, _, _, _, profits = ensemble.simulate_days(iterations, opt_prices[:, None], opt_bids[:, None])
+    average_profits = np.mean(profits, axis=0)
 
-        average_profit = cum_profit / iterations
+    errors = average_profits - exp_profits
+    int_errors = np.clip(np.round(errors), -max_error, max_error).astype(np.int64)
+    errors_count = np.bincount(int_errors + max_error, minlength=2 * max_error + 1)
 
-        error = average_profit-exp_profit
-        int_error = max(-max_error, min(max_error, round(error)))
-
-        errors_count[int_error+max_error]+=1
-
-        cum_error += error
-        print(f'Run test n°{test_n:2d}/{samples} with error {error:.2f}')
-    average_error = cum_error/samples
+    average_error = np.mean(errors)
 
     print(f'Final average error: {average_error:.2f}')
     plt.scatter(range(-max_error, -max_error+len(errors_count)), errors_count)
@@ -1,7 +1,7 @@
 from src.Environment import Environment
 from src.bandit.LearningStats import plot_results
 from src.bandit.learner.ts.TSOptimalPriceLearner import TSOptimalPriceLearner
-from src.algorithms import step1, expected_profit
+from src.algorithms import step1, expected_profit_grid
 from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
 from src.bandit.learner.ucb.UCBOptimalPriceLearner import UCBOptimalPriceLearner
 import numpy as np
@@ -22,7 +22,7 @@ def main():
 
     bandit_env = PriceBanditEnvironment(env, prices, opt_bid, future_visits_delay)
 
-    expected_profits = np.array([expected_profit(env, p, opt_bid) for p in prices])
+    expected_profits = np.sum(expected_profit_grid(env, prices, [opt_bid]), axis=-1)[:, 0]
     suboptimality_gaps = np.max(expected_profits) - expected_profits
     clairvoyant_cumulative_profits = np.cumsum([np.max(expected_profits)] * n_rounds)
 
@@ -32,12 +32,12 @@ def main():
     ucb_leaner = UCBOptimalPriceLearner(bandit_env)  # , lambda r: r % 50 == 0)
 
     ucb_leaner.learn(n_rounds)
-    ucb_cumulative_profits = ucb_leaner.compute_cumulative_exp_profits(expected_profits)
+    ucb_cumulative_profits = bandit_env.get_regret_tracker().get_cumulative_profits()
 
     bandit_env.reset_state()
 
     ts_learner.learn(n_rounds)
-    ts_cumulative_profits = ts_learner.compute_cumulative_exp_profits(expected_profits)
+    ts_cumulative_profits = bandit_env.get_regret_tracker().get_cumulative_profits()
 
     optimal_profit = bandit_env.get_clairvoyant_optimal_expected_profit_not_discriminating()
 
@@ -76,13 +76,9 @@ def main():
     if len(target_prices) == 1:
         print('All the learners learned the right price')
 
-    for target_price in target_prices:
-        pricing_strategy = {c: target_price for c in env.get_features_combinations()}
-        cum_profit = 0
-        for __ in range(samples):
-            _, _, _, _, _, profit = env.simulate_one_day_fixed_bid(pricing_strategy, opt_bid)
-            cum_profit += profit
-        print(f"Empiric profit of price {target_price} is {(cum_profit / samples):.2f}")
+    _, _, _, _, _, profits = env.simulate_days(samples, np.array(target_prices)[:, None], opt_bid)
+    for target_price, average_profit in zip(target_prices, np.mean(profits, axis=0)):
+        print(f"Empiric profit of price {target_price} is {average_profit:.2f}")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 from src.Environment import Environment
 from src.bandit.LearningStats import plot_results
 from src.bandit.learner.ts.TSOptimalPriceLearner import TSOptimalPriceLearner
-from src.algorithms import step1, expected_profit
+from src.algorithms import step1, expected_profit_grid
 from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
 import numpy as np
 
@@ -32,14 +32,14 @@ def main():
         ucb_learner = UCBOptimalPriceLearner(bandit_env)
 
         ts_learner.learn(n_rounds)
+        ts_cumulative_profits = bandit_env.get_regret_tracker().get_cumulative_profits()
         bandit_env.reset_state()
         ucb_learner.learn(n_rounds)
+        ucb_cumulative_profits = bandit_env.get_regret_tracker().get_cumulative_profits()
 
-        expected_profits = np.array([expected_profit(env, p, opt_bid) for p in prices])
+        expected_profits = np.sum(expected_profit_grid(env, prices, [opt_bid]), axis=-1)[:, 0]
         gaps = np.max(expected_profits) - expected_profits
         norm_gaps = gaps / np.max(gaps)
-        ts_cumulative_profits = ts_learner.compute_cumulative_exp_profits(expected_profits)
-        ucb_cumulative_profits = ucb_learner.compute_cumulative_exp_profits(expected_profits)
         clairvoyant_cumulative_profits = np.cumsum([np.max(expected_profits)] * n_rounds)
 
         if interactive:
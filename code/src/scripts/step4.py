@@ -2,7 +2,7 @@ from src.Environment import Environment
 from src.bandit.LearningStats import plot_results
 from src.bandit.learner.ts.TSOptimalPriceDiscriminatingLearner import TSOptimalPriceDiscriminatingLearner
 from src.algorithms import step1, optimal_pricing_strategy_for_bid, expected_profit_of_pricing_strategy, \
-    expected_profit_for_comb
+    expected_profit_grid
 from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
 from src.bandit.learner.ucb.UCBOptimalPriceDiscriminatingLearner import UCBOptimalPriceDiscriminatingLearner
 from src.bandit.learner.ucb.UCBOptimalPriceLearner import UCBOptimalPriceLearner
@@ -26,8 +26,8 @@ def main():
     opt_price_3, opt_bid_3, profit_3 = step1(env3, prices, bids)
 
     bandit_env_1 = PriceBanditEnvironment(env1, prices, opt_bid_1, future_visits_delay)
-    bandit_env_2 = PriceBanditEnvironment(env2, prices, opt_bid_2, future_visits_delay)
-    bandit_env_3 = PriceBanditEnvironment(env3, prices, opt_bid_3, future_visits_delay)
+    bandit_env_2 = PriceBanditEnvironment(env2, prices, opt_bid_2, future_visits_delay, discriminating=True)
+    bandit_env_3 = PriceBanditEnvironment(env3, prices, opt_bid_3, future_visits_delay, discriminating=True)
 
     print(f'Optimal price without feature discrimination: {opt_price_1:.2f}, with profit {profit_1:.2f}')
 
@@ -46,8 +46,8 @@ def main():
     opt_strategy = optimal_pricing_strategy_for_bid(env1, prices, opt_bid_1)
     opt_value = expected_profit_of_pricing_strategy(env1, opt_strategy, opt_bid_1)
 
-    expected_profits = {comb: [expected_profit_for_comb(env1, p, opt_bid_1, comb) for p in prices]
-                        for comb in env1.combinations}
+    comb_profits = expected_profit_grid(env1, prices, [opt_bid_1])[:, 0, :]
+    expected_profits = {comb: list(comb_profits[:, i]) for i, comb in enumerate(env1.combinations)}
 
     print("Optimal pricing strategy: " + ", ".join(
         f'{c.name}({", ".join(str(comb) for comb in c.features)}): {opt_strategy[c.features[0]]:.2f}'
@@ -59,15 +59,19 @@ def main():
 
     ucb_disc_learner = UCBOptimalPriceDiscriminatingLearner(bandit_env_2)
     ucb_disc_learner.learn(n_rounds)
+    for round_n, feature, incentive in ucb_disc_learner.get_perfomed_splits():
+        print(f'Split context at round {round_n} on feature {feature}, incentive = {incentive:.2f}')
 
-    ucb_profits = ucb_disc_learner.compute_cumulative_exp_profits(expected_profits)
+    ucb_profits = bandit_env_2.get_regret_tracker().get_cumulative_profits()
     bandit_env_2.reset_state()
 
     print("\nLearning TSDisc")
     ts_disc_learner = TSOptimalPriceDiscriminatingLearner(bandit_env_3)
     ts_disc_learner.learn(n_rounds)
+    for round_n, feature, incentive in ts_disc_learner.get_perfomed_splits():
+        print(f'Split context at round {round_n} on feature {feature}, incentive = {incentive:.2f}')
 
-    ts_profits = ts_disc_learner.compute_cumulative_exp_profits(expected_profits)
+    ts_profits = bandit_env_3.get_regret_tracker().get_cumulative_profits()
     bandit_env_3.reset_state()
 
     for name, learner in [("ucb with discrimination", ucb_disc_learner), ("ts with discrimination", ts_disc_learner)]:
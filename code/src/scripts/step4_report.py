@@ -3,7 +3,7 @@ from terminaltables import AsciiTable
 
 from src.Environment import Environment
 from src.algorithms import step1, optimal_pricing_strategy_for_bid, expected_profit_of_pricing_strategy, \
-    expected_profit_for_comb
+    expected_profit_grid
 from src.bandit.LearningStats import plot_results
 from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
 from src.bandit.learner.ts.TSOptimalPriceDiscriminatingLearner import TSOptimalPriceDiscriminatingLearner
@@ -27,25 +27,25 @@ def main():
 
         opt_price, opt_bid, profit = step1(env, prices, bids)
 
-        bandit_env = PriceBanditEnvironment(env, prices, opt_bid, future_visits_delay)
+        bandit_env = PriceBanditEnvironment(env, prices, opt_bid, future_visits_delay, discriminating=True)
 
         opt_strategy = optimal_pricing_strategy_for_bid(env, prices, opt_bid)
         opt_value = expected_profit_of_pricing_strategy(env, opt_strategy, opt_bid)
 
         clairvoyant_cumulative_profits = np.cumsum([opt_value] * n_rounds)
-        expected_profits = {comb: [expected_profit_for_comb(env, p, opt_bid, comb) for p in prices]
-                            for comb in env.combinations}
+        comb_profits = expected_profit_grid(env, prices, [opt_bid])[:, 0, :]
+        expected_profits = {comb: list(comb_profits[:, i]) for i, comb in enumerate(env.combinations)}
 
         print("Learning UCBDisc")
         ucb_disc_learner = UCBOptimalPriceDiscriminatingLearner(bandit_env)
         ucb_disc_learner.learn(n_rounds)
+        ucb_profits = bandit_env.get_regret_tracker().get_cumulative_profits()
         bandit_env.reset_state()
-        ucb_profits = ucb_disc_learner.compute_cumulative_exp_profits(expected_profits)
 
         print("\nLearning TSDisc")
         ts_disc_learner = TSOptimalPriceDiscriminatingLearner(bandit_env)
         ts_disc_learner.learn(n_rounds)
-        ts_profits = ts_disc_learner.compute_cumulative_exp_profits(expected_profits)
+        ts_profits = bandit_env.get_regret_tracker().get_cumulative_profits()
         bandit_env.reset_state()
 
         for name, learner in [("ucb with discrimination", ucb_disc_learner),
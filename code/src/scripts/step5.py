@@ -19,13 +19,13 @@ def main():
     opt_price, opt_bid, profit = step1(env, prices, bids)
 
     bandit_env = BidBanditEnvironment(env, opt_price, bids, future_visits_delay)
-    regret_length = n_rounds - future_visits_delay
-    clairvoyant_cumulative_profits = bandit_env.get_clairvoyant_cumulative_profits_not_discriminating(regret_length)
 
     ucb_leaner = UCBOptimalBidLearner(bandit_env, lambda r: r % 400 == 401)
 
     ucb_leaner.learn(n_rounds)
-    ucb_cumulative_profits = bandit_env.get_learner_cumulative_profit_not_discriminating(ucb_leaner.pulled_arms)
+    tracker = bandit_env.get_regret_tracker()
+    ucb_cumulative_profits = tracker.get_cumulative_profits()
+    clairvoyant_cumulative_profits = tracker.get_clairvoyant_cumulative_profits()
 
     optimal_profit = bandit_env.get_clairvoyant_optimal_expected_profit_not_discriminating()
 
@@ -42,7 +42,7 @@ def main():
 
     env.print_summary()
 
-    plot_results(["ucb"], [ucb_cumulative_profits], clairvoyant_cumulative_profits, regret_length)
+    plot_results(["ucb"], [ucb_cumulative_profits], clairvoyant_cumulative_profits, tracker.get_n_rounds())
 
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@ import numpy as np
 from terminaltables import AsciiTable
 
 from src.Environment import Environment
-from src.algorithms import step1, expected_profit
+from src.algorithms import step1, expected_profit_grid
 from src.bandit.banditEnvironments.BidBanditEnvironment import BidBanditEnvironment
 from src.bandit.LearningStats import plot_results
 from src.bandit.learner.ucb.UCBOptimalBidLearner import UCBOptimalBidLearner
@@ -28,14 +28,14 @@ def main():
 
         bandit_env = BidBanditEnvironment(env, opt_price, bids, future_visits_delay)
 
-        expected_profits = np.array([expected_profit(env, opt_price, b) for b in bids])
+        expected_profits = np.sum(expected_profit_grid(env, [opt_price], bids), axis=-1)[0]
         gaps = np.max(expected_profits) - expected_profits
         rescaled_gaps = gaps/np.max(gaps)
         clairvoyant_cumulative_profits = np.cumsum([np.max(expected_profits)]*n_rounds)
 
         ucb_leaner = UCBOptimalBidLearner(bandit_env, lambda r: r % 400 == 401)
         ucb_leaner.learn(n_rounds)
-        ucb_cumulative_profits = ucb_leaner.compute_cumulative_exp_profits(expected_profits)
+        ucb_cumulative_profits = bandit_env.get_regret_tracker().get_cumulative_profits()
 
         env.print_summary()
 
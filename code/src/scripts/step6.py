@@ -20,12 +20,12 @@ def main():
     opt_price, opt_bid, profit = step1(env, prices, bids)
 
     bandit_env = JointBanditEnvironment(env, prices, bids, future_visits_delay)
-    regret_length = n_rounds - future_visits_delay
-    clairvoyant_cumulative_profits = bandit_env.get_clairvoyant_cumulative_profits_not_discriminating(regret_length)
 
     ucb_learner = UCBOptimalJointLearner(bandit_env, lambda r: r % 400 == 401)
     ucb_learner.learn(n_rounds)
-    ucb_cumulative_profits = bandit_env.get_learner_cumulative_profit_not_discriminating(ucb_learner.pulled_arms)
+    tracker = bandit_env.get_regret_tracker()
+    ucb_cumulative_profits = tracker.get_cumulative_profits()
+    clairvoyant_cumulative_profits = tracker.get_clairvoyant_cumulative_profits()
 
     print(f'Optimal price is {opt_price} and optimal bid is {opt_bid}')
 
@@ -35,7 +35,7 @@ def main():
     for arm_p in range(ucb_learner.n_arms_price):
         print(f'{bandit_env.prices[arm_p]:3d}      | ' + ' '.join(f'{p:5d}' for p in ucb_recap[arm_p]))
 
-    plot_results(["ucb"], [ucb_cumulative_profits], clairvoyant_cumulative_profits, regret_length)
+    plot_results(["ucb"], [ucb_cumulative_profits], clairvoyant_cumulative_profits, tracker.get_n_rounds())
 
 
 if __name__ == "__main__":
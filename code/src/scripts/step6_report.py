@@ -2,7 +2,7 @@ import numpy as np
 from terminaltables import AsciiTable
 
 from src.Environment import Environment
-from src.algorithms import step1, expected_profit
+from src.algorithms import step1, expected_profit_grid
 from src.bandit.banditEnvironments.BidBanditEnvironment import BidBanditEnvironment
 from src.bandit.LearningStats import plot_results
 from src.bandit.banditEnvironments.JointBanditEnvironment import JointBanditEnvironment
@@ -30,9 +30,7 @@ def main():
 
         bandit_env = JointBanditEnvironment(env, prices, bids, future_visits_delay)
 
-        expected_profits = np.array([[expected_profit(env, p, b)
-                                     for b in bids]
-                                     for p in prices])
+        expected_profits = np.sum(expected_profit_grid(env, prices, bids), axis=-1)
 
         gaps = np.max(expected_profits) - expected_profits
         rescaled_gaps = gaps/np.max(gaps)
@@ -40,7 +38,7 @@ def main():
 
         ucb_learner = UCBOptimalJointLearner(bandit_env, lambda r: r % 400 == 401)
         ucb_learner.learn(n_rounds)
-        ucb_cumulative_profits = ucb_learner.compute_cumulative_exp_profits(expected_profits)
+        ucb_cumulative_profits = bandit_env.get_regret_tracker().get_cumulative_profits()
 
         env.print_summary()
 
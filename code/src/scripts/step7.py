@@ -24,7 +24,7 @@ def main():
     env = Environment(seed)
 
     _, opt_bid, _ = step1(env_for_step4, prices, bids)
-    bandit_env_step4 = PriceBanditEnvironment(env_for_step4, prices, opt_bid, delay)
+    bandit_env_step4 = PriceBanditEnvironment(env_for_step4, prices, opt_bid, delay, discriminating=True)
 
     print(f'Running step4 (with seed {seed}) to find context structure')
     ucb_disc_learner = UCBOptimalPriceDiscriminatingLearner(bandit_env_step4)
@@ -39,7 +39,7 @@ def main():
     for i in range(len(feature_combs)):
         print(f'Context {i}: {feature_combs[i]}')
 
-    bandit_env = JointBanditEnvironment(env, prices, bids, delay)
+    bandit_env = JointBanditEnvironment(env, prices, bids, delay, discriminating=True)
     context_structure = [UCBJointContext(comb, bandit_env.margin, len(prices), len(bids), bandit_env.rng) for comb in
                          feature_combs]
 
@@ -49,8 +49,7 @@ def main():
     joint_disc_learner.learn(n_rounds)
 
     clairvoyant = bandit_env.get_clairvoyant_cumulative_profit_discriminating(context_structure, n_rounds)
-    strategies = joint_disc_learner.get_strategies()
-    learner_profit = bandit_env.get_learner_cumulative_profit_discriminating(strategies)
+    learner_profit = bandit_env.get_regret_tracker().get_cumulative_profits()
 
     for i, context in enumerate(joint_disc_learner.get_context_structure()):
         recap = context.get_pulled_arms_recap()
@@ -2,7 +2,7 @@ import numpy as np
 from terminaltables import AsciiTable
 
 from src.Environment import Environment
-from src.algorithms import step1, expected_profit_for_comb
+from src.algorithms import step1, expected_profit_grid
 from src.bandit.LearningStats import plot_results
 from src.bandit.banditEnvironments.JointBanditEnvironment import JointBanditEnvironment
 from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
@@ -27,7 +27,7 @@ def main():
         env_for_step4 = Environment(seedV)
 
         _, opt_bid, _ = step1(env_for_step4, prices, bids)
-        bandit_env_step4 = PriceBanditEnvironment(env_for_step4, prices, opt_bid, delay)
+        bandit_env_step4 = PriceBanditEnvironment(env_for_step4, prices, opt_bid, delay, discriminating=True)
 
         print(f'Running step4 (with seed {seedV}) to find context structure')
         ucb_disc_learner = UCBOptimalPriceDiscriminatingLearner(bandit_env_step4)
@@ -42,7 +42,7 @@ def main():
         for i in range(len(feature_combs)):
             print(f'Context {i}: {feature_combs[i]}')
 
-        bandit_env = JointBanditEnvironment(env, prices, bids, delay)
+        bandit_env = JointBanditEnvironment(env, prices, bids, delay, discriminating=True)
         context_structure = [
             UCBJointContext(comb, bandit_env.margin, len(prices), len(bids), bandit_env.rng)
             for comb in feature_combs
@@ -54,8 +54,7 @@ def main():
         joint_disc_learner.learn(n_rounds)
 
         clairvoyant = bandit_env.get_clairvoyant_cumulative_profit_discriminating(context_structure, n_rounds)
-        strategies = joint_disc_learner.get_strategies()
-        learner_profit = bandit_env.get_learner_cumulative_profit_discriminating(strategies)
+        learner_profit = bandit_env.get_regret_tracker().get_cumulative_profits()
 
         for i, context in enumerate(joint_disc_learner.get_context_structure()):
             recap = context.get_pulled_arms_recap()
@@ -79,10 +78,7 @@ def main():
         gaps_tables = []
         for context in joint_disc_learner.context_structure:
             print('Context:', *context.features)
-            pulls = [[0 for b in bids] for p in prices]
-            comb = context.features[0]
-            for p_a, b_a in joint_disc_learner.get_strategies():
-                pulls[p_a[comb]][b_a[comb]] += 1
+            pulls = context.get_pulled_arms_recap()
 
             table_pull_data = [['P\\B'] + [f'{b:.2f}' for b in bids]]
             for p in prices:
@@ -98,13 +94,7 @@ def main():
             pull_tables.append(table_pull)
             print(table_pull.table)
 
-            expected_profs = np.array([[0 for b in bids] for p in prices])
-            for p_i, p in enumerate(prices):
-                for b_i, b in enumerate(bids):
-                    expected_profs[p_i][b_i] = sum(
-                        expected_profit_for_comb(env, p, b, comb)
-                        for comb in context.features
-                    )
+            expected_profs = np.sum(expected_profit_grid(env, prices, bids, context.features), axis=-1)
             gaps = np.max(expected_profs) - expected_profs
             norm_gaps = gaps / np.max(gaps)
             table_exp_data = [['P\\B'] + [f'{b:.2f}' for b in bids]]
@@ -3,7 +3,8 @@ from unittest import TestCase
 import numpy as np
 
 from src.Environment import Environment
-from src.algorithms import expected_profit, step1
+from src.algorithms import expected_profit, expected_profit_grid, step1, step1_continuous, maximize_continuous, \
+    snap_to_best
 
 
 class TestStep1(TestCase):
@@ -21,12 +22,9 @@ class TestStep1(TestCase):
             seed = rng.integers(0, 2**32)
             env = Environment(seed)
 
-            bf_p, bf_b, bf_profit = (prices[0], bids[0], expected_profit(env, prices[0], bids[0]))
-            for p in prices:
-                for b in bids:
-                    profit = expected_profit(env, p, b)
-                    if profit > bf_profit:
-                        bf_p, bf_b, bf_profit = p, b, profit
+            profits = np.sum(expected_profit_grid(env, prices, bids), axis=-1)
+            bf_p_i, bf_b_i = np.unravel_index(np.argmax(profits), profits.shape)
+            bf_p, bf_b = prices[bf_p_i], bids[bf_b_i]
 
             opt_p, opt_b, opt_profit = step1(env, prices, bids)
 
@@ -35,3 +33,91 @@ class TestStep1(TestCase):
                 self.fail()
 
             print(f'Finished step {i+1}/{n_envs}')
+
+    def test_step1_continuous(self):
+        prices = np.linspace(1, 100, 100)
+        bids = np.linspace(1, 100, 100)
+        n_envs = 20
+
+        for i in range(n_envs):
+            env = Environment()
+            combinations = env.get_classes()[i % len(env.get_classes())].features
+
+            for combs in [None, combinations]:
+                opt_p, opt_b, opt_profit = step1(env, prices, bids, combs)
+
+                snap_p, snap_b, _ = step1_continuous(env, prices, bids, combs, snap_to_grid=True)
+                self.assertEqual((snap_p, snap_b), (opt_p, opt_b), f'Failed with seed {env.get_seed()}')
+
+                _, _, continuous_profit = step1_continuous(env, prices, bids, combs)
+                self.assertGreaterEqual(continuous_profit, opt_profit - 1e-9 * abs(opt_profit))
+
+    def test_narrow_peak(self):
+        # a broad hump and a peak narrower than the spacing of 16 coarse points
+        peak, width = 0.537, 2e-3
+
+        def f(x):
+            x = np.asarray(x, dtype=np.float64)
+            hump = 0.5 * np.exp(-(x - 0.2) ** 2 / 0.1)
+            d_hump = -2 * (x - 0.2) / 0.1
+            spike = np.exp(-(x - peak) ** 2 / (2 * width ** 2))
+            d_spike = -(x - peak) / width ** 2
+            return hump + spike, hump * d_hump + spike * d_spike, \
+                hump * (d_hump ** 2 - 2 / 0.1) + spike * (d_spike ** 2 - 1 / width ** 2)
+
+        grid = np.linspace(0, 1, 501)
+        grid_values, _, _ = f(grid)
+        x = maximize_continuous(f, 0, 1, grid)
+        self.assertAlmostEqual(x, peak, places=4)
+        self.assertGreaterEqual(f(x)[0], np.max(grid_values))
+        self.assertEqual(snap_to_best(f, grid, x), grid[np.argmax(grid_values)])
+
+
+class TestExpectedProfit(TestCase):
+    def test_expected_profit_arrays(self):
+        prices = np.linspace(1, 100, 20)
+        bids = np.linspace(1, 100, 30)
+        env = Environment()
+        combinations = env.get_features_combinations()[:2]
+
+        profits = expected_profit(env, prices[:, None], bids[None, :], combinations)
+        self.assertEqual(profits.shape, (len(prices), len(bids)))
+
+        grid = expected_profit_grid(env, prices, bids, combinations)
+        self.assertEqual(grid.shape, (len(prices), len(bids), len(combinations)))
+        self.assertTrue(np.allclose(np.sum(grid, axis=-1), profits))
+
+        for i, p in enumerate(prices):
+            for j, b in enumerate(bids):
+                self.assertAlmostEqual(profits[i, j], expected_profit(env, p, b, combinations))
+
+    def test_extreme_arguments(self):
+        env = Environment()
+        with np.errstate(over='raise', invalid='raise'):
+            conversion_rates = env.get_dist_click_converted().mean(env.class_parameters, np.array([[-1e6], [1e6]]))
+            win_probabilities = env.get_dist_new_clicks().v(np.array([-1e6, 1e6]))
+
+        self.assertTrue(np.all(conversion_rates[0] == 1) and np.all(conversion_rates[1] == 0))
+        self.assertEqual(list(win_probabilities), [0, 1])
+
+
+class TestProfitCache(TestCase):
+    def test_memoization(self):
+        prices = np.linspace(1, 100, 100)
+        bids = np.linspace(1, 100, 100)
+        env = Environment(profit_cache_size=2)
+        cache = env.get_profit_cache()
+
+        first = step1(env, prices, bids)
+        self.assertEqual(step1(env, prices, bids, combinations=None), first)
+        self.assertEqual((cache.get_hits(), cache.get_misses()), (1, 1))
+
+        grid = expected_profit_grid(env, prices, bids)
+        self.assertIs(expected_profit_grid(env, list(prices), bids), grid)
+        self.assertFalse(grid.flags.writeable)
+
+        # the least recently used entry is evicted
+        step1(env, prices, bids, env.get_features_combinations()[:1])
+        self.assertEqual(len(cache), 2)
+        step1(env, prices, bids)
+        self.assertEqual(cache.get_misses(), 4)
@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.bandit.ArmStatistics import ArmStatistics
+
+
+class TestArmStatistics(TestCase):
+    def test_against_lists(self):
+        rng = np.random.default_rng(3)
+        n_combs, n_arms = 3, 4
+        stats = ArmStatistics((n_combs, n_arms), ['purchases'], labels=['a', 'b', 'c'], capacity=2)
+        samples = [[[] for _ in range(n_arms)] for _ in range(n_combs)]
+
+        for r in range(300):
+            if r == 100:
+                # requested midway, then maintained by the appends
+                masked = stats.get_masked_totals('purchases', stats.get_mask(['a', 'c']))
+            arms = rng.integers(n_arms, size=n_combs)
+            values = rng.integers(0, 50, size=n_combs)
+            stats.append('purchases', (np.arange(n_combs), arms), values)
+            for c in range(n_combs):
+                samples[c][arms[c]].append(values[c])
+
+        counts = np.array([[len(s) for s in row] for row in samples])
+        self.assertTrue(np.array_equal(stats.get_counts('purchases'), counts))
+        self.assertTrue(np.array_equal(stats.get_totals('purchases'), [[sum(s) for s in row] for row in samples]))
+        self.assertTrue(np.array_equal(stats.get_samples('purchases', (1, 2)), samples[1][2]))
+
+        # sum of the first n samples of every arm
+        n = rng.integers(0, counts + 1)
+        self.assertTrue(np.array_equal(stats.get_prefix_sums('purchases', n),
+                                       [[sum(s[:k]) for s, k in zip(row, n_row)] for row, n_row in zip(samples, n)]))
+        self.assertEqual(stats.get_label_indices(['c', 'a']), [2, 0])
+        self.assertTrue(np.array_equal(masked, stats.get_totals('purchases')[0] + stats.get_totals('purchases')[2]))
+        self.assertTrue(np.array_equal(stats.get_nth_samples('purchases', (1, 2), 3), samples[1][2][3]))
@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.Environment import Environment
+from src.bandit.banditEnvironments.JointBanditEnvironment import JointBanditEnvironment
+from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
+from src.bandit.learner.ucb.UCBOptimalPriceDiscriminatingLearner import UCBOptimalPriceDiscriminatingLearner
+
+prices = np.arange(10, 101, 10)
+bids = np.arange(1, 100, 7)
+
+
+def make_price_env(seed, delay=5, **kwargs):
+    return PriceBanditEnvironment(Environment(random_seed=seed), prices, 10, delay, **kwargs)
+
+
+def make_joint_env(seed, delay=5, **kwargs):
+    return JointBanditEnvironment(Environment(random_seed=seed), prices, bids, delay, **kwargs)
+
+
+def make_ucb_price_discriminating(seed, **kwargs):
+    env = make_price_env(seed, discriminating=True)
+    return env, UCBOptimalPriceDiscriminatingLearner(env, **kwargs)
+
+
+class TestBanditEnvironment(TestCase):
+    def test_pull_views(self):
+        delay, n_rounds = 3, 12
+
+        env_views = make_joint_env(7, delay)
+        env_batch = make_joint_env(7, delay)
+        combinations = env_views.get_features_combinations()
+
+        for r in range(n_rounds):
+            price_strategy = {c: (r + i) % len(prices) for i, c in enumerate(combinations)}
+            bid_strategy = {c: (2 * r + i) % len(bids) for i, c in enumerate(combinations)}
+
+            auctions, new_clicks, purchases, tot_cost, (past_strategies, visits) = \
+                env_views.pull_arm_discriminating(price_strategy, bid_strategy)
+            batch = env_batch.pull(env_batch.strategy_to_arms(price_strategy, bid_strategy))
+
+            self.assertTrue(np.array_equal(batch.arms[0], [price_strategy[c] for c in combinations]))
+            for view, data in [(auctions, batch.auctions), (new_clicks, batch.new_clicks),
+                               (purchases, batch.purchases), (tot_cost, batch.tot_cost),
+                               (visits, batch.matured_visits)]:
+                self.assertTrue(np.array_equal([view[c] for c in combinations], data))
+
+            self.assertEqual(batch.has_matured(), r >= delay)
+            if r >= delay:
+                self.assertEqual(past_strategies[0], {c: (r - delay + i) % len(prices)
+                                                      for i, c in enumerate(combinations)})
+                self.assertTrue(np.array_equal(batch.matured_arms[1],
+                                               [(2 * (r - delay) + i) % len(bids) for i in range(len(combinations))]))
+            else:
+                self.assertEqual(past_strategies, (None, None))
+
+        # a single pair of arms is pulled for every combination
+        batch = env_batch.pull((2, 3))
+        self.assertEqual(batch.arms.shape, (2, len(combinations)))
+        self.assertTrue(np.all(batch.arms[0] == 2) and np.all(batch.arms[1] == 3))
@@ -0,0 +1,72 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from src.Environment import Environment
+from src.bandit.banditEnvironments.DelayModels import GeometricDelay
+from src.bandit.banditEnvironments.JointBanditEnvironment import JointBanditEnvironment
+from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
+from src.bandit.context.UCBJointContext import UCBJointContext
+from src.bandit.learner.OptimalJointDiscriminatingLearner import OptimalJointDiscriminatingLearner
+from src.bandit.learner.ts.TSOptimalPriceLearner import TSOptimalPriceLearner
+from src.bandit.learner.ucb.UCBOptimalPriceDiscriminatingLearner import UCBOptimalPriceDiscriminatingLearner
+
+prices = np.arange(10, 101, 10)
+bids = np.arange(1, 100, 11)
+
+
+def make_ts_price(seed):
+    env = Environment(random_seed=seed)
+    bandit_env = PriceBanditEnvironment(env, prices, 10, 5, delay_model=GeometricDelay(0.3, np.random.default_rng(1)))
+    return env, bandit_env, TSOptimalPriceLearner(bandit_env)
+
+
+def make_ucb_price_discriminating(seed):
+    env = Environment(random_seed=seed)
+    bandit_env = PriceBanditEnvironment(env, prices, 10, 5, discriminating=True)
+    return env, bandit_env, UCBOptimalPriceDiscriminatingLearner(bandit_env)
+
+
+def make_joint_discriminating(seed):
+    env = Environment(random_seed=seed)
+    bandit_env = JointBanditEnvironment(env, prices, bids, 5, discriminating=True)
+    context_structure = [UCBJointContext(combs, bandit_env.margin, len(prices), len(bids), bandit_env.rng)
+                         for combs in [[(True, True), (True, False)], [(False, True), (False, False)]]]
+    return env, bandit_env, OptimalJointDiscriminatingLearner(bandit_env, context_structure)
+
+
+class TestCheckpoint(TestCase):
+    def test_resume(self):
+        interruption, n_rounds = 80, 140
+
+        for make in [make_ts_price, make_ucb_price_discriminating, make_joint_discriminating]:
+            _, bandit_env, learner = make(21)
+            learner.learn(n_rounds)
+            expected_profits = bandit_env.get_regret_tracker().get_profits().copy()
+
+            env, bandit_env, learner = make(21)
+            learner.learn(interruption)
+            with tempfile.TemporaryDirectory() as directory:
+                paths = [os.path.join(directory, name) for name in ['env', 'bandit_env', 'learner']]
+                for obj, path in zip([env, bandit_env, learner], paths):
+                    obj.save_state(path)
+
+                # keep running the original, then go back to the checkpoint in new objects
+                learner.learn(interruption + 10)
+                env, bandit_env, learner = make(21)
+                for obj, path in zip([env, bandit_env, learner], paths):
+                    obj.load_state(path)
+
+            self.assertEqual(bandit_env.get_regret_tracker().get_n_rounds(), learner.current_round)
+            learner.learn(n_rounds)
+            self.assertTrue(np.array_equal(bandit_env.get_regret_tracker().get_profits(), expected_profits))
+
+    def test_wrong_seed(self):
+        env = Environment(random_seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'env')
+            env.save_state(path)
+            with self.assertRaises(ValueError):
+                Environment(random_seed=2).load_state(path)
@@ -0,0 +1,44 @@
+import itertools
+from unittest import TestCase
+
+import numpy as np
+
+from src.bandit.context.ContextTree import ContextTree, get_assignment
+
+
+class TestContextTree(TestCase):
+    def test_aggregates(self):
+        rng = np.random.default_rng(4)
+        n_features, n_arms = 5, 3
+        combinations = list(itertools.product([True, False], repeat=n_features))
+        tree = ContextTree(combinations, n_arms, ['purchases'])
+        totals = np.zeros((len(combinations), n_arms))
+
+        for r in range(60):
+            if r in [20, 40]:
+                # split a random leaf on one of its possible splits
+                leaves = [leaf for leaf in tree.get_leaves() if leaf.candidates]
+                leaf = leaves[rng.integers(len(leaves))]
+                tree.split(leaf, rng.choice(list(leaf.candidates)))
+            # the combinations of a leaf are pulled with the same arm
+            arms = np.zeros(len(combinations), dtype=np.int64)
+            for leaf in tree.get_leaves():
+                arms[leaf.index] = rng.integers(n_arms)
+            values = rng.integers(0, 50, size=len(combinations))
+            tree.update('purchases', arms, values)
+            totals[np.arange(len(combinations)), arms] += values
+
+        self.assertEqual(len(tree.get_leaves()), 3)
+        for assignment, node in tree.nodes.items():
+            combs = [c for c in combinations
+                     if all(v is None or c[i] == v for i, v in enumerate(assignment))]
+            self.assertEqual(get_assignment(combs), assignment)
+            self.assertTrue(np.array_equal(node.index, [combinations.index(c) for c in combs]))
+            self.assertTrue(np.array_equal(tree.get_totals(node, 'purchases'), np.sum(totals[node.index], axis=0)))
+            # a parent is the sum of its children, and so is a leaf of the children of its possible splits
+            for _, child_true, child_false in [node.split] if node.split else []:
+                self.assertTrue(np.array_equal(tree.get_totals(node, 'purchases'),
+                                               tree.get_totals(child_true, 'purchases') + tree.get_totals(child_false, 'purchases')))
+            for child_true, child_false in node.candidates.values():
+                self.assertTrue(np.array_equal(tree.get_totals(node, 'purchases'),
+                                               tree.get_totals(child_true, 'purchases') + tree.get_totals(child_false, 'purchases')))
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.Environment import Environment
+from src.EnvironmentEnsemble import EnvironmentEnsemble
+from src.algorithms import expected_profit, step1
+
+
+class TestEnvironmentEnsemble(TestCase):
+    def test_same_environments_of_seeds(self):
+        prices = np.arange(10, 101, 10)
+        bids = np.arange(1, 100)
+        seeds = np.random.default_rng(5).integers(0, 2 ** 32, size=20)
+
+        ensemble = EnvironmentEnsemble.from_seeds(seeds)
+        ens_prices, ens_bids, ens_profits = ensemble.step1(prices, bids)
+
+        for i, seed in enumerate(seeds):
+            env = Environment(seed)
+
+            for comb in env.get_features_combinations():
+                for p, b in [(20, 5), (60, 15)]:
+                    self.assertAlmostEqual(expected_profit(env, p, b, [comb]),
+                                           ensemble.expected_profit(p, b, [comb])[i])
+
+            opt_price, opt_bid, profit = step1(env, prices, bids)
+            self.assertEqual((opt_price, opt_bid), (ens_prices[i], ens_bids[i]))
+            self.assertAlmostEqual(profit, ens_profits[i])
+
+    def test_simulation_mean(self):
+        samples = 20000
+        prices = np.arange(10, 101, 10)
+        bids = np.arange(1, 100)
+
+        ensemble = EnvironmentEnsemble.random(50, np.random.default_rng(6))
+        opt_prices, opt_bids, exp_profits = ensemble.step1(prices, bids)
+
+        _, _, _, _, _, profits = ensemble.simulate_days(samples, opt_prices[:, None], opt_bids[:, None])
+        errors = np.mean(profits, axis=0) - exp_profits
+
+        self.assertLess(abs(np.mean(errors)), 10)
+
+    def test_n_features(self):
+        prices = np.arange(10, 101, 10)
+        bids = np.arange(1, 100, 9)
+        seeds = [3, 14, 15]
+
+        ensemble = EnvironmentEnsemble.from_seeds(seeds, n_features=3)
+        self.assertEqual(len(ensemble.get_features_combinations()), 8)
+        ens_prices, ens_bids, ens_profits = ensemble.step1(prices, bids)
+        for i in range(len(seeds)):
+            env = ensemble.get_environment(i)
+            self.assertEqual(env.get_features_combinations(), ensemble.get_features_combinations())
+            opt_price, opt_bid, profit = step1(env, prices, bids)
+            self.assertEqual((opt_price, opt_bid), (ens_prices[i], ens_bids[i]))
+            self.assertAlmostEqual(profit, ens_profits[i])
+
+        ensemble = EnvironmentEnsemble.random(5, np.random.default_rng(2), n_features=4)
+        self.assertEqual(ensemble.comb_class.shape, (5, 16))
+        # every class gets some combinations
+        self.assertTrue(all(len(np.unique(row)) == ensemble.cr_centers.shape[1] for row in ensemble.comb_class))
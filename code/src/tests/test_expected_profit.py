@@ -3,7 +3,8 @@ from unittest import TestCase
 import numpy as np
 
 from src.Environment import Environment
-from src.algorithms import step1
+from src.algorithms import step1, expected_profit
+from src.distributions import GammaCostPerClickDistribution
 
 
 class Test(TestCase):
@@ -20,12 +21,8 @@ class Test(TestCase):
             env = Environment()
             opt_price, opt_bid, exp_profit = step1(env, prices, bids)
 
-            cum_profit = 0
-            for __ in range(samples):
-                _, _, _, _, _, profit = env.simulate_one_day_fixed_both(opt_price, opt_bid)
-                cum_profit += profit
-
-            average_profit = cum_profit / samples
+            _, _, _, _, _, profits = env.simulate_days(samples, opt_price, opt_bid)
+            average_profit = np.mean(profits)
 
             error = average_profit-exp_profit
 
@@ -37,3 +34,35 @@ class Test(TestCase):
         if abs(average_error) > 10:
             print(f'Failed with error {average_error:.2f} after {tests} tests with {samples} samples')
             self.fail()
+
+    def test_simulate_days_grid(self):
+        samples = 1000
+
+        prices = np.arange(10, 101, 10)
+        bids = np.arange(1, 100, 7)
+
+        env = Environment()
+        n_combs = len(env.get_features_combinations())
+
+        auctions, new_clicks, purchases, tot_cost, future_visits, profits = \
+            env.simulate_days(samples, prices[:, None, None], bids[None, :, None])
+
+        for data in [auctions, new_clicks, purchases, tot_cost, future_visits]:
+            self.assertEqual(data.shape, (samples, len(prices), len(bids), n_combs))
+        self.assertEqual(profits.shape, (samples, len(prices), len(bids)))
+
+        self.assertTrue(np.all(new_clicks <= auctions))
+        self.assertTrue(np.all(purchases <= new_clicks))
+
+    def test_aggregate_sampling(self):
+        samples = 20000
+
+        env = Environment(aggregate_sampling=True, cost_per_click_distribution=GammaCostPerClickDistribution)
+        price, bid = env.item_base_price + 10, env.newClicksC
+
+        profits = [env.simulate_one_day_fixed_both(price, bid)[5] for _ in range(samples)]
+        _, _, _, _, _, days_profits = env.simulate_days(samples, price, bid)
+        exp_profit = expected_profit(env, price, bid)
+
+        for average_profit in [np.mean(profits), np.mean(days_profits)]:
+            self.assertLess(abs(average_profit - exp_profit), 0.02 * abs(exp_profit) + 5)
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.tests.test_checkpoint import make_ucb_price_discriminating, make_ts_price
+
+
+class TestFork(TestCase):
+    def test_fork(self):
+        fork_round, n_rounds = 80, 140
+
+        for make in [make_ts_price, make_ucb_price_discriminating]:
+            _, bandit_env, learner = make(33)
+            learner.learn(n_rounds)
+            expected_profits = bandit_env.get_regret_tracker().get_profits().copy()
+
+            _, bandit_env, learner = make(33)
+            learner.learn(fork_round)
+            branches = [learner.fork() for _ in range(2)]
+            if hasattr(learner, 'stats'):
+                # the histories are shared until the first append
+                self.assertIs(branches[0].stats.prefix_sums['purchases'], learner.stats.prefix_sums['purchases'])
+
+            for branch in branches:
+                self.assertIsNot(branch.env, bandit_env)
+                self.assertIsNot(branch.env.env.rng, bandit_env.env.rng)
+                self.assertIs(branch.env.env.classes, bandit_env.env.classes)
+                branch.learn(n_rounds)
+
+            # the original goes on as if it had not been forked
+            learner.learn(n_rounds)
+            self.assertTrue(np.array_equal(bandit_env.get_regret_tracker().get_profits(), expected_profits))
+
+            # the branches share the common prefix and then have their own random streams
+            branch_profits = [b.env.get_regret_tracker().get_profits() for b in branches]
+            for profits in branch_profits:
+                self.assertEqual(len(profits), n_rounds)
+                self.assertTrue(np.array_equal(profits[:fork_round], expected_profits[:fork_round]))
+            last_auctions = [b.env.get_last_batch().auctions for b in branches] + [bandit_env.get_last_batch().auctions]
+            self.assertFalse(np.array_equal(last_auctions[0], last_auctions[1]))
+            self.assertFalse(np.array_equal(last_auctions[0], last_auctions[2]))
@@ -0,0 +1,87 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.Environment import Environment
+from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
+from src.bandit.banditEnvironments.DelayModels import FixedDelay, GeometricDelay, EmpiricalDelay
+from src.bandit.banditEnvironments.FutureVisitsCalendar import FutureVisitsCalendar
+
+
+class TestFutureVisitsCalendar(TestCase):
+    def test_all_visits_arrive(self):
+        max_delay, n_combs, n_rounds = 10, 4, 100
+        rng = np.random.default_rng(0)
+
+        for model in [FixedDelay(), GeometricDelay(0.3, rng), EmpiricalDelay([0, 1, 3, 0, 2], rng)]:
+            # the arm of every round is the round itself, to follow its visits
+            n_arms = n_rounds + max_delay
+            calendar = FutureVisitsCalendar(model, max_delay, n_combs, (n_arms,))
+            visits = np.zeros((n_arms, n_combs), dtype=np.int64)
+            visits[:n_rounds] = rng.integers(0, 50, size=(n_rounds, n_combs))
+            purchases = np.zeros((n_arms, n_combs))
+            purchases[:n_rounds] = 1
+            arrived = np.zeros(n_arms, dtype=np.int64)
+            exposure = np.zeros(n_arms)
+
+            for r in range(n_arms):
+                calendar.schedule([[r] * n_combs], purchases[r], visits[r])
+                arrived_visits, arrived_exposure, _, _ = calendar.pop()
+                origins = np.flatnonzero(arrived_exposure)
+                self.assertTrue(np.all((0 <= r - origins) & (r - origins <= max_delay)))
+                arrived += arrived_visits
+                exposure += arrived_exposure
+
+            self.assertTrue(np.array_equal(arrived, np.sum(visits, axis=1)))
+            self.assertTrue(np.allclose(exposure, np.sum(purchases, axis=1)))
+
+    def test_fixed_delay(self):
+        calendar = FutureVisitsCalendar(FixedDelay(), 3, 2, (10,))
+        for r in range(10):
+            calendar.schedule([[r, r]], [1, 1], [r, 2 * r])
+            visits, exposure, _, _ = calendar.pop()
+            expected_visits, expected_exposure = np.zeros(10), np.zeros(10)
+            if r >= 3:
+                expected_visits[r - 3], expected_exposure[r - 3] = 3 * (r - 3), 2
+            self.assertTrue(np.array_equal(visits, expected_visits))
+            self.assertTrue(np.array_equal(exposure, expected_exposure))
+
+    def test_matured_rounds(self):
+        max_delay, n_combs, n_rounds = 5, 4, 23
+        rng = np.random.default_rng(1)
+        for delay in [max_delay, 0]:
+            calendar = FutureVisitsCalendar(GeometricDelay(0.3, rng), delay, n_combs, (n_rounds, n_rounds + 1))
+
+            pushed = []
+            for r in range(n_rounds):
+                arms = np.array([[r] * n_combs, [r + 1] * n_combs])
+                visits = np.arange(n_combs) * r
+                pushed.append((arms, visits))
+
+                calendar.schedule(arms, np.ones(n_combs), visits)
+                _, _, matured_arms, matured_visits = calendar.pop()
+                if r < delay:
+                    self.assertTrue(FutureVisitsCalendar.is_empty(matured_arms))
+                    self.assertTrue(np.all(matured_visits == 0))
+                else:
+                    self.assertFalse(FutureVisitsCalendar.is_empty(matured_arms))
+                    self.assertTrue(np.array_equal(matured_arms, pushed[r - delay][0]))
+                    self.assertTrue(np.array_equal(matured_visits, pushed[r - delay][1]))
+
+            calendar.reset()
+            calendar.schedule(*pushed[0][:1], np.ones(n_combs), pushed[0][1])
+            _, _, matured_arms, _ = calendar.pop()
+            self.assertEqual(FutureVisitsCalendar.is_empty(matured_arms), delay > 0)
+
+    def test_reproducible_delays(self):
+        # a delay model without a generator draws from the stream of the environment
+        arrivals = []
+        for _ in range(2):
+            env = PriceBanditEnvironment(Environment(random_seed=3), np.arange(10, 101, 10), 10, 5,
+                                         delay_model=GeometricDelay(0.3))
+            for r in range(20):
+                env.pull(r % 10)
+            arrivals.append(env.get_last_batch().arrived_visits.copy())
+            # the view by arm of the last arrivals
+            self.assertEqual(sum(visits for visits, _ in env.get_last_arrivals().values()), np.sum(arrivals[-1]))
+        self.assertTrue(np.array_equal(arrivals[0], arrivals[1]))
@@ -10,18 +10,9 @@ def main():
     bids = np.arange(10, 101, 10)
     env = Environment()
 
-    future_visits = np.zeros((len(prices), len(bids)))
-    purchases = np.zeros((len(prices), len(bids)))
-    for j in range(samples_per_pair):
-        if not j % 10:
-            print(f'Simulating: {j/samples_per_pair*100:6.2f}%')
-        for p_i, price in enumerate(prices):
-            for b_i, bid in enumerate(bids):
-                _, _, purch, _, fut, _ = env.simulate_one_day_fixed_both(price, bid)
-                purchases[p_i][b_i] += sum(purch.values())
-                future_visits[p_i][b_i] += sum(fut.values())
-
-    print(f'Simulating: 100.00%')
+    _, _, purch, _, fut, _ = env.simulate_days(samples_per_pair, prices[:, None, None], bids[None, :, None])
+    purchases = np.sum(purch, axis=(0, 3))
+    future_visits = np.sum(fut, axis=(0, 3))
 
     print('    | ' + "  ".join(f'{bid:5d}' for bid in bids) + " |  aggr", flush=True)
     for p_i, price in enumerate(prices):
@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.Environment import Environment
+from src.algorithms import expected_profit_grid
+from src.bandit.banditEnvironments.JointBanditEnvironment import JointBanditEnvironment
+from src.partitions import subset_sums, lowest_elements, mask_elements, optimal_partition, MAX_ELEMENTS
+from src.tests.test_bandit_environment import prices, make_ucb_price_discriminating
+
+
+def all_partitions(elements):
+    if not elements:
+        yield []
+        return
+    first, rest = elements[0], elements[1:]
+    for partition in all_partitions(rest):
+        yield [[first]] + partition
+        for i in range(len(partition)):
+            yield partition[:i] + [[first] + partition[i]] + partition[i + 1:]
+
+
+class TestPartitions(TestCase):
+    def test_against_enumeration(self):
+        rng = np.random.default_rng(2)
+        n_elements = 6
+        per_element = rng.integers(0, 10, size=(n_elements, 3))
+        sums = subset_sums(per_element)
+        for mask in [0, 5, 2 ** n_elements - 1]:
+            self.assertTrue(np.array_equal(sums[mask], np.sum(per_element[mask_elements(mask)], axis=0)))
+        self.assertEqual(list(lowest_elements(3)), [0, 0, 1, 0, 2, 0, 1, 0])
+
+        for _ in range(5):
+            # few distinct values, so that many partitions are tied
+            values = rng.integers(0, 4, size=2 ** n_elements).astype(float)
+            values[rng.integers(1, 2 ** n_elements)] = -np.inf
+            partitions = [[sum(1 << i for i in part) for part in p] for p in all_partitions(list(range(n_elements)))]
+            totals = [sum(values[m] for m in p) for p in partitions]
+            best = max(totals)
+
+            value, partition = optimal_partition(values)
+            self.assertEqual(value, best)
+            self.assertEqual(sum(values[m] for m in partition), best)
+            self.assertEqual(sorted(e for m in partition for e in mask_elements(m)), list(range(n_elements)))
+            # the coarsest of the best partitions
+            self.assertEqual(len(partition), min(len(p) for p, t in zip(partitions, totals) if t == best))
+
+    def test_too_many_elements(self):
+        with self.assertRaises(ValueError):
+            subset_sums(np.zeros(MAX_ELEMENTS + 1))
+        with self.assertRaises(ValueError):
+            optimal_partition(np.zeros(2 ** (MAX_ELEMENTS + 1)))
+
+
+class TestOptimalContextPartition(TestCase):
+    def test_clairvoyant(self):
+        bids = np.linspace(5, 20, 10)
+
+        environment = Environment(random_seed=4)
+        env = JointBanditEnvironment(environment, prices, bids, 5)
+        structure, profit = env.get_clairvoyant_optimal_context_structure()
+        # at least as good as the customer classes, each one with its own optimal price and bid
+        grid = expected_profit_grid(environment, prices, bids)
+        classes_profit = sum(np.max(np.sum(grid[..., environment.get_comb_indices(c.features)], axis=-1))
+                             for c in environment.classes)
+        self.assertGreaterEqual(profit, classes_profit - 1e-6)
+        self.assertAlmostEqual(profit, sum(np.max(np.sum(grid[..., environment.get_comb_indices(context)], axis=-1))
+                                           for context in structure))
+
+    def test_learner(self):
+        _, learner = make_ucb_price_discriminating(8)
+        learner.learn(200)
+        lower_bound, partition = learner.compute_optimal_partition()
+        contexts_lower_bound = sum(learner.compute_context_expected_profit_lower_bound(c)
+                                   for c in learner.get_contexts())
+        self.assertGreaterEqual(lower_bound, contexts_lower_bound - 1e-6)
@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.bandit.banditEnvironments.DelayModels import GeometricDelay
+from src.tests.test_bandit_environment import make_price_env, make_ucb_price_discriminating
+
+
+class TestPullArmsForDays(TestCase):
+    def test_pull_arms_for_days(self):
+        delay, n_days = 3, 7
+
+        env = make_price_env(5, delay)
+        n_combs = len(env.get_features_combinations())
+
+        batch = env.pull_arms_for_days(4, n_days)
+        self.assertEqual(batch.get_n_days(), n_days)
+        self.assertEqual(batch.arms.shape, (n_days, 1, n_combs))
+        for data in [batch.auctions, batch.new_clicks, batch.purchases, batch.tot_cost, batch.matured_visits]:
+            self.assertEqual(data.shape, (n_days, n_combs))
+        self.assertTrue(np.all(batch.purchases <= batch.new_clicks))
+
+        for day in range(n_days):
+            self.assertEqual(batch.day(day).has_matured(), day >= delay)
+        self.assertTrue(np.all(batch.matured_arms[delay:] == 4))
+
+        # the calendar matures the days one by one: the next single pull gets the visits of the day delay rounds before
+        next_batch = env.pull(0)
+        self.assertTrue(np.all(next_batch.matured_arms == 4))
+        self.assertEqual(env.get_regret_tracker().get_n_rounds(), n_days + 1)
+
+    def test_days_stream(self):
+        # without aggregate sampling, pulling for several days draws the same samples as single pulls;
+        # the lags of the visits of all the days are drawn at once, as the single pulls draw them
+        env_days = make_price_env(6, 2, delay_model=GeometricDelay(0.3))
+        env_single = make_price_env(6, 2, delay_model=GeometricDelay(0.3))
+
+        batch = env_days.pull_arms_for_days(3, 5)
+        for day in range(5):
+            single = env_single.pull(3)
+            for days_data, single_data in [(batch.new_clicks, single.new_clicks), (batch.purchases, single.purchases),
+                                           (batch.tot_cost, single.tot_cost), (batch.matured_visits, single.matured_visits),
+                                           (batch.arrived_visits, single.arrived_visits)]:
+                self.assertTrue(np.array_equal(days_data[day], single_data))
+
+    def test_learner_commitment(self):
+        env, learner = make_ucb_price_discriminating(5, commitment_rounds=8)
+        learner.learn(120)
+
+        self.assertEqual(env.get_regret_tracker().get_n_rounds(), learner.current_round)
@@ -0,0 +1,24 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.bandit.PullCounter import PullCounter
+
+
+class TestPullCounter(TestCase):
+    def test_snapshots(self):
+        rng = np.random.default_rng(8)
+        n_prices, n_bids = 4, 3
+        counter = PullCounter((n_prices, n_bids), snapshot_interval=16)
+        pulls = [(int(p), int(b)) for p, b in zip(rng.integers(n_prices, size=500), rng.integers(n_bids, size=500))]
+        for arm in pulls:
+            counter.record(arm)
+
+        for n_rounds in [0, 1, 15, 16, 17, 255, 256, 499, 500]:
+            expected = np.zeros((n_prices, n_bids), dtype=np.int64)
+            for p, b in pulls[:n_rounds]:
+                expected[p, b] += 1
+            self.assertTrue(np.array_equal(counter.get_counts(n_rounds), expected))
+
+        with self.assertRaises(ValueError):
+            counter.get_counts(501)
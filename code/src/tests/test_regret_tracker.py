@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.algorithms import expected_profit_grid
+from src.bandit.learner.ucb.UCBOptimalPriceDiscriminatingLearner import UCBOptimalPriceDiscriminatingLearner
+from src.tests.test_bandit_environment import prices, bids, make_joint_env, make_price_env, \
+    make_ucb_price_discriminating
+
+
+class TestRegretTracker(TestCase):
+    def test_cumulative_regrets(self):
+        n_rounds = 50
+
+        env = make_joint_env(3)
+        comb_profits = expected_profit_grid(env.env, prices, bids)
+        tracker = env.get_regret_tracker()
+        n_combs = len(env.get_features_combinations())
+
+        pulled = []
+        for r in range(n_rounds):
+            arms = np.array([(np.arange(n_combs) + r) % len(prices), (np.arange(n_combs) * r) % len(bids)])
+            env.pull(arms)
+            pulled.append(np.sum(comb_profits[arms[0], arms[1], np.arange(n_combs)]))
+
+            self.assertEqual(tracker.get_n_rounds(), r + 1)
+            self.assertAlmostEqual(tracker.get_cumulative_profits()[-1], np.sum(pulled))
+
+        optimum = env.get_clairvoyant_optimal_expected_profit_not_discriminating()
+        self.assertTrue(np.allclose(tracker.get_profits(), pulled))
+        self.assertTrue(np.allclose(tracker.get_cumulative_regrets(), np.cumsum(optimum - np.array(pulled))))
+
+        tracker.set_clairvoyant_profit(2 * optimum)
+        self.assertTrue(np.allclose(tracker.get_cumulative_regrets(), np.cumsum(2 * optimum - np.array(pulled))))
+
+        curve = tracker.get_cumulative_profits()
+        env.reset_state()
+        env.pull((0, 0))
+        self.assertEqual(tracker.get_n_rounds(), 1)
+        self.assertAlmostEqual(curve[-1], np.sum(pulled))
+
+    def test_discriminating_clairvoyant(self):
+        env, learner = make_ucb_price_discriminating(5)
+        learner.learn(50)
+
+        # the regret of a discriminating learner is measured against the discriminating optimum
+        self.assertEqual(env.get_regret_tracker().get_clairvoyant_profit(),
+                         env.get_clairvoyant_optimal_expected_profit_discriminating())
+        with self.assertRaises(ValueError):
+            UCBOptimalPriceDiscriminatingLearner(make_price_env(5))
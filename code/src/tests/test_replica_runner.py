@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.algorithms import step1
+from src.bandit.ReplicaRunner import ReplicaRunner
+from src.bandit.banditEnvironments.PriceBanditEnvironment import PriceBanditEnvironment
+from src.bandit.learner.ucb.UCBOptimalPriceLearner import UCBOptimalPriceLearner
+
+
+def make_price_replica(env):
+    prices = np.arange(10, 101, 10)
+    _, opt_bid, _ = step1(env, prices, np.arange(1, 100, 7))
+    bandit_env = PriceBanditEnvironment(env, prices, opt_bid, 5)
+    return bandit_env, UCBOptimalPriceLearner(bandit_env)
+
+
+class TestReplicaRunner(TestCase):
+    def test_replicas(self):
+        n_rounds, n_replicas = 60, 6
+
+        sequential = ReplicaRunner(make_price_replica, n_rounds, n_replicas,
+                                   random_seed=1234, seed=42, n_workers=1).run()
+        parallel = ReplicaRunner(make_price_replica, n_rounds, n_replicas,
+                                 random_seed=1234, seed=42, n_workers=2).run()
+
+        self.assertEqual(sequential.cumulative_regrets.shape, (n_replicas, n_rounds))
+        self.assertTrue(np.array_equal(sequential.cumulative_profits, parallel.cumulative_profits))
+        self.assertTrue(np.array_equal(sequential.cumulative_regrets, parallel.cumulative_regrets))
+
+        # same environment, independent streams
+        self.assertTrue(np.all(sequential.clairvoyant_cumulative_profits == sequential.clairvoyant_cumulative_profits[0]))
+        self.assertFalse(np.all(sequential.cumulative_profits == sequential.cumulative_profits[0]))
+
+        lower, upper = sequential.get_regret_confidence_band()
+        mean = sequential.get_mean_cumulative_regrets()
+        self.assertTrue(np.all(lower <= mean) and np.all(mean <= upper))
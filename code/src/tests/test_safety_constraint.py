@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+import numpy as np
+from scipy.stats import norm
+
+from src.bandit.SafetyConstraint import SafetyConstraint
+
+
+class TestSafetyConstraint(TestCase):
+    def test_lower_bounds(self):
+        rng = np.random.default_rng(5)
+        n_contexts, n_bids, security = 2, 5, 0.2
+        normal = SafetyConstraint((n_contexts, n_bids), security)
+        empirical = SafetyConstraint((n_contexts, n_bids), security, risk_measure='empirical')
+        samples = [[[] for _ in range(n_bids)] for _ in range(n_contexts)]
+
+        for _ in range(400):
+            bids = rng.integers(n_bids - 1, size=n_contexts)  # the last bid is never pulled
+            new_clicks = rng.poisson(30 * (bids + 1))
+            for safety in [normal, empirical]:
+                safety.update((np.arange(n_contexts), bids), new_clicks)
+            for c in range(n_contexts):
+                samples[c][bids[c]].append(new_clicks[c])
+
+        for c in range(n_contexts):
+            for b in range(n_bids - 1):
+                expected = norm.ppf(security, np.mean(samples[c][b]), np.std(samples[c][b]))
+                self.assertAlmostEqual(normal.get_lower_bounds()[c, b], expected)
+                expected = np.quantile(samples[c][b], security, method='inverted_cdf')
+                self.assertEqual(empirical.get_lower_bounds()[c, b], expected)
+
+        # an arm without samples is never safe
+        for safety in [normal, empirical]:
+            mask = safety.compute_safe_arms(lambda nc: nc - 10)
+            self.assertTrue(np.all(mask[:, :-1]))
+            self.assertFalse(np.any(mask[:, -1]))
@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.bandit.learner.split_schedules import every_k_rounds
+from src.tests.test_bandit_environment import make_ucb_price_discriminating
+
+
+class TestSplitSchedule(TestCase):
+    def test_lower_bounds(self):
+        _, learner = make_ucb_price_discriminating(8)
+        learner.learn(200)
+        self.assertTrue(learner.found_splits)
+
+        # the memoized lower bounds are the ones of the current round
+        for context in learner.get_contexts():
+            self.assertEqual(learner.compute_context_expected_profit_lower_bound(context),
+                             context.compute_expected_profit_lower_bound(learner.tree, learner.current_round))
+
+        # the batched evaluation of the candidates gives the bounds of one context at a time
+        lower_bounds = learner.compute_split_lower_bounds()
+        for context in learner.get_contexts():
+            for _, context_true, context_false in learner.compute_possible_splits(context):
+                for c in [context, context_true, context_false]:
+                    self.assertEqual(lower_bounds[c.get_node(learner.tree).assignment],
+                                     learner.compute_context_expected_profit_lower_bound(c))
+
+    def test_every_k_rounds(self):
+        _, learner = make_ucb_price_discriminating(8, split_schedule=every_k_rounds(50))
+        learner.learn(200)
+
+        evaluation_rounds = sorted({r for r, _, _ in learner.found_splits})
+        self.assertTrue(evaluation_rounds)
+        self.assertTrue(np.all(np.diff(evaluation_rounds) >= 50))
@@ -1,11 +1,14 @@
-import math
-
 import numpy as np
 
 
 def sigmoid(x, center, z):
-    res = 1 / (1 + math.exp(-z * (x - center)))
-    return res
+    # Logistic function of arrays (broadcast together) or scalars. Stable for any argument:
+    # the exponential is only evaluated on non positive values, so it never overflows
+    t = z * (x - center)
+    e = np.exp(-np.abs(t))
+    d = 1 + e
+    res = np.where(t >= 0, 1 / d, e / d)
+    return res[()]
 
 
 def average_ragged_matrix(mat):